@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from jose import jwt, JWTError
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Google sign-in without the userinfo round trip: the token endpoint already returns a
+# signed id_token carrying email/name/picture, so the callback exchanges the code and
+# verifies that token locally against Google's published signing keys (JWKS).
+
+GOOGLE_ISSUERS = ("https://accounts.google.com", "accounts.google.com")
+# Used when the JWKS response has no Cache-Control max-age
+DEFAULT_JWKS_MAX_AGE_SECONDS = 3600
+# An id_token with an unknown key id forces a JWKS refetch (keys rotate), but not more often than this
+MIN_JWKS_REFETCH_SECONDS = 60
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class GoogleAuthError(Exception):
+    """The code exchange failed or the id_token did not verify."""
+
+
+class JWKSCache:
+    """Signing keys by key id, kept for the max-age the provider sends with them."""
+
+    def __init__(self, jwks_url: str, http_client: httpx.AsyncClient):
+        self.jwks_url = jwks_url
+        self.http_client = http_client
+        self._keys: Dict[str, Dict[str, Any]] = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+        self.fetches = 0
+
+    async def refresh(self) -> None:
+        response = await self.http_client.get(self.jwks_url)
+        response.raise_for_status()
+        keys = {key["kid"]: key for key in response.json().get("keys", []) if "kid" in key}
+        match = _MAX_AGE.search(response.headers.get("cache-control", ""))
+        max_age = int(match.group(1)) if match else DEFAULT_JWKS_MAX_AGE_SECONDS
+        now = time.monotonic()
+        self._keys = keys
+        self._fetched_at = now
+        self._expires_at = now + max_age
+        self.fetches += 1
+        logger.info("Fetched %d Google signing keys (max-age %ds)", len(keys), max_age)
+
+    async def get_key(self, kid: str) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        key = self._keys.get(kid)
+        if key is not None and now < self._expires_at:
+            return key
+        async with self._lock:
+            # Another request may have refreshed while this one waited
+            key = self._keys.get(kid)
+            now = time.monotonic()
+            expired = now >= self._expires_at
+            if expired or (key is None and now - self._fetched_at >= MIN_JWKS_REFETCH_SECONDS):
+                try:
+                    await self.refresh()
+                except httpx.HTTPError as e:
+                    # Keep serving the previous keys rather than failing every sign-in
+                    logger.warning("Could not refresh Google signing keys: %s", e)
+                key = self._keys.get(kid)
+        return key
+
+
+class GoogleOIDC:
+    def __init__(
+        self,
+        client_id: Optional[str],
+        client_secret: Optional[str],
+        redirect_uri: Optional[str],
+        token_url: str,
+        jwks_url: str,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.redirect_uri = redirect_uri
+        self.token_url = token_url
+        # One pooled client for the token endpoint and the JWKS (keeps connections warm)
+        self.http_client = http_client or httpx.AsyncClient(timeout=10.0)
+        self.jwks = JWKSCache(jwks_url, self.http_client)
+
+    async def exchange_code(self, code: str) -> Dict[str, Any]:
+        """Exchanges an authorization code for the token endpoint response (access_token, id_token, ...)."""
+        response = await self.http_client.post(self.token_url, data={
+            "code": code,
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "redirect_uri": self.redirect_uri,
+            "grant_type": "authorization_code",
+        })
+        if response.status_code != 200:
+            try:
+                err_json = response.json()
+                err_msg = err_json.get("error_description") or err_json.get("error") or str(err_json)
+            except ValueError:
+                err_msg = response.text
+            logger.warning("Google token endpoint returned %d: %s", response.status_code, err_msg)
+            raise GoogleAuthError(f"Failed to get token from Google: {err_msg}")
+        return response.json()
+
+    async def verify_id_token(self, id_token: str, access_token: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Verifies the id_token's RS256 signature, audience, issuer and expiry, and that the
+        email is verified. Returns its claims.
+        """
+        try:
+            header = jwt.get_unverified_header(id_token)
+        except JWTError as e:
+            raise GoogleAuthError(f"Malformed id_token: {e}")
+        key = await self.jwks.get_key(header.get("kid", ""))
+        if key is None:
+            raise GoogleAuthError("id_token signed with an unknown key")
+        try:
+            claims = jwt.decode(
+                id_token,
+                key,
+                algorithms=["RS256"],
+                audience=self.client_id,
+                issuer=GOOGLE_ISSUERS,
+                access_token=access_token,
+            )
+        except JWTError as e:
+            raise GoogleAuthError(f"Invalid id_token: {e}")
+        if not claims.get("email") or claims.get("email_verified") not in (True, "true"):
+            raise GoogleAuthError("Google account email is not verified")
+        return claims
+
+    async def authenticate(self, code: str) -> Dict[str, Any]:
+        """Code exchange plus local id_token verification; returns the verified claims."""
+        token_data = await self.exchange_code(code)
+        id_token = token_data.get("id_token")
+        if not id_token:
+            raise GoogleAuthError("Google did not return an id_token")
+        return await self.verify_id_token(id_token, token_data.get("access_token"))
+
+    async def aclose(self) -> None:
+        await self.http_client.aclose()
+
+
+_google_oidc: Optional[GoogleOIDC] = None
+
+
+def get_google_oidc() -> GoogleOIDC:
+    """Route dependency returning the process-wide client (overridden in tests)."""
+    global _google_oidc
+    if _google_oidc is None:
+        _google_oidc = GoogleOIDC(
+            settings.GOOGLE_CLIENT_ID,
+            settings.GOOGLE_CLIENT_SECRET,
+            settings.GOOGLE_REDIRECT_URI,
+            settings.GOOGLE_TOKEN_URL,
+            settings.GOOGLE_JWKS_URL,
+        )
+    return _google_oidc
+
+
+async def run_jwks_refresh_job():
+    """Refreshes the signing keys ahead of sign-ins, so callbacks rarely wait for the JWKS."""
+    if not settings.GOOGLE_CLIENT_ID:
+        return
+    await get_google_oidc().jwks.refresh()
+
+
+async def shutdown():
+    global _google_oidc
+    if _google_oidc is not None:
+        await _google_oidc.aclose()
+        _google_oidc = None
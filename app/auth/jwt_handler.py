@@ -1,29 +1,199 @@
+import hashlib
+import logging
 import os
-from datetime import datetime, timedelta
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+import asyncpg
 from jose import jwt, JWTError
 from dotenv import load_dotenv
 
+from app.config.settings import settings
+from app.repositories.users_repository import UserRepository
+from app.services import metrics
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 1440))
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+# Verified payloads are cached by token digest until the token's exp, so a client
+# resending the same token skips the signature check. 0 disables the cache.
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", 10_000))
+# Lifetime of cache entries for tokens without an exp claim
+TOKEN_CACHE_DEFAULT_TTL_SECONDS = 300
+
+# Revocation state. A token carries its user's token version ("tv", users.token_version at
+# issue time); revoke_user_tokens() bumps the version, invalidating every earlier token.
+# Single tokens (logout) are listed in revoked_tokens until they expire. Both are stored in
+# the database; each process checks tokens against the copies below, which its own
+# revocations update at once and run_revocation_sync_job() refreshes from the database, so
+# a revocation made by another worker takes effect within TOKEN_REVOCATION_SYNC_SECONDS.
+_token_versions: Dict[str, int] = {}
+# Digests of individually revoked tokens -> their exp
+_revoked_tokens: Dict[bytes, float] = {}
+
+
+class _VerifiedTokenCache:
+    """Bounded LRU of token digest -> (expires_at, payload)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: bytes, now: float) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, payload = entry
+            if expires_at <= now:
+                del self._entries[digest]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return payload
+
+    def put(self, digest: bytes, expires_at: float, payload: dict):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[digest] = (expires_at, payload)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, digest: bytes):
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+token_cache = _VerifiedTokenCache(TOKEN_CACHE_MAX_ENTRIES)
+metrics.Gauge("token_cache_entries", "Verified tokens currently cached.", collect=lambda: len(token_cache))
+
+
+def _digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None, token_version: int = 0):
+    """`token_version` is the user's users.token_version, read when they log in."""
     to_encode = data.copy()
+    now = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+        expire = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire, "iat": now})
+    if "sub" in to_encode:
+        to_encode["tv"] = token_version
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+
+def _is_revoked(digest: bytes, payload: dict) -> bool:
+    if digest in _revoked_tokens:
+        return True
+    sub = payload.get("sub")
+    return sub is not None and payload.get("tv", 0) < _token_versions.get(str(sub), 0)
+
+
 def verify_token(token: str):
+    """
+    Returns the token's payload, or None if it is invalid, expired or revoked.
+    Verified payloads are served from token_cache until the token expires.
+    """
+    digest = _digest(token)
+    now = time.time()
+    payload = token_cache.get(digest, now)
+    metrics.record_cache("token", payload is not None)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError as e:
+            logger.info("Token verification failed", extra={"reason": str(e)})
+            return None
+        expires_at = payload.get("exp")
+        token_cache.put(
+            digest,
+            float(expires_at) if expires_at is not None else now + TOKEN_CACHE_DEFAULT_TTL_SECONDS,
+            payload
+        )
+    if _is_revoked(digest, payload):
+        logger.info("Rejected revoked token", extra={"sub": payload.get("sub")})
+        return None
+    # Callers may modify the payload; never hand out the cached dict itself
+    return dict(payload)
+
+
+async def revoke_token(conn: asyncpg.Connection, token: str):
+    """Revokes a single token (e.g. on logout) until it would have expired anyway."""
+    digest = _digest(token)
+    token_cache.discard(digest)
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError as e:
-        print(f"Token verification failed: {e}")
+        claims = jwt.get_unverified_claims(token)
+    except JWTError:
+        return
+    expires_at = float(claims.get("exp") or time.time() + TOKEN_CACHE_DEFAULT_TTL_SECONDS)
+    _revoked_tokens[digest] = expires_at
+    await UserRepository(None).add_revoked_token(conn, digest, datetime.fromtimestamp(expires_at, timezone.utc))
+
+
+async def revoke_user_tokens(conn: asyncpg.Connection, user_id: int) -> Optional[int]:
+    """
+    Revokes every token issued to `user_id` so far (password change, role change, ban).
+    Returns the user's new token version, or None if there is no such user.
+    """
+    version = await UserRepository(None).increment_token_version(conn, user_id)
+    if version is None:
         return None
+    sub = str(user_id)
+    _token_versions[sub] = max(version, _token_versions.get(sub, 0))
+    logger.info("Revoked all tokens of user", extra={"sub": sub, "token_version": version})
+    return version
+
+
+async def sync_revocations(conn: asyncpg.Connection):
+    """Merges the database's revocation state into this process's copies."""
+    versions = await UserRepository(None).get_token_versions(conn)
+    revoked = await UserRepository(None).get_revoked_tokens(conn)
+    now = time.time()
+    # Versions only grow and revocations only end by expiring, so merging never loses
+    # a local revocation whose write the SELECTs above did not see yet
+    for user_id, version in versions.items():
+        sub = str(user_id)
+        _token_versions[sub] = max(version, _token_versions.get(sub, 0))
+    for digest, expires_at in revoked.items():
+        _revoked_tokens[digest] = expires_at.timestamp()
+    for digest, expires_at in list(_revoked_tokens.items()):
+        if expires_at <= now:
+            del _revoked_tokens[digest]
+
+
+async def run_revocation_sync_job():
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        await sync_revocations(conn)
+    finally:
+        await conn.close()
+
+
+def token_cache_stats() -> Dict[str, int]:
+    return {"entries": len(token_cache), "hits": token_cache.hits, "misses": token_cache.misses}
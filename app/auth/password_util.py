@@ -1,15 +1,110 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
 from passlib.context import CryptContext
 
-# Use bcrypt for password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.config.settings import settings
+from app.services import metrics
 
-def hash_password(password: str) -> str:
-    """Hashes a password using bcrypt."""
+logger = logging.getLogger(__name__)
+
+# Use bcrypt for password hashing. Hashes made with another work factor than
+# BCRYPT_ROUNDS are reported by needs_update() and re-hashed on the next login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+
+class PasswordHasherBusyError(Exception):
+    """Raised when too many hash/verify calls are already waiting for the hashing executor."""
+
+
+class PasswordHashTimeoutError(Exception):
+    """Raised when a hash/verify call did not finish within PASSWORD_HASH_TIMEOUT_SECONDS."""
+
+
+def _truncate(password: str) -> str:
     # bcrypt passwords cannot be longer than 72 bytes. Truncate if necessary.
     # Note: This is a backend fix to prevent crashes. Client-side validation is also recommended.
-    truncated_password = password.encode('utf-8')[:72].decode('utf-8', errors='ignore')
-    return pwd_context.hash(truncated_password)
+    return password.encode('utf-8')[:72].decode('utf-8', errors='ignore')
+
+
+def hash_password(password: str) -> str:
+    """Hashes a password using bcrypt. Blocks for the whole bcrypt run; use hash_password_async in handlers."""
+    return pwd_context.hash(_truncate(password))
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifies a plain password against a hashed password."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context.verify(_truncate(plain_password), hashed_password)
+
+
+def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifies a password; on success also returns a new hash if the stored one uses an
+    outdated work factor (otherwise None).
+    """
+    return pwd_context.verify_and_update(_truncate(plain_password), hashed_password)
+
+
+# bcrypt releases the GIL, so a small thread pool hashes in parallel without touching the
+# event loop. The pool is bounded and so is the number of calls allowed to wait for it:
+# a login burst gets fast 503s instead of an ever-growing queue.
+_executor: Optional[ThreadPoolExecutor] = None
+_pending = 0
+
+
+metrics.Gauge("password_hash_pending", "Password hash/verify calls running or queued.", collect=lambda: _pending)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+    return _executor
+
+
+def _release(_future):
+    global _pending
+    _pending -= 1
+
+
+async def _run(fn, *args):
+    global _pending
+    if _pending >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_MAX_QUEUE:
+        logger.warning("Password hashing queue full (%d pending)", _pending)
+        raise PasswordHasherBusyError("Password hashing is overloaded")
+    loop = asyncio.get_running_loop()
+    _pending += 1
+    future = loop.run_in_executor(_get_executor(), fn, *args)
+    # A timed-out call keeps its thread until bcrypt finishes, so it keeps its queue slot too
+    future.add_done_callback(_release)
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), timeout=settings.PASSWORD_HASH_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise PasswordHashTimeoutError("Password hashing timed out")
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run(hash_password, password)
+
+
+async def verify_and_update_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await _run(verify_and_update, plain_password, hashed_password)
+
+
+def hashing_stats() -> dict:
+    return {"pending": _pending, "workers": settings.PASSWORD_HASH_WORKERS, "max_queue": settings.PASSWORD_HASH_MAX_QUEUE}
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -18,7 +18,113 @@ class Settings:
     SECRET_KEY: str = os.getenv("SECRET_KEY")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+
+    # Password hashing: bcrypt work factor (changing it re-hashes passwords on next login)
+    # and the bounded executor that keeps bcrypt off the event loop
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", 12))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+    PASSWORD_HASH_MAX_QUEUE: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 64))
+    PASSWORD_HASH_TIMEOUT_SECONDS: float = float(os.getenv("PASSWORD_HASH_TIMEOUT_SECONDS", 10))
+
+    # Token revocations are stored in the database; each worker re-reads them at this interval,
+    # which bounds how long a revocation made through another worker takes to apply
+    TOKEN_REVOCATION_SYNC_SECONDS: float = float(os.getenv("TOKEN_REVOCATION_SYNC_SECONDS", 10))
+
+    # Login/registration attempt limits (sliding window, per client IP and per email; 0 disables).
+    # Set RATE_LIMIT_REDIS_URL to share the counters between worker processes (needs `redis`).
+    AUTH_RATE_LIMIT_IP_ATTEMPTS: int = int(os.getenv("AUTH_RATE_LIMIT_IP_ATTEMPTS", 30))
+    AUTH_RATE_LIMIT_EMAIL_ATTEMPTS: int = int(os.getenv("AUTH_RATE_LIMIT_EMAIL_ATTEMPTS", 10))
+    AUTH_RATE_LIMIT_WINDOW_SECONDS: float = float(os.getenv("AUTH_RATE_LIMIT_WINDOW_SECONDS", 60))
+    RATE_LIMIT_REDIS_URL: str = os.getenv("RATE_LIMIT_REDIS_URL", "")
+    # Use X-Forwarded-For for the client IP (only behind a trusted reverse proxy)
+    TRUST_PROXY_HEADERS: bool = os.getenv("TRUST_PROXY_HEADERS", "false").lower() == "true"
+
+    # Google sign-in. id_tokens are verified locally against Google's signing keys (JWKS),
+    # which are cached for their max-age and refreshed in the background.
+    GOOGLE_CLIENT_ID: str = os.getenv("GOOGLE_CLIENT_ID")
+    GOOGLE_CLIENT_SECRET: str = os.getenv("GOOGLE_CLIENT_SECRET")
+    GOOGLE_REDIRECT_URI: str = os.getenv("GOOGLE_REDIRECT_URI")
+    GOOGLE_TOKEN_URL: str = os.getenv("GOOGLE_TOKEN_URL", "https://oauth2.googleapis.com/token")
+    GOOGLE_JWKS_URL: str = os.getenv("GOOGLE_JWKS_URL", "https://www.googleapis.com/oauth2/v3/certs")
+    GOOGLE_JWKS_REFRESH_INTERVAL_SECONDS: float = float(os.getenv("GOOGLE_JWKS_REFRESH_INTERVAL_SECONDS", 3600))
+
+    # Logging: "json" (one object per line) or "text". The access log records every request
+    # with probability ACCESS_LOG_SAMPLE_RATE, plus all 5xx and slow requests.
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
+    ACCESS_LOG_SAMPLE_RATE: float = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", 1.0))
+    ACCESS_LOG_SLOW_MS: float = float(os.getenv("ACCESS_LOG_SLOW_MS", 1000))
+
+    # Per-request query accounting: requests running more than DB_QUERY_BUDGET statements, or
+    # the same statement shape DB_REPEATED_QUERY_THRESHOLD times (N+1), are logged; with
+    # DB_QUERY_BUDGET_STRICT (tests) the offending query raises instead. 0 disables a check.
+    DB_QUERY_BUDGET: int = int(os.getenv("DB_QUERY_BUDGET", 25))
+    DB_REPEATED_QUERY_THRESHOLD: int = int(os.getenv("DB_REPEATED_QUERY_THRESHOLD", 5))
+    DB_QUERY_BUDGET_STRICT: bool = os.getenv("DB_QUERY_BUDGET_STRICT", "false").lower() == "true"
+    DB_SLOW_QUERY_MS: float = float(os.getenv("DB_SLOW_QUERY_MS", 200))
+
+    # Span tracing of the generation pipeline: "console" (application log), "file" or "none"
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "console")
+    TRACING_FILE: str = os.getenv("TRACING_FILE", "logs/spans.jsonl")
+
+    # Sampling profiler (admin API). PROFILING_SECRET also enables per-request profiling
+    # through a signed X-Profile-Request header; leave it unset to keep that middleware out.
+    PROFILING_SECRET: str = os.getenv("PROFILING_SECRET", "")
+    PROFILING_INTERVAL_MS: float = float(os.getenv("PROFILING_INTERVAL_MS", 5))
+    PROFILING_MAX_SECONDS: float = float(os.getenv("PROFILING_MAX_SECONDS", 60))
+
+    # n8n image-generation webhook (the load test points it at a local stub)
+    N8N_WEBHOOK_URL: str = os.getenv("N8N_WEBHOOK_URL", "http://n8n.nemone.store/webhook/c6ebe062-d352-491d-8da3-a5fe2d3f6949")
+
+    # Bearer token required to scrape /metrics (unset: open, e.g. when only reachable internally)
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+
     # Upload directory for user file uploads
     UPLOAD_DIRECTORY: str = os.getenv("UPLOAD_DIRECTORY", "app/static/files")
 
+    # Storage maintenance (deferred deletion queue and orphan reconciler)
+    STORAGE_DELETION_INTERVAL_SECONDS: float = float(os.getenv("STORAGE_DELETION_INTERVAL_SECONDS", 30))
+    STORAGE_DELETION_BATCH_SIZE: int = int(os.getenv("STORAGE_DELETION_BATCH_SIZE", 100))
+    STORAGE_RECONCILE_INTERVAL_SECONDS: float = float(os.getenv("STORAGE_RECONCILE_INTERVAL_SECONDS", 6 * 3600))
+    STORAGE_RECONCILE_RECLAIM: bool = os.getenv("STORAGE_RECONCILE_RECLAIM", "false").lower() == "true"
+    STORAGE_ORPHAN_GRACE_SECONDS: float = float(os.getenv("STORAGE_ORPHAN_GRACE_SECONDS", 3600))
+
+    # Near-duplicate image index: every worker reloads it fully at this interval, picking up
+    # hashes that incremental refreshes miss (backfilled, or committed late with a lower id)
+    NEAR_DUPLICATE_RELOAD_INTERVAL_SECONDS: float = float(os.getenv("NEAR_DUPLICATE_RELOAD_INTERVAL_SECONDS", 900))
+
+    # Embeds creations saved without an embedding (e.g. before the column existed)
+    EMBEDDING_BACKFILL_INTERVAL_SECONDS: float = float(os.getenv("EMBEDDING_BACKFILL_INTERVAL_SECONDS", 600))
+
+    # 'hot' feed ordering: a creation one half-life older needs twice the likes to rank level
+    HOT_HALF_LIFE_HOURS: float = float(os.getenv("HOT_HALF_LIFE_HOURS", 12))
+    HOT_SCORE_REFRESH_INTERVAL_SECONDS: float = float(os.getenv("HOT_SCORE_REFRESH_INTERVAL_SECONDS", 3600))
+
+    # Feed explorer facet counts: snapshot lifetime and full-recount interval
+    FACET_CACHE_TTL_SECONDS: float = float(os.getenv("FACET_CACHE_TTL_SECONDS", 60))
+    FACET_REBUILD_INTERVAL_SECONDS: float = float(os.getenv("FACET_REBUILD_INTERVAL_SECONDS", 6 * 3600))
+
+    # "For You" feed: creation_neighbors rebuild interval and the per-user list cache
+    RECOMMENDATIONS_REBUILD_INTERVAL_SECONDS: float = float(os.getenv("RECOMMENDATIONS_REBUILD_INTERVAL_SECONDS", 900))
+    FOR_YOU_CACHE_TTL_SECONDS: float = float(os.getenv("FOR_YOU_CACHE_TTL_SECONDS", 300))
+    FOR_YOU_CACHE_MAX_USERS: int = int(os.getenv("FOR_YOU_CACHE_MAX_USERS", 10_000))
+
+    # CSV analysis worker pool
+    ANALYSIS_POOL_SIZE: int = int(os.getenv("ANALYSIS_POOL_SIZE", 2))
+    ANALYSIS_JOB_TIMEOUT_SECONDS: float = float(os.getenv("ANALYSIS_JOB_TIMEOUT_SECONDS", 300))
+    ANALYSIS_WORKER_MEMORY_MB: int = int(os.getenv("ANALYSIS_WORKER_MEMORY_MB", 2048))  # 0 = unlimited
+    ANALYSIS_WORKER_MAX_TASKS: int = int(os.getenv("ANALYSIS_WORKER_MAX_TASKS", 50))
+    # How K is chosen: "silhouette" (scored on a sample) or "calinski_harabasz"
+    ANALYSIS_K_CRITERION: str = os.getenv("ANALYSIS_K_CRITERION", "silhouette")
+    # Encoded rows kept in memory per job; larger files are reservoir-sampled down to this
+    ANALYSIS_MEMORY_BUDGET_MB: int = int(os.getenv("ANALYSIS_MEMORY_BUDGET_MB", 256))
+    ANALYSIS_CHUNK_ROWS: int = int(os.getenv("ANALYSIS_CHUNK_ROWS", 50_000))
+    # Encoded uploads are kept here as Feather files for re-runs (not publicly served). Files no
+    # user references any more are deleted by the cache-eviction job (after STORAGE_ORPHAN_GRACE_SECONDS).
+    ANALYSIS_DATASET_DIR: str = os.getenv("ANALYSIS_DATASET_DIR", "data/datasets")
+    # Result cache keyed by file content + parameters. Bump the version to invalidate all entries.
+    ANALYSIS_CACHE_VERSION: str = os.getenv("ANALYSIS_CACHE_VERSION", "1")
+    ANALYSIS_CACHE_TTL_HOURS: float = float(os.getenv("ANALYSIS_CACHE_TTL_HOURS", 24 * 7))
+    ANALYSIS_CACHE_EVICT_INTERVAL_SECONDS: float = float(os.getenv("ANALYSIS_CACHE_EVICT_INTERVAL_SECONDS", 3600))
+
 settings = Settings()
@@ -5,7 +5,8 @@ from typing import Optional
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
-async def get_optional_user(request: Request, token: Optional[str] = Depends(oauth2_scheme)):
+async def get_token(request: Request, token: Optional[str] = Depends(oauth2_scheme)) -> Optional[str]:
+    """The bearer token from the Authorization header or the access_token cookie."""
     if not token:
         # Try to get from cookie
         cookie_token = request.cookies.get("access_token")
@@ -15,7 +16,9 @@ async def get_optional_user(request: Request, token: Optional[str] = Depends(oau
                 token = cookie_token.split(" ")[1]
             else:
                 token = cookie_token
-    
+    return token
+
+async def get_optional_user(token: Optional[str] = Depends(get_token)):
     if not token:
         return None
 
@@ -1,10 +1,13 @@
 import os
+import time
 import asyncpg
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 
 from app.config.settings import settings
+from app.services import metrics
+from app.services.query_tracing import TracingConnection
 
 load_dotenv()
 
@@ -16,10 +19,18 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 async def get_db_connection():
     if not DATABASE_URL:
         raise ValueError("DATABASE_URL environment variable is not set")
-    conn = await asyncpg.connect(DATABASE_URL)
+    start = time.perf_counter()
+    metrics.db_connections_connecting.inc()
+    try:
+        conn = await asyncpg.connect(DATABASE_URL, connection_class=TracingConnection)
+    finally:
+        metrics.db_connections_connecting.dec()
+    metrics.db_connect_duration.observe(time.perf_counter() - start)
+    metrics.db_connections_open.inc()
     try:
         yield conn
     finally:
+        metrics.db_connections_open.dec()
         await conn.close()
 
 # Synchronous SQLAlchemy session provider
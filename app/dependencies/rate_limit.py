@@ -0,0 +1,53 @@
+import logging
+from typing import Optional
+
+from fastapi import HTTPException, Request, status
+
+from app.config.settings import settings
+from app.services.rate_limiter import SlidingWindowLimiter, counters
+
+logger = logging.getLogger(__name__)
+
+
+def client_ip(request: Request) -> str:
+    if settings.TRUST_PROXY_HEADERS:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def _body_email(request: Request) -> Optional[str]:
+    # FastAPI has already read and cached the body for the endpoint's model; this re-reads the cache
+    try:
+        body = await request.json()
+    except Exception:
+        return None
+    email = body.get("email") if isinstance(body, dict) else None
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+def auth_rate_limit(action: str):
+    """
+    Route dependency limiting `action` attempts per client IP and per submitted email.
+    Use it in the route's `dependencies=[...]` so over-limit attempts are refused with 429
+    before the endpoint's DB connection is opened or any password is hashed.
+    """
+    async def dependency(request: Request):
+        window = settings.AUTH_RATE_LIMIT_WINDOW_SECONDS
+        checks = [(SlidingWindowLimiter(f"{action}:ip", settings.AUTH_RATE_LIMIT_IP_ATTEMPTS, window), client_ip(request))]
+        email = await _body_email(request)
+        if email:
+            checks.append((SlidingWindowLimiter(f"{action}:email", settings.AUTH_RATE_LIMIT_EMAIL_ATTEMPTS, window), email))
+
+        for limiter, key in checks:
+            allowed, retry_after = await limiter.hit(key)
+            counters[f"{limiter.name}.{'allowed' if allowed else 'rejected'}"] += 1
+            if not allowed:
+                logger.warning("Rate limit exceeded", extra={"limiter": limiter.name, "client_ip": client_ip(request)})
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many attempts. Please try again later.",
+                    headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+                )
+    return dependency
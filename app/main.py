@@ -2,12 +2,27 @@ from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, JSONResponse
 from app.config.settings import settings
+from app.config.logging_setup import setup_logging, shutdown_logging
 from app.middlewares.logging_middleware import LoggingMiddleware
+from app.middlewares.metrics_middleware import MetricsMiddleware
+from app.middlewares.query_tracing_middleware import QueryTracingMiddleware
+from app.middlewares.profiling_middleware import ProfilingMiddleware
 from app.routers import auth_router, analysis_router, admin_router, user_router, creation_router
-from app.routers import media_router
+from app.routers import media_router, metrics_router
+from app.services import scheduler, tracing, worker_pool
+from app.auth import google_oidc, jwt_handler, password_util
+from app.services.storage_service import run_deletion_queue_job, run_reconcile_job
+from app.services.analysis_service import run_cache_eviction_job
+from app.services.creation_embedding import run_embedding_backfill_job
+from app.services.image_hash import run_hash_index_reload_job
+from app.services.recommendations import run_neighbors_job
+from app.services.creations_service import run_hot_score_refresh_job
+from app.services.facets import run_facet_rebuild_job
 import os
 from contextlib import asynccontextmanager
 
+setup_logging()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # startup
@@ -16,18 +31,38 @@ async def lifespan(app: FastAPI):
         os.makedirs(upload_dir, exist_ok=True)
     except Exception:
         print(f"Warning: could not create upload directory '{upload_dir}'")
+    scheduler.start_periodic("storage-deletion", settings.STORAGE_DELETION_INTERVAL_SECONDS, run_deletion_queue_job, exclusive=True)
+    scheduler.start_periodic("storage-reconcile", settings.STORAGE_RECONCILE_INTERVAL_SECONDS, run_reconcile_job, exclusive=True)
+    scheduler.start_periodic("analysis-cache-eviction", settings.ANALYSIS_CACHE_EVICT_INTERVAL_SECONDS, run_cache_eviction_job, exclusive=True)
+    scheduler.start_periodic("near-duplicate-index-reload", settings.NEAR_DUPLICATE_RELOAD_INTERVAL_SECONDS, run_hash_index_reload_job)
+    scheduler.start_periodic("embedding-backfill", settings.EMBEDDING_BACKFILL_INTERVAL_SECONDS, run_embedding_backfill_job, exclusive=True)
+    scheduler.start_periodic("creation-neighbors", settings.RECOMMENDATIONS_REBUILD_INTERVAL_SECONDS, run_neighbors_job, exclusive=True)
+    scheduler.start_periodic("hot-score-refresh", settings.HOT_SCORE_REFRESH_INTERVAL_SECONDS, run_hot_score_refresh_job, exclusive=True)
+    scheduler.start_periodic("facet-rebuild", settings.FACET_REBUILD_INTERVAL_SECONDS, run_facet_rebuild_job, exclusive=True)
+    scheduler.start_periodic("token-revocation-sync", settings.TOKEN_REVOCATION_SYNC_SECONDS, jwt_handler.run_revocation_sync_job)
+    scheduler.start_periodic("google-jwks-refresh", settings.GOOGLE_JWKS_REFRESH_INTERVAL_SECONDS, google_oidc.run_jwks_refresh_job)
     print("Application started")
     try:
         yield
     finally:
         # shutdown
+        await scheduler.stop_all()
+        worker_pool.shutdown()
+        password_util.shutdown()
+        await google_oidc.shutdown()
+        tracing.shutdown()
         print("Application shutdown")
+        shutdown_logging()
 
 
 app = FastAPI(title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION, lifespan=lifespan)
 
 # Middleware
 app.add_middleware(LoggingMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(QueryTracingMiddleware)
+if settings.PROFILING_SECRET:
+    app.add_middleware(ProfilingMiddleware)
 
 # CORS Middleware
 # In production, this should be restricted to your frontend's actual domain.
@@ -61,6 +96,7 @@ app.include_router(admin_router.router)
 app.include_router(user_router.router)
 app.include_router(creation_router.router)
 app.include_router(media_router.router)
+app.include_router(metrics_router.router)
 
 # Static files for user uploads
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
@@ -1,23 +1,61 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi import Request
-import time
 import logging
-from datetime import datetime, timezone
-
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        response = await call_next(request)
-        process_time = time.time() - start_time
-        
-        # Add a custom header to verify if the server code is updated
-        # Use timezone-aware UTC datetime to avoid DeprecationWarning for utcnow()
-        response.headers["X-Server-Version"] = str(datetime.now(timezone.utc).timestamp())
-        
-        logger.info(
-            f"{request.method} {request.url.path} - {response.status_code} - {process_time:.4f}s"
-        )
-        return response
+import random
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config.settings import settings
+
+logger = logging.getLogger("app.access")
+
+
+class LoggingMiddleware:
+    """
+    Access log as a pure ASGI middleware: one structured record per HTTP request with
+    method, route template, status, latency and response size. Responses (including
+    streaming ones) pass through untouched.
+
+    Records are sampled at ACCESS_LOG_SAMPLE_RATE; server errors and requests slower than
+    ACCESS_LOG_SLOW_MS are always logged.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+        response_bytes = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if (
+                status_code >= 500
+                or duration_ms >= settings.ACCESS_LOG_SLOW_MS
+                or random.random() < settings.ACCESS_LOG_SAMPLE_RATE
+            ):
+                # The router leaves the matched route in the scope; its path template
+                # ("/api/creations/{creation_id}") keeps the field low-cardinality
+                route = scope.get("route")
+                logger.info("request", extra={
+                    "method": scope["method"],
+                    "route": getattr(route, "path", None),
+                    "path": scope["path"],
+                    "status": status_code,
+                    "duration_ms": round(duration_ms, 2),
+                    "response_bytes": response_bytes,
+                })
@@ -0,0 +1,40 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services import metrics
+
+
+class MetricsMiddleware:
+    """Counts HTTP requests and observes their latency per route template (pure ASGI)."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        raised = False
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            raised = True
+            raise
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            metrics.http_request_duration.observe(time.perf_counter() - start, method, route)
+            metrics.http_requests.inc(method, route, str(status_code))
+            if raised:
+                metrics.http_exceptions.inc(method, route)
@@ -0,0 +1,44 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config.settings import settings
+from app.services import profiler
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests that carry a valid signed X-Profile-Request header (see
+    app.services.profiler). Installed only when PROFILING_SECRET is set.
+
+    The event loop thread is shared, so concurrent requests show up in the same profile;
+    use it on a quiet worker or with a request that dominates the loop.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        header = next((v for k, v in scope["headers"] if k == profiler.PROFILE_HEADER), None)
+        if header is None or not profiler.verify_request_signature(scope["method"], scope["path"], header.decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+
+        sampler = profiler.SamplingProfiler(settings.PROFILING_INTERVAL_MS / 1000)
+        try:
+            sampler.start()
+        except profiler.ProfilerBusyError:
+            await self.app(scope, receive, send)
+            return
+        profile_id = profiler.store_request_profile(sampler)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
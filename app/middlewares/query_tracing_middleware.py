@@ -0,0 +1,36 @@
+import logging
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.services import metrics, query_tracing
+
+logger = logging.getLogger(__name__)
+
+
+class QueryTracingMiddleware:
+    """
+    Collects the database statements of each HTTP request (see app.services.query_tracing)
+    and logs requests that exceed the query budget or repeat a statement shape (N+1).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats, token = query_tracing.start_request()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            query_tracing.end_request(token)
+            if stats.count:
+                route = getattr(scope.get("route"), "path", None) or "unmatched"
+                metrics.db_queries_per_request.observe(stats.count, route)
+                problems = stats.problems()
+                if problems:
+                    logger.warning("Query budget exceeded", extra={
+                        "method": scope["method"], "route": route, "problems": problems, **stats.summary()
+                    })
@@ -0,0 +1,193 @@
+import asyncpg
+import json
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+# Summary columns only; the full result document is fetched one at a time
+HISTORY_FIELDS = "id, filename, filelink, cluster_count, total_users, created_at"
+
+
+class AnalysisRepository:
+    async def create_result(
+        self,
+        conn: asyncpg.Connection,
+        user_id: int,
+        filename: str,
+        filelink: str,
+        result: Dict[str, Any],
+        content_hash: Optional[str] = None,
+        cache_key: Optional[str] = None
+    ) -> int:
+        """Inserts an analysis result (with its summary columns) and returns its id."""
+        query = """
+            INSERT INTO analysis_results
+                (user_id, filename, filelink, result, cluster_count, total_users, content_hash, cache_key)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+            RETURNING id
+        """
+        return await conn.fetchval(
+            query, user_id, filename, filelink, json.dumps(result),
+            result.get("clusters"), result.get("total_users"), content_hash, cache_key
+        )
+
+    async def list_history(
+        self,
+        conn: asyncpg.Connection,
+        user_id: int,
+        limit: int,
+        before: Optional[Tuple[datetime, int]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Newest-first result summaries of a user, starting after the (created_at, id) keyset
+        `before`. Served by idx_analysis_results_user_created.
+        """
+        if before is None:
+            query = f"""
+                SELECT {HISTORY_FIELDS}
+                FROM analysis_results
+                WHERE user_id = $1
+                ORDER BY created_at DESC, id DESC
+                LIMIT $2
+            """
+            rows = await conn.fetch(query, user_id, limit)
+        else:
+            query = f"""
+                SELECT {HISTORY_FIELDS}
+                FROM analysis_results
+                WHERE user_id = $1 AND (created_at, id) < ($3, $4)
+                ORDER BY created_at DESC, id DESC
+                LIMIT $2
+            """
+            rows = await conn.fetch(query, user_id, limit, before[0], before[1])
+        return [dict(row) for row in rows]
+
+    async def get_result(self, conn: asyncpg.Connection, result_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+        """One full result of `user_id`, or None."""
+        query = f"""
+            SELECT {HISTORY_FIELDS}, result
+            FROM analysis_results
+            WHERE id = $1 AND user_id = $2
+        """
+        row = await conn.fetchrow(query, result_id, user_id)
+        if not row:
+            return None
+        record = dict(row)
+        if isinstance(record["result"], str):
+            record["result"] = json.loads(record["result"])
+        return record
+
+    async def get_cached_result(self, conn: asyncpg.Connection, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the newest result stored under `cache_key` (any user), or None.
+        Served by idx_analysis_results_cache_key.
+        """
+        query = """
+            SELECT filelink, result
+            FROM analysis_results
+            WHERE cache_key = $1
+            ORDER BY created_at DESC
+            LIMIT 1
+        """
+        row = await conn.fetchrow(query, cache_key)
+        if not row:
+            return None
+        result = row["result"]
+        return {"filelink": row["filelink"], "result": json.loads(result) if isinstance(result, str) else result}
+
+    async def evict_cache_entries(self, conn: asyncpg.Connection, max_age_hours: float) -> int:
+        """
+        Detaches rows older than `max_age_hours` from the cache. Rows stay in the users' history;
+        every cache hit inserts a fresh row, so frequently reused results keep being served.
+        """
+        status = await conn.execute(
+            """
+            UPDATE analysis_results
+            SET cache_key = NULL
+            WHERE cache_key IS NOT NULL
+              AND created_at < NOW() - make_interval(secs => $1)
+            """,
+            max_age_hours * 3600
+        )
+        return int(status.split()[-1])
+
+    async def get_referenced_dataset_hashes(self, conn: asyncpg.Connection, content_hashes: List[str]) -> Set[str]:
+        """The subset of `content_hashes` still recorded for at least one user."""
+        query = """
+            SELECT DISTINCT content_hash
+            FROM analysis_datasets
+            WHERE content_hash = ANY($1::char(64)[])
+        """
+        return {row["content_hash"] for row in await conn.fetch(query, content_hashes)}
+
+    async def upsert_dataset(
+        self,
+        conn: asyncpg.Connection,
+        user_id: int,
+        content_hash: str,
+        filename: str,
+        filelink: str,
+        dataset: Dict[str, Any]
+    ) -> int:
+        """Records the stored columnar copy of an upload for `user_id` and returns its id."""
+        query = """
+            INSERT INTO analysis_datasets
+                (user_id, content_hash, filename, filelink, path, columns, total_rows, analysed_rows, sampled, size_bytes)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+            ON CONFLICT (user_id, content_hash) DO UPDATE SET
+                filename = EXCLUDED.filename,
+                filelink = EXCLUDED.filelink,
+                path = EXCLUDED.path,
+                columns = EXCLUDED.columns,
+                total_rows = EXCLUDED.total_rows,
+                analysed_rows = EXCLUDED.analysed_rows,
+                sampled = EXCLUDED.sampled,
+                size_bytes = EXCLUDED.size_bytes
+            RETURNING id
+        """
+        return await conn.fetchval(
+            query, user_id, content_hash, filename, filelink, dataset["path"], json.dumps(dataset["columns"]),
+            dataset["total_rows"], dataset["analysed_rows"], dataset["sampled"], dataset["size_bytes"]
+        )
+
+    async def link_dataset(self, conn: asyncpg.Connection, user_id: int, content_hash: str, filename: str) -> Optional[int]:
+        """
+        Gives `user_id` access to a dataset already stored for the same content (by any user).
+        Returns the user's dataset id, or None if the content was never stored.
+        """
+        query = """
+            INSERT INTO analysis_datasets
+                (user_id, content_hash, filename, filelink, path, columns, total_rows, analysed_rows, sampled, size_bytes)
+            SELECT $1, content_hash, $3, filelink, path, columns, total_rows, analysed_rows, sampled, size_bytes
+            FROM analysis_datasets
+            WHERE content_hash = $2
+            ORDER BY created_at DESC
+            LIMIT 1
+            ON CONFLICT (user_id, content_hash) DO UPDATE SET filename = EXCLUDED.filename
+            RETURNING id
+        """
+        return await conn.fetchval(query, user_id, content_hash, filename)
+
+    async def get_dataset(self, conn: asyncpg.Connection, dataset_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+        query = """
+            SELECT id, content_hash, filename, filelink, path, columns, total_rows, analysed_rows, sampled, size_bytes, created_at
+            FROM analysis_datasets
+            WHERE id = $1 AND user_id = $2
+        """
+        row = await conn.fetchrow(query, dataset_id, user_id)
+        return self._dataset_from_row(row) if row else None
+
+    async def list_datasets(self, conn: asyncpg.Connection, user_id: int) -> List[Dict[str, Any]]:
+        query = """
+            SELECT id, content_hash, filename, filelink, path, columns, total_rows, analysed_rows, sampled, size_bytes, created_at
+            FROM analysis_datasets
+            WHERE user_id = $1
+            ORDER BY created_at DESC
+        """
+        rows = await conn.fetch(query, user_id)
+        return [self._dataset_from_row(row) for row in rows]
+
+    @staticmethod
+    def _dataset_from_row(row: asyncpg.Record) -> Dict[str, Any]:
+        dataset = dict(row)
+        dataset["columns"] = json.loads(dataset["columns"])
+        return dataset
@@ -1,5 +1,41 @@
 import asyncpg
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set
+
+from app.config.settings import settings
+
+# Reference point for hot scores (2024-01-01 UTC), keeps the time term small
+HOT_EPOCH = 1704067200
+
+
+def _hot_score_sql(likes: str, created_at: str, half_life_param: str) -> str:
+    """
+    Log-domain hot score: log2(1 + likes) + age / half_life. Newer creations start higher,
+    so a creation one half-life older needs twice the likes to rank level with a new one.
+    The score never changes with the passing of time, only with likes, so it can be indexed.
+    """
+    return (
+        f"(ln(1 + {likes}) / ln(2) + "
+        f"(EXTRACT(EPOCH FROM {created_at})::float8 - {HOT_EPOCH}) / {half_life_param}::float8)"
+    )
+
+
+def _hot_half_life_seconds() -> float:
+    return settings.HOT_HALF_LIFE_HOURS * 3600
+
+
+# Feed explorer facets: single-valued creation columns, plus comma-separated colors
+FACET_COLUMNS = ("gender", "age_group", "body_type", "style")
+# creation_facet_counts.tag for counts over all public creations
+ALL_TAGS = ""
+
+
+def _facet_rows(creation: Dict[str, Any]) -> List[tuple]:
+    """(tag, facet, value) rows a public creation contributes to creation_facet_counts."""
+    values = {(facet, creation[facet]) for facet in FACET_COLUMNS if creation.get(facet)}
+    values |= {("colors", c.strip(" ")) for c in (creation.get("colors") or "").split(",") if c.strip(" ")}
+    tags = {ALL_TAGS} | {t for t in (creation.get("tags_array") or []) if t}
+    return [(tag, facet, value) for tag in tags for facet, value in values]
+
 
 class CreationsRepository:
     async def create_creation(
@@ -19,36 +55,41 @@ class CreationsRepository:
         height: Optional[int] = None,
         body_type: Optional[str] = None,
         style: Optional[str] = None,
-        colors: Optional[str] = None
+        colors: Optional[str] = None,
+        phash: Optional[int] = None,
+        embedding: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Inserts a new creation record into the database with extended metadata.
         """
-        query = """
+        query = f"""
             INSERT INTO creations (
                 user_id, media_url, media_type, prompt, gender, age_group, is_public, 
                 analysis_text, recommendation_text, tags_array,
-                height, body_type, style, colors
+                height, body_type, style, colors, phash, embedding, hot_score
             )
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16::text::vector,
+                    {_hot_score_sql("0", "NOW()", "$17")})
             RETURNING 
                 id, user_id, media_url, media_type, prompt, gender, age_group, is_public, 
                 is_picked_by_admin, likes_count, created_at, analysis_text, recommendation_text, tags_array,
                 height, body_type, style, colors
         """
-        new_creation = await conn.fetchrow(
-            query, user_id, media_url, media_type, prompt, gender, age_group, is_public, 
-            analysis_text, recommendation_text, tags_array,
-            height, body_type, style, colors
-        )
+        async with conn.transaction():
+            new_creation = await conn.fetchrow(
+                query, user_id, media_url, media_type, prompt, gender, age_group, is_public, 
+                analysis_text, recommendation_text, tags_array,
+                height, body_type, style, colors, phash, embedding, _hot_half_life_seconds()
+            )
+            await self._adjust_facet_counts(conn, new_creation, 1)
         return dict(new_creation)
 
-    async def _select_all_creation_fields(self, conn: asyncpg.Connection, *, where_clause: Optional[str] = None, order_by_clause: str = "", limit: Optional[int] = None, offset: Optional[int] = None, params: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
-        query_base = """
+    async def _select_all_creation_fields(self, conn: asyncpg.Connection, *, where_clause: Optional[str] = None, order_by_clause: str = "", limit: Optional[int] = None, offset: Optional[int] = None, params: Optional[List[Any]] = None, extra_columns: str = "") -> List[Dict[str, Any]]:
+        query_base = f"""
             SELECT c.id, c.user_id, c.media_url, c.media_type, c.prompt, c.gender, c.age_group, 
                    c.is_public, c.is_picked_by_admin, c.likes_count, c.created_at, 
                    c.analysis_text, c.recommendation_text, c.tags_array,
-                   u.name as author_name, u.picture as author_picture
+                   u.name as author_name, u.picture as author_picture{extra_columns}
             FROM creations c
             JOIN users u ON c.user_id = u.id
         """
@@ -75,6 +116,43 @@ class CreationsRepository:
         result = await self._select_all_creation_fields(conn, where_clause="c.id = $1", limit=1, params=[creation_id])
         return result[0] if result else None
 
+    async def get_public_creations_by_ids(self, conn: asyncpg.Connection, creation_ids: List[int]) -> List[Dict[str, Any]]:
+        """
+        Retrieves public creations for the given IDs, in no particular order.
+        """
+        return await self._select_all_creation_fields(
+            conn,
+            where_clause="c.id = ANY($1::int[]) AND c.is_public = TRUE",
+            params=[creation_ids]
+        )
+
+    async def get_similar_creations(self, conn: asyncpg.Connection, creation_id: int, limit: int = 12) -> List[Dict[str, Any]]:
+        """
+        Retrieves the public creations whose embedding is nearest (cosine) to the given creation's,
+        nearest first, each with its cosine `distance`. The inner query is a plain
+        ORDER BY <=> LIMIT on creations so it is served by the HNSW index.
+        """
+        query = """
+            SELECT c.id, c.user_id, c.media_url, c.media_type, c.prompt, c.gender, c.age_group,
+                   c.is_public, c.is_picked_by_admin, c.likes_count, c.created_at,
+                   c.analysis_text, c.recommendation_text, c.tags_array,
+                   u.name as author_name, u.picture as author_picture,
+                   nn.distance
+            FROM (
+                SELECT id, embedding <=> (SELECT embedding FROM creations WHERE id = $1) AS distance
+                FROM creations
+                WHERE is_public = TRUE AND id <> $1 AND embedding IS NOT NULL
+                ORDER BY embedding <=> (SELECT embedding FROM creations WHERE id = $1)
+                LIMIT $2
+            ) nn
+            JOIN creations c ON c.id = nn.id
+            JOIN users u ON c.user_id = u.id
+            WHERE nn.distance IS NOT NULL
+            ORDER BY nn.distance, c.id
+        """
+        rows = await conn.fetch(query, creation_id, limit)
+        return [dict(row) for row in rows]
+
     async def get_user_creations(self, conn: asyncpg.Connection, user_id: int, limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
         """
         Retrieves all creations for a specific user, with pagination.
@@ -126,6 +204,48 @@ class CreationsRepository:
             # No params needed for this where_clause as it's a static condition
         )
 
+    async def get_hot_creations(
+        self,
+        conn: asyncpg.Connection,
+        limit: int = 10,
+        after_score: Optional[float] = None,
+        after_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieves public creations by hot score, highest first. Pages are keyset-paginated:
+        pass the last row's hot_score and id as after_score/after_id for the next page.
+        Served by idx_creations_hot.
+        """
+        if after_score is not None and after_id is not None:
+            return await self._select_all_creation_fields(
+                conn,
+                where_clause="c.is_public = TRUE AND (c.hot_score, c.id) < ($1, $2)",
+                order_by_clause="c.hot_score DESC, c.id DESC",
+                limit=limit,
+                params=[after_score, after_id],
+                extra_columns=", c.hot_score"
+            )
+        return await self._select_all_creation_fields(
+            conn,
+            where_clause="c.is_public = TRUE AND c.hot_score IS NOT NULL",
+            order_by_clause="c.hot_score DESC, c.id DESC",
+            limit=limit,
+            extra_columns=", c.hot_score"
+        )
+
+    async def refresh_hot_scores(self, conn: asyncpg.Connection) -> int:
+        """
+        Recomputes hot scores from likes_count, writing only rows whose score differs
+        (likes changed outside add_like/remove_like, or HOT_HALF_LIFE_HOURS changed).
+        Returns the number of rows updated.
+        """
+        score = _hot_score_sql("likes_count", "created_at", "$1")
+        status = await conn.execute(
+            f"UPDATE creations SET hot_score = {score} WHERE hot_score IS DISTINCT FROM {score}",
+            _hot_half_life_seconds()
+        )
+        return int(status.split()[-1])
+
     async def get_picked_creations(self, conn: asyncpg.Connection, limit: int = 9) -> List[Dict[str, Any]]:
         """
         Retrieves creations picked by admin for the home screen.
@@ -139,14 +259,26 @@ class CreationsRepository:
 
     async def increment_likes_count(self, conn: asyncpg.Connection, creation_id: int) -> Optional[Dict[str, Any]]:
         """Increments the likes_count for a creation."""
-        query = "UPDATE creations SET likes_count = likes_count + 1 WHERE id = $1 RETURNING likes_count"
-        result = await conn.fetchrow(query, creation_id)
+        query = f"""
+            UPDATE creations
+            SET likes_count = likes_count + 1,
+                hot_score = {_hot_score_sql("likes_count + 1", "created_at", "$2")}
+            WHERE id = $1
+            RETURNING likes_count
+        """
+        result = await conn.fetchrow(query, creation_id, _hot_half_life_seconds())
         return dict(result) if result else None
     
     async def decrement_likes_count(self, conn: asyncpg.Connection, creation_id: int) -> Optional[Dict[str, Any]]:
         """Decrements the likes_count for a creation."""
-        query = "UPDATE creations SET likes_count = GREATEST(0, likes_count - 1) WHERE id = $1 RETURNING likes_count"
-        result = await conn.fetchrow(query, creation_id)
+        query = f"""
+            UPDATE creations
+            SET likes_count = GREATEST(0, likes_count - 1),
+                hot_score = {_hot_score_sql("GREATEST(0, likes_count - 1)", "created_at", "$2")}
+            WHERE id = $1
+            RETURNING likes_count
+        """
+        result = await conn.fetchrow(query, creation_id, _hot_half_life_seconds())
         return dict(result) if result else None
 
     async def toggle_admin_pick(self, conn: asyncpg.Connection, creation_id: int, is_picked: bool) -> Optional[Dict[str, Any]]:
@@ -160,9 +292,83 @@ class CreationsRepository:
         Deletes a creation by its ID and returns the deleted record.
         """
         query = "DELETE FROM creations WHERE id = $1 RETURNING *"
-        deleted_creation = await conn.fetchrow(query, creation_id)
+        async with conn.transaction():
+            deleted_creation = await conn.fetchrow(query, creation_id)
+            if deleted_creation:
+                await self._adjust_facet_counts(conn, deleted_creation, -1)
         return dict(deleted_creation) if deleted_creation else None
 
+    async def _adjust_facet_counts(self, conn: asyncpg.Connection, creation: asyncpg.Record, delta: int):
+        """Adds `delta` to every facet count a public creation contributes to."""
+        if not creation["is_public"]:
+            return
+        rows = _facet_rows(dict(creation))
+        if not rows:
+            return
+        tags, facets, values = zip(*rows)
+        await conn.execute(
+            """
+            INSERT INTO creation_facet_counts (tag, facet, value, count)
+            SELECT tag, facet, value, $4
+            FROM unnest($1::text[], $2::text[], $3::text[]) AS f(tag, facet, value)
+            ON CONFLICT (tag, facet, value) DO UPDATE SET count = creation_facet_counts.count + EXCLUDED.count
+            """,
+            list(tags), list(facets), list(values), delta
+        )
+
+    async def get_facet_counts(self, conn: asyncpg.Connection, tag: str = ALL_TAGS) -> List[Dict[str, Any]]:
+        """Facet value counts over public creations, limited to those tagged `tag` ('' for all)."""
+        query = """
+            SELECT facet, value, count
+            FROM creation_facet_counts
+            WHERE tag = $1 AND count > 0
+            ORDER BY facet, count DESC, value
+        """
+        rows = await conn.fetch(query, tag)
+        return [dict(row) for row in rows]
+
+    async def rebuild_facet_counts(self, conn: asyncpg.Connection) -> int:
+        """
+        Recomputes creation_facet_counts from scratch (same rules as _facet_rows), correcting
+        any drift from the incremental updates. Returns the number of rows stored.
+        """
+        facet_selects = " UNION ".join(
+            f"SELECT id, '{facet}' AS facet, {facet}::text AS value FROM pub WHERE {facet} IS NOT NULL AND {facet} <> ''"
+            for facet in FACET_COLUMNS
+        )
+        query = f"""
+            INSERT INTO creation_facet_counts (tag, facet, value, count)
+            WITH pub AS (
+                SELECT id, gender, age_group, body_type, style, colors, tags_array
+                FROM creations
+                WHERE is_public = TRUE
+            ),
+            vals AS (
+                {facet_selects}
+                UNION
+                SELECT id, 'colors', btrim(color, ' ')
+                FROM pub, unnest(string_to_array(colors, ',')) AS color
+                WHERE btrim(color, ' ') <> ''
+            ),
+            tagged AS (
+                SELECT id, '{ALL_TAGS}' AS tag FROM pub
+                UNION
+                SELECT id, t FROM pub, unnest(tags_array) AS t WHERE t <> ''
+            )
+            SELECT tagged.tag, vals.facet, vals.value, COUNT(*)
+            FROM vals JOIN tagged USING (id)
+            GROUP BY tagged.tag, vals.facet, vals.value
+        """
+        async with conn.transaction():
+            # Holds off the incremental upserts until the rebuild commits. Without it, a
+            # concurrent create can insert a key between the DELETE and the INSERT (unique
+            # violation), or have its increment overwritten by counts from an older snapshot.
+            # Readers are not blocked.
+            await conn.execute("LOCK TABLE creation_facet_counts IN EXCLUSIVE MODE")
+            await conn.execute("DELETE FROM creation_facet_counts")
+            status = await conn.execute(query)
+        return int(status.split()[-1])
+
     async def add_like(self, conn: asyncpg.Connection, user_id: int, creation_id: int) -> bool:
         """Adds a like from a user to a creation. Returns True if liked, False if already liked."""
         try:
@@ -185,6 +391,14 @@ class CreationsRepository:
         query = "SELECT 1 FROM likes WHERE user_id = $1 AND creation_id = $2"
         return await conn.fetchval(query, user_id, creation_id) is not None
 
+    async def get_liked_ids(self, conn: asyncpg.Connection, user_id: int, creation_ids: List[int]) -> Set[int]:
+        """The subset of `creation_ids` the user has liked, in one query."""
+        if not creation_ids:
+            return set()
+        query = "SELECT creation_id FROM likes WHERE user_id = $1 AND creation_id = ANY($2::int[])"
+        rows = await conn.fetch(query, user_id, creation_ids)
+        return {row["creation_id"] for row in rows}
+
     async def get_recent_tags(self, conn: asyncpg.Connection, limit: int = 5) -> List[str]:
         """
         Retrieves a list of the most recent unique tags.
@@ -15,12 +15,13 @@ class MediaRepository:
         size_bytes: Optional[int],
         description: Optional[str] = None,
         tags_array: Optional[List[str]] = None,
+        phash: Optional[int] = None,
     ) -> Dict[str, Any]:
         query = text(
             """
             INSERT INTO media_files (
-                user_id, file_url, mime_type, original_name, size_bytes, description, tags_array
-            ) VALUES (:user_id, :file_url, :mime_type, :original_name, :size_bytes, :description, :tags_array)
+                user_id, file_url, mime_type, original_name, size_bytes, description, tags_array, phash
+            ) VALUES (:user_id, :file_url, :mime_type, :original_name, :size_bytes, :description, :tags_array, :phash)
             RETURNING id, user_id, file_url, mime_type, original_name, size_bytes, description, tags_array, created_at
             """
         )
@@ -34,6 +35,7 @@ class MediaRepository:
                 "size_bytes": size_bytes,
                 "description": description,
                 "tags_array": tags_array,
+                "phash": phash,
             },
         ).one()
         db.commit()
@@ -89,7 +91,15 @@ class MediaRepository:
         return dict(row._mapping)
 
     def delete_media(self, db: Session, media_id: int, user_id: int) -> bool:
-        query = text("DELETE FROM media_files WHERE id = :media_id AND user_id = :user_id")
-        result = db.execute(query, {"media_id": media_id, "user_id": user_id})
+        """
+        Deletes the row and queues its file for the storage deletion worker in the same transaction.
+        """
+        query = text("DELETE FROM media_files WHERE id = :media_id AND user_id = :user_id RETURNING file_url")
+        row = db.execute(query, {"media_id": media_id, "user_id": user_id}).one_or_none()
+        if row and row.file_url.startswith("/static/"):
+            db.execute(
+                text("INSERT INTO storage_deletion_queue (file_url, reason) VALUES (:file_url, 'media_deleted')"),
+                {"file_url": row.file_url},
+            )
         db.commit()
-        return result.rowcount == 1
+        return row is not None
@@ -0,0 +1,72 @@
+import asyncpg
+from typing import Dict, Any, List, Set
+
+
+class StorageRepository:
+    async def enqueue_deletion(self, conn: asyncpg.Connection, file_url: str, reason: str) -> None:
+        """Schedules a stored file for removal by the deletion worker."""
+        await conn.execute(
+            "INSERT INTO storage_deletion_queue (file_url, reason) VALUES ($1, $2)",
+            file_url, reason
+        )
+
+    async def enqueue_deletions(self, conn: asyncpg.Connection, file_urls: List[str], reason: str) -> None:
+        """Schedules several stored files for removal in one statement."""
+        if not file_urls:
+            return
+        await conn.execute(
+            "INSERT INTO storage_deletion_queue (file_url, reason) SELECT unnest($1::text[]), $2",
+            file_urls, reason
+        )
+
+    async def claim_deletion_batch(self, conn: asyncpg.Connection, batch_size: int) -> List[Dict[str, Any]]:
+        """
+        Locks up to `batch_size` due queue entries. Must be called inside a transaction;
+        SKIP LOCKED lets several workers drain the queue without blocking each other.
+        """
+        query = """
+            SELECT id, file_url, attempts
+            FROM storage_deletion_queue
+            WHERE next_attempt_at <= NOW()
+            ORDER BY id
+            LIMIT $1
+            FOR UPDATE SKIP LOCKED
+        """
+        rows = await conn.fetch(query, batch_size)
+        return [dict(row) for row in rows]
+
+    async def complete_deletions(self, conn: asyncpg.Connection, ids: List[int]) -> None:
+        """Removes processed entries from the queue."""
+        if ids:
+            await conn.execute("DELETE FROM storage_deletion_queue WHERE id = ANY($1::bigint[])", ids)
+
+    async def fail_deletion(self, conn: asyncpg.Connection, queue_id: int, error: str) -> None:
+        """Records a failed attempt and backs off exponentially (capped at one hour)."""
+        query = """
+            UPDATE storage_deletion_queue
+            SET attempts = attempts + 1,
+                last_error = $2,
+                next_attempt_at = NOW() + LEAST(POWER(2, attempts) * INTERVAL '30 seconds', INTERVAL '1 hour')
+            WHERE id = $1
+        """
+        await conn.execute(query, queue_id, error)
+
+    async def count_pending_deletions(self, conn: asyncpg.Connection) -> int:
+        return await conn.fetchval("SELECT COUNT(*) FROM storage_deletion_queue")
+
+    async def get_referenced_file_urls(self, conn: asyncpg.Connection) -> Set[str]:
+        """
+        Returns every file URL still referenced by a row, plus files already queued for deletion,
+        so the reconciler never reports them as orphans.
+        """
+        query = """
+            SELECT media_url AS url FROM creations
+            UNION
+            SELECT file_url FROM media_files
+            UNION
+            SELECT filelink FROM analysis_results WHERE filelink IS NOT NULL
+            UNION
+            SELECT file_url FROM storage_deletion_queue
+        """
+        rows = await conn.fetch(query)
+        return {row["url"] for row in rows}
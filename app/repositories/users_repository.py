@@ -1,6 +1,7 @@
 from app.dependencies.db_connection import get_db_connection
 from fastapi import Depends
 import asyncpg
+from datetime import datetime
 from typing import List, Dict, Any, Optional
 
 class UserRepository:
@@ -10,7 +11,7 @@ class UserRepository:
         pass
 
     async def get_user_by_email(self, conn: asyncpg.Connection, email: str) -> Optional[Dict[str, Any]]:
-        query = "SELECT id, email, name, picture, role, created_at, hashed_password FROM users WHERE email = $1"
+        query = "SELECT id, email, name, picture, role, created_at, hashed_password, token_version FROM users WHERE email = $1"
         user = await conn.fetchrow(query, email)
         return dict(user) if user else None
 
@@ -32,6 +33,47 @@ class UserRepository:
         """
         return await conn.fetchrow(query, email, name, picture, role, hashed_password)
 
+    async def upsert_oauth_user(self, conn: asyncpg.Connection, email: str, name: str, picture: Optional[str]) -> Dict[str, Any]:
+        """
+        Returns the user with `email`, creating it first if needed, in one statement.
+        An existing user keeps their name and role; a missing picture is filled in.
+        """
+        query = """
+            INSERT INTO users (email, name, picture, role, hashed_password)
+            VALUES ($1, $2, $3, 'MEMBER', NULL)
+            ON CONFLICT (email) DO UPDATE SET picture = COALESCE(users.picture, EXCLUDED.picture)
+            RETURNING id, email, name, picture, role, created_at, token_version
+        """
+        user = await conn.fetchrow(query, email, name, picture)
+        return dict(user)
+
+    async def update_password_hash(self, conn: asyncpg.Connection, user_id: int, hashed_password: str) -> None:
+        await conn.execute("UPDATE users SET hashed_password = $2 WHERE id = $1", user_id, hashed_password)
+
+    async def increment_token_version(self, conn: asyncpg.Connection, user_id: int) -> Optional[int]:
+        """Bumps the user's token version (revoking their tokens); None if there is no such user."""
+        return await conn.fetchval(
+            "UPDATE users SET token_version = token_version + 1 WHERE id = $1 RETURNING token_version", user_id
+        )
+
+    async def get_token_versions(self, conn: asyncpg.Connection) -> Dict[int, int]:
+        """Token versions of the users who ever had their tokens revoked."""
+        rows = await conn.fetch("SELECT id, token_version FROM users WHERE token_version > 0")
+        return {row["id"]: row["token_version"] for row in rows}
+
+    async def add_revoked_token(self, conn: asyncpg.Connection, digest: bytes, expires_at: datetime) -> None:
+        """Records a revoked token and forgets the ones that have expired since."""
+        async with conn.transaction():
+            await conn.execute(
+                "INSERT INTO revoked_tokens (digest, expires_at) VALUES ($1, $2) ON CONFLICT (digest) DO NOTHING",
+                digest, expires_at
+            )
+            await conn.execute("DELETE FROM revoked_tokens WHERE expires_at <= NOW()")
+
+    async def get_revoked_tokens(self, conn: asyncpg.Connection) -> Dict[bytes, datetime]:
+        rows = await conn.fetch("SELECT digest, expires_at FROM revoked_tokens WHERE expires_at > NOW()")
+        return {bytes(row["digest"]): row["expires_at"] for row in rows}
+
     async def get_creations_by_user_id(self, conn: asyncpg.Connection, user_id: int) -> List[Dict[str, Any]]:
         """
         Retrieves all creations for a specific user, ordered by the most recent.
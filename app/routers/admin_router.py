@@ -1,10 +1,16 @@
-from fastapi import APIRouter, Depends, Request, HTTPException, status
+import time
+from fastapi import APIRouter, Depends, Request, HTTPException, Response, status
+from fastapi.responses import JSONResponse
 from app.dependencies.auth import get_current_admin
 from app.dependencies.db_connection import get_db_connection
 from app.services.users_service import UserService
 from app.services.creations_service import CreationsService # Import CreationsService
+from app.services.storage_service import StorageService
+from app.auth.jwt_handler import revoke_user_tokens, token_cache_stats
+from app.config.settings import settings
+from app.services import profiler, rate_limiter
 import asyncpg
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Literal, Optional
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -35,6 +41,35 @@ async def get_user_by_id_admin(
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
+@router.post("/users/{user_id}/revoke-tokens")
+async def revoke_user_tokens_admin(
+    user_id: int,
+    admin_user: dict = Depends(get_current_admin), # Ensures admin access
+    conn: asyncpg.Connection = Depends(get_db_connection)
+):
+    """
+    Invalidates every token issued to the user so far; they must log in again.
+    Other workers apply it within TOKEN_REVOCATION_SYNC_SECONDS.
+    """
+    token_version = await revoke_user_tokens(conn, user_id)
+    if token_version is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return {"user_id": user_id, "token_version": token_version}
+
+@router.get("/auth/token-cache")
+async def get_token_cache_stats(admin_user: dict = Depends(get_current_admin)):
+    """
+    Size and hit/miss counters of the verified-token cache.
+    """
+    return token_cache_stats()
+
+@router.get("/auth/rate-limits")
+async def get_rate_limit_counters(admin_user: dict = Depends(get_current_admin)):
+    """
+    Allowed/rejected attempt counters of the login and registration rate limiters (this process).
+    """
+    return dict(rate_limiter.counters)
+
 @router.get("/creations/picked", response_model=List[Dict[str, Any]])
 async def get_admin_picked_creations(
     creations_service: CreationsService = Depends(),
@@ -73,4 +108,94 @@ async def get_users_count_admin(
     Retrieves the total number of users.
     """
     users_count = await conn.fetchval("SELECT COUNT(*) FROM users")
-    return {"users_count": users_count}
\ No newline at end of file
+    return {"users_count": users_count}
+
+@router.get("/storage/orphans")
+async def get_storage_orphans(
+    storage_service: StorageService = Depends(),
+    conn: asyncpg.Connection = Depends(get_db_connection),
+    admin_user: dict = Depends(get_current_admin) # Ensures admin access
+):
+    """
+    Reports stored files that no creation, media file or analysis result references.
+    """
+    return await storage_service.reconcile(conn, reclaim=False)
+
+@router.post("/storage/reconcile")
+async def reconcile_storage(
+    reclaim: bool = False,
+    storage_service: StorageService = Depends(),
+    conn: asyncpg.Connection = Depends(get_db_connection),
+    admin_user: dict = Depends(get_current_admin) # Ensures admin access
+):
+    """
+    Runs the orphan sweep now. With reclaim=true, orphaned files are queued for deletion.
+    """
+    return await storage_service.reconcile(conn, reclaim=reclaim)
+
+
+# --- Sampling profiler ---
+
+def _profile_response(sampler: profiler.SamplingProfiler, format: str, name: str) -> Response:
+    if format == "folded":
+        return Response(sampler.to_folded(), media_type="text/plain; charset=utf-8")
+    if format == "stats":
+        return JSONResponse(sampler.stats())
+    return JSONResponse(
+        sampler.to_speedscope(name),
+        headers={"Content-Disposition": f'attachment; filename="{name}.speedscope.json"'},
+    )
+
+@router.post("/profile")
+async def profile_process(
+    seconds: float = 10,
+    interval_ms: float = settings.PROFILING_INTERVAL_MS,
+    format: Literal["speedscope", "folded", "stats"] = "speedscope",
+    include_idle: bool = False,
+    all_threads: bool = False,
+    admin_user: dict = Depends(get_current_admin)
+):
+    """
+    Samples this worker process for `seconds` and returns a speedscope profile
+    (open it at https://www.speedscope.app) or folded stacks for flamegraph.pl.
+    Only the event loop thread is sampled unless `all_threads`.
+    """
+    seconds = max(0.1, min(seconds, settings.PROFILING_MAX_SECONDS))
+    interval = max(1.0, interval_ms) / 1000
+    try:
+        sampler = await profiler.profile_for(seconds, interval, include_idle, all_threads)
+    except profiler.ProfilerBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return _profile_response(sampler, format, f"process-{int(time.time())}")
+
+@router.post("/profile/request-token")
+async def create_profile_request_token(
+    method: str,
+    path: str,
+    ttl_seconds: int = 300,
+    admin_user: dict = Depends(get_current_admin)
+):
+    """
+    Returns a signed X-Profile-Request header value; a `method` `path` request carrying it
+    before it expires is profiled, and its profile id comes back in X-Profile-Id.
+    """
+    if not settings.PROFILING_SECRET:
+        raise HTTPException(status_code=400, detail="Per-request profiling is disabled (PROFILING_SECRET is not set)")
+    expires = int(time.time()) + max(1, min(ttl_seconds, 3600))
+    return {"header": "X-Profile-Request", "value": profiler.sign_request(method, path, expires), "expires": expires}
+
+@router.get("/profile/requests")
+async def list_request_profiles(admin_user: dict = Depends(get_current_admin)):
+    """Recently captured per-request profiles, newest last."""
+    return [{"id": profile_id, **sampler.stats()} for profile_id, sampler in profiler.request_profiles.items()]
+
+@router.get("/profile/requests/{profile_id}")
+async def get_request_profile(
+    profile_id: str,
+    format: Literal["speedscope", "folded", "stats"] = "speedscope",
+    admin_user: dict = Depends(get_current_admin)
+):
+    sampler = profiler.request_profiles.get(profile_id)
+    if sampler is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return _profile_response(sampler, format, f"request-{profile_id}")
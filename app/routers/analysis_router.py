@@ -1,32 +1,255 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
-from app.services.analysis_service import AnalysisService
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+from app.services.analysis_service import AnalysisService, RerunPlan, SavedUpload
+from app.services import clustering, dataset_store, metrics, task_manager
 from app.dependencies.auth import get_current_user
+from app.config.settings import settings
 from app.dependencies.db_connection import get_db_connection
 import asyncpg
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/analysis", tags=["analysis"])
 
+
+class RerunRequest(BaseModel):
+    k: Optional[int] = Field(default=None, ge=2, le=20, description=f"Fixed number of clusters; searched in {clustering.K_CANDIDATES.start}-{clustering.K_CANDIDATES[-1]} when omitted")
+    columns: Optional[List[str]] = Field(default=None, description="Feature columns to use; all when omitted")
+    exclude_columns: List[str] = Field(default_factory=list)
+    scaler: Literal["standard", "minmax", "robust", "none"] = "standard"
+
+
+class SimulateBatchRequest(BaseModel):
+    messages: List[str] = Field(..., min_length=1, max_length=500)
+    personas: List[dict] = Field(..., min_length=1, max_length=50)
+    seed: int = 0
+
+
+# --- Background Task Logic ---
+async def _run_tracked_job(task_id: str, job: str, compute, persist, db_conn_str: str):
+    """
+    Runs `compute()` and then `persist(conn, result)`, recording the outcome on the task.
+    The DB connection is opened only for the persist step, so none is held during the clustering.
+    """
+    task_manager.update_task_status(task_id, status="processing")
+    started = time.perf_counter()
+    outcome = "failed"
+    conn = None
+    try:
+        result = await compute()
+        conn = await asyncpg.connect(db_conn_str)
+        result = await persist(conn, result)
+        task_manager.update_task_status(task_id, status="completed", result=result)
+        outcome = "completed"
+    except HTTPException as e:
+        task_manager.update_task_status(task_id, status="failed", result={"error": e.detail, "status_code": e.status_code})
+    except Exception:
+        logger.exception("Analysis task %s failed", task_id)
+        task_manager.update_task_status(task_id, status="failed", result={"error": "Analysis failed"})
+    finally:
+        metrics.analysis_job_duration.observe(time.perf_counter() - started, job, outcome)
+        if conn:
+            await conn.close()
+
+
+async def run_analysis_job(
+    task_id: str,
+    upload: SavedUpload,
+    filename: str,
+    user: dict,
+    service: AnalysisService,
+    db_conn_str: str  # Pass connection string instead of connection object
+):
+    async def compute():
+        return await service.analyze(upload.path, task_id=task_id, dataset_path=dataset_store.dataset_path(upload.content_hash))
+
+    async def persist(conn, result):
+        dataset_id = await service.save_result(conn, user, filename, upload, result, task_id=task_id)
+        return {**result, "dataset_id": dataset_id}
+
+    await _run_tracked_job(task_id, "analysis", compute, persist, db_conn_str)
+
+
+async def run_rerun_job(task_id: str, plan: RerunPlan, user: dict, service: AnalysisService, db_conn_str: str):
+    async def compute():
+        return await service.rerun(plan, task_id=task_id)
+
+    async def persist(conn, result):
+        await service.save_rerun_result(conn, user, plan, result, task_id=task_id)
+        return result
+
+    await _run_tracked_job(task_id, "rerun", compute, persist, db_conn_str)
+
+
+def _get_owned_analysis_task(task_id: str, current_user: dict) -> dict:
+    task = task_manager.get_task(task_id)
+    if not task or task.get("kind") != "analysis" or task.get("owner_id") != int(current_user["sub"]):
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    return task
+
+
+def _job_view(task_id: str, task: dict) -> dict:
+    return {
+        "task_id": task_id,
+        "status": task["status"],
+        "progress": task.get("progress"),
+        "result": task["result"],
+    }
+
+
 @router.post("/upload")
 async def upload_csv(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: dict = Depends(get_current_user),
     analysis_service: AnalysisService = Depends(),
     conn: asyncpg.Connection = Depends(get_db_connection)
 ):
+    """
+    Saves the CSV and starts the clustering as a background job.
+    Returns the job id at once; poll /jobs/{task_id} or subscribe to /jobs/{task_id}/events.
+    A file already analysed with the same parameters is answered from the result cache:
+    the job is created completed and the result is returned inline.
+    """
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Invalid file format. Please upload a CSV file.")
-    
+
     try:
-        result = await analysis_service.process_csv(file, current_user, conn)
-        return result
+        upload = await analysis_service.save_upload(file)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    task_id = task_manager.create_task(kind="analysis", owner_id=int(current_user["sub"]))
+    cached = await analysis_service.get_cached_result(conn, upload, current_user, file.filename)
+    if cached is not None:
+        task_manager.update_task_status(task_id, status="completed", result=cached)
+        return {"task_id": task_id, "cached": True, "result": cached}
+
+    task_manager.update_task_progress(task_id, "queued", 0)
+    background_tasks.add_task(
+        run_analysis_job, task_id, upload, file.filename, current_user, analysis_service, settings.DATABASE_URL
+    )
+    return {"task_id": task_id, "cached": False}
+
+@router.get("/history")
+async def get_analysis_history(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+    analysis_service: AnalysisService = Depends(),
+    conn: asyncpg.Connection = Depends(get_db_connection)
+):
+    """
+    Cursor-paginated summaries of the user's past analyses (no persona documents).
+    Returns {"items": [...], "next_cursor": str | null}.
+    """
+    return await analysis_service.get_history(conn, current_user, limit, cursor)
+
+@router.get("/history/{result_id}")
+async def get_analysis_result(
+    result_id: int,
+    current_user: dict = Depends(get_current_user),
+    analysis_service: AnalysisService = Depends(),
+    conn: asyncpg.Connection = Depends(get_db_connection)
+):
+    """One past analysis with its full result."""
+    return await analysis_service.get_history_result(conn, current_user, result_id)
+
+@router.get("/datasets")
+async def list_datasets(
+    current_user: dict = Depends(get_current_user),
+    analysis_service: AnalysisService = Depends(),
+    conn: asyncpg.Connection = Depends(get_db_connection)
+):
+    """Stored datasets of the current user that can be re-run without re-uploading."""
+    return await analysis_service.list_datasets(conn, current_user)
+
+@router.post("/datasets/{dataset_id}/rerun")
+async def rerun_dataset(
+    dataset_id: int,
+    payload: RerunRequest,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user),
+    analysis_service: AnalysisService = Depends(),
+    conn: asyncpg.Connection = Depends(get_db_connection)
+):
+    """
+    Re-clusters a stored dataset with a fixed K, a column selection and/or another scaler.
+    Runs as a job like /upload, and is answered from the result cache when possible.
+    """
+    plan = await analysis_service.prepare_rerun(
+        conn, dataset_id, current_user, payload.k, payload.columns, payload.exclude_columns, payload.scaler
+    )
+    task_id = task_manager.create_task(kind="analysis", owner_id=int(current_user["sub"]))
+    cached = await analysis_service.get_cached_rerun(conn, plan, current_user)
+    if cached is not None:
+        task_manager.update_task_status(task_id, status="completed", result=cached)
+        return {"task_id": task_id, "cached": True, "result": cached}
+
+    task_manager.update_task_progress(task_id, "queued", 0)
+    background_tasks.add_task(run_rerun_job, task_id, plan, current_user, analysis_service, settings.DATABASE_URL)
+    return {"task_id": task_id, "cached": False}
+
+@router.get("/jobs/{task_id}")
+async def get_analysis_job(task_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    Returns the status, current stage and percent complete of an analysis job,
+    and the persona result once it has completed.
+    """
+    task = _get_owned_analysis_task(task_id, current_user)
+    return _job_view(task_id, task)
+
+@router.get("/jobs/{task_id}/events")
+async def stream_analysis_job(task_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    Server-sent events stream of job updates. Ends after the completed/failed event.
+    """
+    _get_owned_analysis_task(task_id, current_user)
+
+    async def events():
+        version = task_manager.get_task_version(task_id)
+        task = task_manager.get_task(task_id)
+        yield f"data: {json.dumps(_job_view(task_id, task))}\n\n"
+        while task["status"] not in task_manager.TERMINAL_STATUSES:
+            # Changes made while this generator was suspended in `yield` show up in the version
+            latest = await task_manager.wait_for_update(task_id, version, timeout=15)
+            if latest == version:
+                yield ": keep-alive\n\n"
+                continue
+            version = latest
+            task = task_manager.get_task(task_id)
+            if task is None:
+                return
+            yield f"data: {json.dumps(_job_view(task_id, task))}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @router.post("/simulate-message")
 async def simulate_message(
     payload: dict,
     current_user: dict = Depends(get_current_user),
     analysis_service: AnalysisService = Depends()
 ):
-    # payload: {"message": "...", "personas": [...]}
-    return await analysis_service.simulate_message(payload["message"], payload["personas"])
+    # payload: {"message": "...", "personas": [...], "seed": 0}
+    return await analysis_service.simulate_message(payload["message"], payload["personas"], payload.get("seed", 0))
+
+@router.post("/simulate-batch")
+async def simulate_batch(
+    payload: SimulateBatchRequest,
+    current_user: dict = Depends(get_current_user),
+    analysis_service: AnalysisService = Depends()
+):
+    """
+    Scores every message against every persona. Streams one NDJSON row per pair:
+    {"message_index", "persona_id", "reaction", "score", "reason", "suggestion"}.
+    The same seed always gives the same reactions.
+    """
+    return StreamingResponse(
+        analysis_service.simulate_batch(payload.messages, payload.personas, payload.seed),
+        media_type="application/x-ndjson"
+    )
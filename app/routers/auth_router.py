@@ -1,14 +1,21 @@
+import logging
 import os
 import httpx
-from fastapi import APIRouter, Depends, Request, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import RedirectResponse, JSONResponse
 from pydantic import BaseModel, EmailStr
 
 from app.dependencies.db_connection import get_db_connection
 from app.services.users_service import UserService
-from app.auth.jwt_handler import create_access_token
+from app.auth.jwt_handler import create_access_token, revoke_token
+from app.dependencies.auth import get_token
+from app.dependencies.rate_limit import auth_rate_limit
+from app.auth.google_oidc import GoogleAuthError, GoogleOIDC, get_google_oidc
+from app.config.settings import settings
 import asyncpg
 
+logger = logging.getLogger(__name__)
+
 # All routes in this file will be prefixed with /auth
 router = APIRouter(prefix="/auth", tags=["auth"])
 # Public router (no prefix) for OAuth callback without /auth in path
@@ -28,7 +35,7 @@ class UserLogin(BaseModel):
 
 # --- Email/Password Authentication ---
 
-@router.post("/register")
+@router.post("/register", dependencies=[Depends(auth_rate_limit("register"))])
 async def register_user(
     user_data: UserCreate, 
     user_service: UserService = Depends(),
@@ -45,7 +52,7 @@ async def register_user(
     del user_dict["hashed_password"]
     return JSONResponse(status_code=status.HTTP_201_CREATED, content=user_dict)
 
-@router.post("/login")
+@router.post("/login", dependencies=[Depends(auth_rate_limit("login"))])
 async def login_user(
     form_data: UserLogin,
     user_service: UserService = Depends(),
@@ -66,16 +73,25 @@ async def login_user(
         "role": user["role"],
         "name": user["name"],
         "picture": user["picture"]
-    })
+    }, token_version=user["token_version"])
 
     return {"access_token": jwt_token, "token_type": "bearer"}
 
 
+@router.post("/logout")
+async def logout_user(token: str = Depends(get_token), conn: asyncpg.Connection = Depends(get_db_connection)):
+    """Revokes the presented token."""
+    if token:
+        await revoke_token(conn, token)
+    response = JSONResponse(content={"message": "Logged out"})
+    response.delete_cookie("access_token")
+    return response
+
+
 # --- Google OAuth2 Authentication ---
 
-GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
-GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
-GOOGLE_REDIRECT_URI = os.getenv("GOOGLE_REDIRECT_URI")
+GOOGLE_CLIENT_ID = settings.GOOGLE_CLIENT_ID
+GOOGLE_REDIRECT_URI = settings.GOOGLE_REDIRECT_URI
 FRONTEND_REDIRECT_URI = os.getenv("FRONTEND_REDIRECT_URI", "http://localhost:5173/") # Default for React dev server
 
 @router.get("/login/google")
@@ -86,77 +102,43 @@ async def login_google():
 
 @router.get("/rest/oauth2-credential/callback")
 @public_router.get("/rest/oauth2-credential/callback")
-async def google_callback(code: str, request: Request, user_service: UserService = Depends(), conn: asyncpg.Connection = Depends(get_db_connection)):
-    import traceback
+async def google_callback(
+    code: str,
+    user_service: UserService = Depends(),
+    google: GoogleOIDC = Depends(get_google_oidc),
+    conn: asyncpg.Connection = Depends(get_db_connection)
+):
     try:
-        print("DEBUG: google_callback function entered - testing file update!")
-        token_url = "https://oauth2.googleapis.com/token"
-        data = {
-            "code": code,
-            "client_id": GOOGLE_CLIENT_ID,
-            "client_secret": GOOGLE_CLIENT_SECRET,
-            "redirect_uri": GOOGLE_REDIRECT_URI,
-            "grant_type": "authorization_code",
-        }
+        # Token exchange, then the id_token is verified locally (no userinfo call)
+        claims = await google.authenticate(code)
+    except GoogleAuthError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except httpx.HTTPError as e:
+        logger.warning("Google sign-in request failed: %s", e)
+        raise HTTPException(status_code=502, detail="Could not reach Google")
+
+    user = await user_service.get_or_create_user(conn, claims["email"], claims.get("name"), claims.get("picture"))
+    if not user or not user.get("id"):
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to retrieve or create user with a valid ID."
+        )
 
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(token_url, data=data)
-            if response.status_code != 200:
-                # Log Google token endpoint failure for debugging
-                try:
-                    resp_text = response.text
-                except Exception:
-                    resp_text = '<no response body>'
-                print(f"DEBUG: Google token endpoint returned {response.status_code}: {resp_text}")
-                # Try to extract JSON error if present
-                try:
-                    err_json = response.json()
-                    err_msg = err_json.get('error_description') or err_json.get('error') or str(err_json)
-                except Exception:
-                    err_msg = resp_text
-                raise HTTPException(status_code=400, detail=f"Failed to get token from Google: {err_msg}")
-
-            token_data = response.json()
-            access_token = token_data.get("access_token")
-            
-            user_info_response = await client.get("https://www.googleapis.com/oauth2/v2/userinfo", headers={"Authorization": f"Bearer {access_token}"})
-            user_info = user_info_response.json()
-            
-            email = user_info.get("email")
-            name = user_info.get("name")
-            picture = user_info.get("picture")
-            
-            user = await user_service.get_or_create_user(conn, email, name, picture)
-
-            if not user or not user.get("id"):
-                raise HTTPException(
-                    status_code=500, 
-                    detail="Failed to retrieve or create user with a valid ID."
-                )
-            
-            # Create JWT
-            jwt_token = create_access_token({
-                "sub": str(user["id"]),
-                "email": user["email"],
-                "role": user["role"],
-                "name": user["name"],
-                "picture": user["picture"]
-            })
-            
-            # Instead of redirecting and setting cookie, return JSON response
-            return JSONResponse(
-                status_code=status.HTTP_200_OK,
-                content={
-                    "access_token": jwt_token,
-                    "token_type": "bearer",
-                    "redirect_to": f"{FRONTEND_REDIRECT_URI}#access_token={jwt_token}"
-                }
-            )
-    except HTTPException:
-        # re-raise HTTPExceptions so FastAPI can handle them normally (they will be JSON)
-        raise
-    except Exception as e:
-        # Log full traceback for server-side debugging, but return a safe JSON error to client
-        tb = traceback.format_exc()
-        print(f"Error in google_callback: {e}\n{tb}")
-        return JSONResponse(status_code=500, content={"detail": "Internal server error"})
+    # Create JWT
+    jwt_token = create_access_token({
+        "sub": str(user["id"]),
+        "email": user["email"],
+        "role": user["role"],
+        "name": user["name"],
+        "picture": user["picture"]
+    }, token_version=user["token_version"])
+
+    # Instead of redirecting and setting cookie, return JSON response
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "access_token": jwt_token,
+            "token_type": "bearer",
+            "redirect_to": f"{FRONTEND_REDIRECT_URI}#access_token={jwt_token}"
+        }
+    )
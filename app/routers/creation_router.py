@@ -4,7 +4,10 @@ from app.services.creations_service import CreationsService
 from app.services.users_service import UserService
 from app.dependencies.auth import get_current_user, get_current_admin, get_optional_user
 from app.dependencies.db_connection import get_db_connection
-from app.services import task_manager
+from app.config.settings import settings
+from app.services import metrics, task_manager, tracing
+from app.services.image_hash import creation_hash_index, dhash_async, DEFAULT_MAX_DISTANCE
+from app.services.creation_embedding import embedding_literal
 import asyncpg
 import httpx
 import io
@@ -14,8 +17,12 @@ import json # Import json module
 import os # Import os module for file operations
 import uuid # Import uuid for unique filename generation
 import re # Import re module for regex parsing
+import time
+import logging
 from typing import List, Dict, Any, Optional
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/api", tags=["creations"])
 
 # --- Helper function to convert base64 to a Blob-like object ---
@@ -59,144 +66,156 @@ async def process_creation_task(
     form_data: dict,
     user_id: int,
     service: CreationsService,
-    db_conn_str: str  # Pass connection string instead of connection object
+    db_conn_str: str,  # Pass connection string instead of connection object
+    trace_parent: Optional[tracing.SpanContext] = None  # The create_task request span, to continue its trace
 ):
     task_manager.update_task_status(task_id, status="processing")
     
     # Recreate a connection for the background task
     conn = None
     try:
-        conn = await asyncpg.connect(db_conn_str)
-        
-        # Initialize data and files dictionaries for httpx multipart request
-        httpx_data = {}
-        httpx_files = {}
-
-        # Extract all relevant data from form_data dictionary
-        prompt = form_data.get("prompt", "N/A")
-        gender = form_data.get("gender")
-        age_group = form_data.get("age_group")
-        is_public = form_data.get("is_public", True)
-        height = form_data.get("height")
-        body_type = form_data.get("body_type")
-        style = form_data.get("style")
-        colors = form_data.get("colors")
-
-        # Add all extracted text data to the httpx_data to be sent to the webhook
-        if prompt: httpx_data['prompt'] = prompt
-        if gender: httpx_data['gender'] = gender
-        if age_group: httpx_data['age_group'] = age_group
-        if height: httpx_data['height'] = height
-        if body_type: httpx_data['body_type'] = body_type
-        if style: httpx_data['style'] = style
-        if colors: httpx_data['colors'] = colors
-
-        # Handle image by preparing it for the 'files' parameter in a multipart request
-        if 'image' in form_data and form_data['image']:
-            image_info = form_data['image']
-            httpx_files['image'] = (image_info['filename'], io.BytesIO(image_info['content']), image_info['content_type'])
-        
+        with task_manager.stage(task_id, "process", parent=trace_parent):
+            with task_manager.stage(task_id, "db_connect"):
+                conn = await asyncpg.connect(db_conn_str)
+            
+            # Initialize data and files dictionaries for httpx multipart request
+            httpx_data = {}
+            httpx_files = {}
+
+            # Extract all relevant data from form_data dictionary
+            prompt = form_data.get("prompt", "N/A")
+            gender = form_data.get("gender")
+            age_group = form_data.get("age_group")
+            is_public = form_data.get("is_public", True)
+            height = form_data.get("height")
+            body_type = form_data.get("body_type")
+            style = form_data.get("style")
+            colors = form_data.get("colors")
+
+            # Add all extracted text data to the httpx_data to be sent to the webhook
+            if prompt: httpx_data['prompt'] = prompt
+            if gender: httpx_data['gender'] = gender
+            if age_group: httpx_data['age_group'] = age_group
+            if height: httpx_data['height'] = height
+            if body_type: httpx_data['body_type'] = body_type
+            if style: httpx_data['style'] = style
+            if colors: httpx_data['colors'] = colors
+
+            # Handle image by preparing it for the 'files' parameter in a multipart request
+            if 'image' in form_data and form_data['image']:
+                image_info = form_data['image']
+                httpx_files['image'] = (image_info['filename'], io.BytesIO(image_info['content']), image_info['content_type'])
+            
 
-        # Call n8n webhook
-        webhook_url = 'http://n8n.nemone.store/webhook/c6ebe062-d352-491d-8da3-a5fe2d3f6949'
-        
-        print(f"DEBUG: Task {task_id} - Attempting httpx.post to n8n webhook: {webhook_url}")
-        
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            try:
-                # Send data as multipart/form-data
-                n8n_response = await client.post(webhook_url, data=httpx_data, files=httpx_files)
-                n8n_response.raise_for_status() # Raise HTTPStatusError for bad responses (4xx or 5xx) 
+            # Call n8n webhook
+            webhook_url = settings.N8N_WEBHOOK_URL
+            
+            with task_manager.stage(task_id, "n8n_webhook", has_image=bool(httpx_files)) as webhook_span:
+                async with httpx.AsyncClient(timeout=300.0) as client:
+                    try:
+                        # Send data as multipart/form-data
+                        n8n_started = time.perf_counter()
+                        n8n_outcome = "request_error"
+                        try:
+                            n8n_response = await client.post(webhook_url, data=httpx_data, files=httpx_files)
+                            n8n_outcome = "ok" if n8n_response.is_success else "http_error"
+                        finally:
+                            metrics.n8n_webhook_duration.observe(time.perf_counter() - n8n_started, n8n_outcome)
+                        webhook_span.set_attribute("http.status_code", n8n_response.status_code)
+                        webhook_span.set_attribute("response_bytes", len(n8n_response.content))
+                        n8n_response.raise_for_status() # Raise HTTPStatusError for bad responses (4xx or 5xx) 
+
+                        try:
+                            # Expecting a single JSON object with imageData, mimeType, fashion_tags, trend_insight
+                            result = n8n_response.json()
+                        except json.JSONDecodeError as jde:
+                            logger.error("Task %s: n8n webhook returned non-JSON: %s", task_id, n8n_response.text[:500])
+                            raise HTTPException(status_code=500, detail=f"N8N webhook returned non-JSON response. Error: {jde}. Raw response: {n8n_response.text[:100]}...")
+
+                    except httpx.RequestError as e:
+                        logger.error("Task %s: n8n webhook request failed: %s", task_id, e)
+                        raise HTTPException(status_code=500, detail=f"N8N webhook request failed: {e}")
+                    except httpx.HTTPStatusError as e:
+                        logger.error("Task %s: n8n webhook returned %d: %s", task_id, e.response.status_code, e.response.text[:500])
+                        raise HTTPException(status_code=e.response.status_code, detail=f"N8N webhook returned error: {e.response.text}")
+            
+            # Process new result format from n8n (base64 image data)
+            media_data_b64 = result.get("inlineData")
+            mime_type = result.get("mimeType", "image/png") # Default to png if not provided
+            fashion_tags = result.get("fashion_tags", [])
+            trend_insight = result.get("trend_insight", "No insight provided.")
+
+            if not media_data_b64:
+                raise HTTPException(status_code=500, detail="N8N webhook response missing 'inlineData'.")
+
+            # Ensure tags are a list of strings, handling both string and list inputs
+            tags_array_for_db = []
+            if isinstance(fashion_tags, str):
+                # Split string of hashtags into a list, removing empty strings
+                tags_array_for_db = [tag.strip() for tag in fashion_tags.split('#') if tag.strip()]
+            elif isinstance(fashion_tags, list):
+                tags_array_for_db = fashion_tags
                 
-                n8n_response_text = n8n_response.text
-                print(f"DEBUG: Task {task_id} - N8N raw response text (first 500 chars): {n8n_response_text[:500]}...")
+            # Convert base64 to file-like object
+            with task_manager.stage(task_id, "decode") as decode_span:
+                media_blob = b64_to_blob(media_data_b64, mime_type)
+                decode_span.set_attribute("image_bytes", media_blob.getbuffer().nbytes)
+            
+            # Determine file extension, default to .png
+            file_extension = '.' + mime_type.split('/')[-1] if '/' in mime_type else '.png'
+
+            # --- File Saving Logic ---
+            upload_dir = "app/static/uploads"
+            os.makedirs(upload_dir, exist_ok=True) # Ensure directory exists
+            unique_filename = f"{uuid.uuid4()}{file_extension}"
+            file_path_on_disk = os.path.join(upload_dir, unique_filename)
+            media_url_for_db = f"/static/uploads/{unique_filename}"
 
+            with task_manager.stage(task_id, "disk_write"):
                 try:
-                    # Expecting a single JSON object with imageData, mimeType, fashion_tags, trend_insight
-                    result = n8n_response.json()
-                except json.JSONDecodeError as jde:
-                    print(f"ERROR: Task {task_id} - JSONDecodeError from n8n webhook: {jde}")
-                    print(f"ERROR: Task {task_id} - Raw N8N response text was: {n8n_response_text}")
-                    raise HTTPException(status_code=500, detail=f"N8N webhook returned non-JSON response. Error: {jde}. Raw response: {n8n_response_text[:100]}...")
-                
-                print(f"DEBUG: Task {task_id} - N8N webhook call successful.")
-
-            except httpx.RequestError as e:
-                print(f"ERROR: Task {task_id} - httpx.RequestError during n8n call: {e}")
-                raise HTTPException(status_code=500, detail=f"N8N webhook request failed: {e}")
-            except httpx.HTTPStatusError as e:
-                print(f"ERROR: Task {task_id} - httpx.HTTPStatusError from n8n: {e.response.status_code} - {e.response.text}")
-                raise HTTPException(status_code=e.response.status_code, detail=f"N8N webhook returned error: {e.response.text}")
-        
-        # Process new result format from n8n (base64 image data)
-        media_data_b64 = result.get("inlineData")
-        mime_type = result.get("mimeType", "image/png") # Default to png if not provided
-        fashion_tags = result.get("fashion_tags", [])
-        trend_insight = result.get("trend_insight", "No insight provided.")
-
-        if not media_data_b64:
-            raise HTTPException(status_code=500, detail="N8N webhook response missing 'inlineData'.")
-
-        # Ensure tags are a list of strings, handling both string and list inputs
-        tags_array_for_db = []
-        if isinstance(fashion_tags, str):
-            # Split string of hashtags into a list, removing empty strings
-            tags_array_for_db = [tag.strip() for tag in fashion_tags.split('#') if tag.strip()]
-        elif isinstance(fashion_tags, list):
-            tags_array_for_db = fashion_tags
-            
-        # Convert base64 to file-like object
-        media_blob = b64_to_blob(media_data_b64, mime_type)
-        
-        # Determine file extension, default to .png
-        file_extension = '.' + mime_type.split('/')[-1] if '/' in mime_type else '.png'
-
-        # --- File Saving Logic ---
-        upload_dir = "app/static/uploads"
-        os.makedirs(upload_dir, exist_ok=True) # Ensure directory exists
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path_on_disk = os.path.join(upload_dir, unique_filename)
-        media_url_for_db = f"/static/uploads/{unique_filename}"
-
-        print(f"DEBUG: Task {task_id} - Attempting to save file to: {file_path_on_disk}")
-        try:
-            with open(file_path_on_disk, "wb") as buffer:
-                buffer.write(media_blob.getvalue()) # Use getvalue() for BytesIO
-            print(f"DEBUG: Task {task_id} - File saved successfully to {file_path_on_disk}")
-        except Exception as file_save_e:
-            print(f"ERROR: Task {task_id} - Failed to save file {file_path_on_disk}: {file_save_e}")
-            raise HTTPException(status_code=500, detail=f"Failed to save generated image to disk: {file_save_e}")
-        # --- End File Saving Logic ---
-
-        # Save the creation metadata to our database using the new data from n8n
-        new_creation = await service.creations_repo.create_creation(
-            conn, 
-            user_id, 
-            media_url_for_db,
-            'image',
-            prompt, 
-            gender=gender,
-            age_group=age_group,
-            is_public=is_public,
-            analysis_text=None, # This field is now obsolete
-            recommendation_text=trend_insight, # Use trend_insight for recommendation
-            tags_array=tags_array_for_db, # Use processed tags
-            height=int(height) if height else None,
-            body_type=body_type,
-            style=style,
-            colors=colors
-        )
-        print(f"DEBUG: Task {task_id} - Creation metadata saved. New creation ID: {new_creation.get('id')}")
+                    with open(file_path_on_disk, "wb") as buffer:
+                        buffer.write(media_blob.getvalue()) # Use getvalue() for BytesIO
+                except Exception as file_save_e:
+                    logger.error("Task %s: failed to save file %s: %s", task_id, file_path_on_disk, file_save_e)
+                    raise HTTPException(status_code=500, detail=f"Failed to save generated image to disk: {file_save_e}")
+            # --- End File Saving Logic ---
+
+            with task_manager.stage(task_id, "phash"):
+                phash = await dhash_async(media_blob.getvalue())
+
+            # Save the creation metadata to our database using the new data from n8n
+            with task_manager.stage(task_id, "db_insert"):
+                new_creation = await service.creations_repo.create_creation(
+                    conn, 
+                    user_id, 
+                    media_url_for_db,
+                    'image',
+                    prompt, 
+                    gender=gender,
+                    age_group=age_group,
+                    is_public=is_public,
+                    analysis_text=None, # This field is now obsolete
+                    recommendation_text=trend_insight, # Use trend_insight for recommendation
+                    tags_array=tags_array_for_db, # Use processed tags
+                    height=int(height) if height else None,
+                    body_type=body_type,
+                    style=style,
+                    colors=colors,
+                    phash=phash,
+                    embedding=embedding_literal(
+                        tags=tags_array_for_db, style=style, colors=colors, body_type=body_type, prompt=prompt
+                    )
+                )
+            creation_hash_index.add(new_creation["id"], phash)
         
         task_manager.update_task_status(task_id, status="completed", result={
             "creation": new_creation,
             "n8n_response": result # Still include full n8n_response for raw debug if needed
         })
-        print(f"DEBUG: Task {task_id} - Status updated to completed.")
 
     except Exception as e:
         error_traceback = traceback.format_exc() # Get full traceback
-        print(f"ERROR: Task {task_id} failed with unhandled exception: {e}\nTraceback:\n{error_traceback}")
+        logger.error("Task %s failed: %s\n%s", task_id, e, error_traceback)
         task_manager.update_task_status(task_id, status="failed", result={"error": str(e), "traceback": error_traceback})
     finally:
         if conn:
@@ -222,57 +241,66 @@ async def create_task(
     is_public: bool = Form(True),
     image: Optional[UploadFile] = File(None)
 ):
-    # Get user with real-time stats to enforce limit
-    current_user = await user_service.get_user_with_stats(conn, current_user_jwt)
-
-    # Enforce daily generation limit
-    if current_user["dailyGenerationsUsed"] >= current_user["maxDailyGenerations"]:
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail=f"You have reached your daily generation limit of {current_user['maxDailyGenerations']}. Please try again tomorrow."
-        )
-
-    task_id = task_manager.create_task()
-    user_id = int(current_user["sub"])
-    
-    # Prepare form data for background task
-    form_data = {
-        "prompt": text,
-        "gender": gender,
-        "height": height,
-        "body_type": body_type,
-        "style": style,
-        "colors": colors,
-        "age_group": age_group,
-        "is_public": is_public
-    }
-    if image:
-        form_data["image"] = {
-            "content": await image.read(),
-            "filename": image.filename,
-            "content_type": image.content_type
+    with tracing.start_span("creation.create_task", **{"user.id": current_user_jwt.get("sub")}) as request_span:
+        # Get user with real-time stats to enforce limit
+        with tracing.start_span("creation.quota_check") as quota_span:
+            current_user = await user_service.get_user_with_stats(conn, current_user_jwt)
+
+        # Enforce daily generation limit
+        if current_user["dailyGenerationsUsed"] >= current_user["maxDailyGenerations"]:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"You have reached your daily generation limit of {current_user['maxDailyGenerations']}. Please try again tomorrow."
+            )
+
+        task_id = task_manager.create_task(trace_id=request_span.trace_id)
+        request_span.set_attribute("task.id", task_id)
+        task_manager.record_stage(task_id, "quota_check", quota_span.duration_ms)
+        user_id = int(current_user["sub"])
+        
+        # Prepare form data for background task
+        form_data = {
+            "prompt": text,
+            "gender": gender,
+            "height": height,
+            "body_type": body_type,
+            "style": style,
+            "colors": colors,
+            "age_group": age_group,
+            "is_public": is_public
         }
-
-    # We need to pass the database connection string, not the connection itself
-    from app.config.settings import settings
-    db_connection_string = settings.DATABASE_URL
-    
-    background_tasks.add_task(
-        process_creation_task, task_id, form_data, user_id, service, db_connection_string
-    )
+        if image:
+            with task_manager.stage(task_id, "image_read") as read_span:
+                form_data["image"] = {
+                    "content": await image.read(),
+                    "filename": image.filename,
+                    "content_type": image.content_type
+                }
+                read_span.set_attribute("image_bytes", len(form_data["image"]["content"]))
+
+        # We need to pass the database connection string, not the connection itself
+        db_connection_string = settings.DATABASE_URL
+        
+        background_tasks.add_task(
+            process_creation_task, task_id, form_data, user_id, service, db_connection_string, request_span.context
+        )
     
     # Return task ID immediately. Frontend will poll for status.
     return {"task_id": task_id}
 
 @router.get("/task_status/{task_id}")
-async def get_task_status(task_id: str):
+async def get_task_status(task_id: str, current_user: Optional[dict] = Depends(get_optional_user)):
     """
-    Endpoint for the frontend to poll for the status of a task.
+    Endpoint for the frontend to poll for the status of a creation task.
+    Admins also get the trace id and the per-stage timing breakdown.
+    Analysis tasks are only served, to their owner, by /api/analysis/jobs.
     """
     task = task_manager.get_task(task_id)
-    if not task:
+    if not task or task.get("kind") != "creation":
         raise HTTPException(status_code=404, detail="Task not found")
-    return task
+    if current_user and current_user.get("role") == "ADMIN":
+        return task
+    return {key: value for key, value in task.items() if key not in task_manager.ADMIN_ONLY_FIELDS}
 
 @router.get("/users/me/creations", response_model=List[Dict[str, Any]])
 async def get_my_creations(
@@ -306,24 +334,66 @@ async def get_my_liked_creations(
 async def get_feed(
     service: CreationsService = Depends(),
     conn: asyncpg.Connection = Depends(get_db_connection),
-    sort_by: str = "latest", # 'latest' or 'popular'
+    sort_by: str = "latest", # 'latest', 'popular', 'hot' or 'for_you'
     limit: int = 10,
     offset: int = 0,
+    after_score: Optional[float] = None, # 'hot' keyset: hot_score and id of the last item of the previous page
+    after_id: Optional[int] = None,
+    collapse_duplicates: bool = False, # Hide near-duplicate images within the page
     current_user: Optional[dict] = Depends(get_optional_user) # Optional for feed, to check if liked
 ):
     """
     Returns a list of all public creations for the feed, with sorting and pagination.
     """
-    creations = await service.get_feed_creations(conn, sort_by, limit, offset)
+    user_id = int(current_user["sub"]) if current_user else None
+    creations = await service.get_feed_creations(conn, sort_by, limit, offset, collapse_duplicates, user_id, after_score, after_id)
     
-    # If user is logged in, check if they liked each creation
+    # If user is logged in, mark the creations they liked
     if current_user:
-        user_id = int(current_user["sub"])
-        for creation in creations:
-            creation["is_liked"] = await service.check_if_liked(conn, creation["id"], user_id)
+        await service.mark_liked(conn, creations, user_id)
     
     return creations
 
+@router.get("/creations/facets", response_model=Dict[str, List[Dict[str, Any]]])
+async def get_feed_facets(
+    tag: Optional[str] = None,
+    service: CreationsService = Depends(),
+    conn: asyncpg.Connection = Depends(get_db_connection)
+):
+    """
+    Returns how many public creations have each gender, age_group, body_type, style and color value,
+    optionally limited to creations with `tag`. Served from a snapshot refreshed every FACET_CACHE_TTL_SECONDS.
+    """
+    return await service.get_facet_counts(conn, tag)
+
+@router.get("/creations/{creation_id}/near-duplicates", response_model=List[Dict[str, Any]])
+async def get_near_duplicates(
+    creation_id: int,
+    service: CreationsService = Depends(),
+    conn: asyncpg.Connection = Depends(get_db_connection),
+    max_distance: int = DEFAULT_MAX_DISTANCE,
+    limit: int = 20
+):
+    """
+    Returns public creations whose image is a near-duplicate of this creation's image.
+    """
+    max_distance = max(0, min(max_distance, 16))
+    return await service.get_near_duplicates(conn, creation_id, max_distance, limit)
+
+@router.get("/creations/{creation_id}/similar", response_model=List[Dict[str, Any]])
+async def get_similar_creations(
+    creation_id: int,
+    service: CreationsService = Depends(),
+    conn: asyncpg.Connection = Depends(get_db_connection),
+    limit: int = 12
+):
+    """
+    "More like this": public creations nearest to this one by tags, style, colors, body type and prompt.
+    """
+    # HNSW returns at most hnsw.ef_search (default 40) candidates per scan
+    limit = max(1, min(limit, 40))
+    return await service.get_similar_creations(conn, creation_id, limit)
+
 @router.get("/creations/picked", response_model=List[Dict[str, Any]])
 async def get_picked_creations_api(
     service: CreationsService = Depends(),
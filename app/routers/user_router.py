@@ -3,6 +3,7 @@ from fastapi.templating import Jinja2Templates
 from app.dependencies.auth import get_current_user
 from app.dependencies.db_connection import get_db_connection
 from app.services.users_service import UserService
+from app.services.analysis_service import AnalysisService
 import asyncpg
 from typing import List, Dict, Any
 
@@ -22,18 +23,20 @@ async def get_current_active_user(
 
 
 @router.get("/profile")
-async def user_profile(request: Request, user: dict = Depends(get_current_user), conn: asyncpg.Connection = Depends(get_db_connection)):
-    # Fetch analysis history
-    history = await conn.fetch("""
-        SELECT * FROM analysis_results 
-        WHERE user_id = $1 
-        ORDER BY created_at DESC
-    """, int(user["sub"]))
-    
+async def user_profile(
+    request: Request,
+    user: dict = Depends(get_current_user),
+    analysis_service: AnalysisService = Depends(),
+    conn: asyncpg.Connection = Depends(get_db_connection)
+):
+    # First page of the analysis history (summaries only); more via /api/analysis/history
+    history = await analysis_service.get_history(conn, user)
+
     return templates.TemplateResponse("profile.html", {
         "request": request,
         "user": user,
-        "history": history
+        "history": history["items"],
+        "history_next_cursor": history["next_cursor"]
     })
 
 @router.get("/creations", response_model=List[Dict[str, Any]])
@@ -1,109 +1,451 @@
-import pandas as pd
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.metrics import silhouette_score
-from fastapi import UploadFile
-import io
+from sklearn.preprocessing import MinMaxScaler, RobustScaler, StandardScaler
+from fastapi import UploadFile, HTTPException, Depends
+import base64
+import binascii
+import hashlib
 import json
-import random
+import logging
 
 import uuid
 import os
+import asyncpg
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.config.settings import settings
+from app.repositories.analysis_repository import AnalysisRepository
+from app.services import clustering, csv_ingest, dataset_store, message_simulation, metrics, task_manager, worker_pool
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+SCALERS = {
+    "standard": StandardScaler,
+    "minmax": MinMaxScaler,
+    "robust": RobustScaler,
+    "none": None,
+}
+
+
+class SavedUpload(NamedTuple):
+    path: str
+    url: str
+    content_hash: str
+
+
+class RerunPlan(NamedTuple):
+    dataset: Dict[str, Any]
+    columns: List[str]
+    k: Optional[int]
+    scaler: str
+    cache_key: str
+
+
+def analyze_csv_file(
+    file_path: str,
+    memory_budget_bytes: int,
+    chunk_rows: int,
+    job_id: Optional[str] = None,
+    dataset_path: Optional[str] = None
+) -> dict:
+    """
+    CPU-heavy part of the analysis: parse, encode, cluster and build personas.
+    Runs in a worker process, so it takes a file path instead of a DataFrame
+    and returns a plain, picklable dict. Progress is published under `job_id`.
+    With `dataset_path`, the encoded data is also stored there for later re-runs
+    and described under the "dataset" key of the result.
+    """
+    def progress(stage: str, percent: float, **details):
+        worker_pool.report_progress(job_id, stage, percent, **details)
+
+    # 1-2. Stream the CSV in chunks: fill missing values with 0, downcast numbers and
+    # encode text columns as integer codes. Large files are reservoir-sampled to the budget.
+    progress("parsing", 0)
+    ingest = csv_ingest.ingest_csv(
+        file_path, memory_budget_bytes, chunk_rows,
+        on_progress=lambda fraction: progress("parsing", 35 * fraction)
+    )
+    df = ingest.df
+    dataset = None
+    if dataset_path:
+        dataset = {
+            "path": dataset_path,
+            "size_bytes": dataset_store.write_dataset(df, dataset_path),
+            "columns": list(df.columns),
+            "total_rows": ingest.total_rows,
+            "analysed_rows": len(df),
+            "sampled": ingest.sampled,
+        }
+
+    # 3. Select features for clustering (exclude user_id)
+    progress("encoding", 35, rows=ingest.total_rows, sampled=ingest.sampled)
+    features = df.drop(columns=[csv_ingest.ID_COLUMN], errors="ignore")
+
+    # 4. Scale features
+    scaler = StandardScaler()
+    scaled_features = scaler.fit_transform(features)
+
+    # 5. Clustering (find best K, keeping the winning model's labels)
+    k_values = clustering.K_CANDIDATES
+    search = clustering.search_k(
+        scaled_features, k_values, criterion=settings.ANALYSIS_K_CRITERION,
+        on_k=lambda k: progress("k_search", 40 + 50 * (k - k_values.start) / len(k_values), k=k)
+    )
+    best_k, labels = search["k"], search["labels"]
+
+    # 6. Generate Personas (Mocking LLM)
+    progress("persona_build", 90, k=best_k)
+    profiles = clustering.cluster_profiles(df, labels, best_k)
+    if ingest.sampled:
+        # Scale sample cluster sizes up to the full file
+        scale = ingest.total_rows / len(df)
+        for profile in profiles:
+            profile["size"] = int(round(profile["size"] * scale))
+    personas = clustering.build_personas(profiles, ingest.total_rows)
+
+    result = {
+        "clusters": best_k,
+        "personas": personas,
+        "total_users": ingest.total_rows,
+        "ingest": {**ingest.report(), "peak_memory_mb": _peak_memory_mb()}
+    }
+    if dataset:
+        result["dataset"] = dataset
+    return result
+
+
+def rerun_dataset_file(
+    dataset_path: str,
+    columns: List[str],
+    k: Optional[int],
+    scaler: str,
+    total_rows: int,
+    job_id: Optional[str] = None
+) -> dict:
+    """
+    Re-clusters a stored dataset with caller-chosen parameters. Only `columns` are
+    read from the memory-mapped file. With k=None the best K in 3-7 is searched.
+    """
+    def progress(stage: str, percent: float, **details):
+        worker_pool.report_progress(job_id, stage, percent, **details)
+
+    progress("loading", 0)
+    df = dataset_store.read_columns(dataset_path, columns)
+
+    progress("encoding", 10, rows=len(df))
+    scaler_class = SCALERS[scaler]
+    features = scaler_class().fit_transform(df) if scaler_class else df.to_numpy(dtype="float64")
+
+    if k is None:
+        k_values = clustering.K_CANDIDATES
+        search = clustering.search_k(
+            features, k_values, criterion=settings.ANALYSIS_K_CRITERION,
+            on_k=lambda k: progress("k_search", 20 + 70 * (k - k_values.start) / len(k_values), k=k)
+        )
+        best_k, labels = search["k"], search["labels"]
+    else:
+        progress("clustering", 20, k=k)
+        labels = clustering.fit_fixed_k(features, k)
+        best_k = min(k, len(df))
+
+    progress("persona_build", 90, k=best_k)
+    profiles = clustering.cluster_profiles(df, labels, best_k)
+    if len(df) and total_rows > len(df):
+        scale = total_rows / len(df)
+        for profile in profiles:
+            profile["size"] = int(round(profile["size"] * scale))
+    return {
+        "clusters": best_k,
+        "personas": clustering.build_personas(profiles, total_rows),
+        "total_users": total_rows,
+        "parameters": {"k": k, "columns": columns, "scaler": scaler},
+    }
+
+
+def _peak_memory_mb():
+    peak = csv_ingest.peak_memory_bytes()
+    return round(peak / 2**20, 2) if peak else None
+
+
+def _task_progress_listener(task_id: str):
+    """Forwards worker progress messages to the task manager entry of `task_id`."""
+    def listener(message: dict):
+        details = {k: v for k, v in message.items() if k != "job_id"}
+        task_manager.update_task_progress(task_id, **details)
+    return listener
+
+
+def analysis_params() -> Dict[str, Any]:
+    """Every setting that can change an analysis result for the same file."""
+    return {
+        "algorithm": clustering.ALGORITHM_VERSION,
+        "k_values": list(clustering.K_CANDIDATES),
+        "criterion": settings.ANALYSIS_K_CRITERION,
+        "memory_budget_mb": settings.ANALYSIS_MEMORY_BUDGET_MB,
+        "chunk_rows": settings.ANALYSIS_CHUNK_ROWS,
+    }
+
+
+def make_cache_key(content_hash: str, params: Dict[str, Any]) -> str:
+    """Cache key for a result: file content + analysis parameters + cache/algorithm versions."""
+    material = json.dumps({"v": settings.ANALYSIS_CACHE_VERSION, "content": content_hash, "params": params}, sort_keys=True)
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+def _encode_history_cursor(created_at: datetime, result_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{result_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_history_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, result_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(result_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 
 class AnalysisService:
-    async def process_csv(self, file: UploadFile, user: dict, conn):
+    def __init__(self, analysis_repo: AnalysisRepository = Depends()):
+        self.analysis_repo = analysis_repo
+
+    async def save_upload(self, file: UploadFile) -> SavedUpload:
+        """
+        Streams an uploaded CSV to disk, hashing it on the way.
+        """
         # Generate unique filename
         file_ext = os.path.splitext(file.filename)[1]
         unique_filename = f"{uuid.uuid4()}{file_ext}"
-        file_path = f"app/static/files/{unique_filename}"
-        
-        # Save file
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        content = await file.read()
+        file_path = os.path.join(settings.UPLOAD_DIRECTORY, unique_filename)
+
+        # Save file, streaming it to disk instead of holding the whole upload in memory
+        os.makedirs(settings.UPLOAD_DIRECTORY, exist_ok=True)
+        digest = hashlib.sha256()
         with open(file_path, "wb") as f:
-            f.write(content)
-            
-        df = pd.read_csv(io.BytesIO(content))
-        
-        # Basic Preprocessing
-        # 1. Handle missing values (simple fill with 0 or mode)
-        df = df.fillna(0)
-        
-        # 2. Encode categorical variables
-        label_encoders = {}
-        for column in df.select_dtypes(include=['object']).columns:
-            if column != 'user_id': # Skip ID
-                le = LabelEncoder()
-                df[column] = le.fit_transform(df[column].astype(str))
-                label_encoders[column] = le
-        
-        # 3. Select features for clustering (exclude user_id)
-        features = df.select_dtypes(include=['number'])
-        if 'user_id' in features.columns:
-            features = features.drop('user_id', axis=1)
-            
-        # 4. Scale features
-        scaler = StandardScaler()
-        scaled_features = scaler.fit_transform(features)
-        
-        # 5. Clustering (Find best K)
-        best_k = 3
-        best_score = -1
-        
-        # Limit K search for speed
-        for k in range(3, 8):
-            if len(df) < k: break
-            kmeans = KMeans(n_clusters=k, random_state=42)
-            labels = kmeans.fit_predict(scaled_features)
-            score = silhouette_score(scaled_features, labels)
-            if score > best_score:
-                best_score = score
-                best_k = k
-        
-        kmeans = KMeans(n_clusters=best_k, random_state=42)
-        df['cluster'] = kmeans.fit_predict(scaled_features)
-        
-        # 6. Generate Personas (Mocking LLM)
-        personas = []
-        for i in range(best_k):
-            cluster_data = df[df['cluster'] == i]
-            size = len(cluster_data)
-            
-            # Mock generation based on cluster stats
-            personas.append({
-                "id": i,
-                "name": f"Persona Type {i+1}",
-                "summary": f"This group represents {size} users with distinct behaviors.",
-                "features": cluster_data.mean(numeric_only=True).to_dict(),
-                "motivation": "Value for money" if i % 2 == 0 else "Premium quality",
-                "risk_signal": "High churn risk" if size < len(df)/best_k else "Loyal",
-                "content_preference": "Email newsletters" if i % 2 == 0 else "Social media ads"
-            })
-            
-        result = {
-            "clusters": best_k,
-            "personas": personas,
-            "total_users": len(df)
-        }
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                digest.update(chunk)
+                f.write(chunk)
+        return SavedUpload(file_path, f"/static/files/{unique_filename}", digest.hexdigest())
+
+    async def get_cached_result(self, conn: asyncpg.Connection, upload: SavedUpload, user: dict, filename: str) -> Optional[dict]:
+        """
+        Returns a stored result for the same content and parameters, if any.
+        On a hit the duplicate upload is discarded and the result is recorded in this user's
+        history, pointing at the originally stored file.
+        """
+        cache_key = make_cache_key(upload.content_hash, analysis_params())
+        cached = await self.analysis_repo.get_cached_result(conn, cache_key)
+        metrics.record_cache("analysis", cached is not None)
+        if not cached:
+            return None
+        try:
+            os.remove(upload.path)
+        except OSError:
+            pass
+        user_id = int(user["sub"])
+        await self.analysis_repo.create_result(
+            conn, user_id, filename, cached["filelink"], cached["result"],
+            content_hash=upload.content_hash, cache_key=cache_key
+        )
+        dataset_id = await self.analysis_repo.link_dataset(conn, user_id, upload.content_hash, filename)
+        return {**cached["result"], "dataset_id": dataset_id}
 
-        # Save to DB
-        if user and "sub" in user:
-            await conn.execute("""
-                INSERT INTO analysis_results (user_id, filename, filelink, result)
-                VALUES ($1, $2, $3, $4)
-            """, int(user["sub"]), file.filename, f"/static/files/{unique_filename}", json.dumps(result))
-            
+    async def process_csv(self, upload: SavedUpload, filename: str, user: dict, conn, task_id: Optional[str] = None):
+        """
+        Clusters a saved CSV and stores the result in analysis_results.
+        With a task_id, stage and percent progress are recorded on that task.
+        """
+        result = await self.analyze(upload.path, task_id, dataset_store.dataset_path(upload.content_hash))
+        dataset_id = await self.save_result(conn, user, filename, upload, result, task_id)
+        return {**result, "dataset_id": dataset_id}
+
+    async def analyze(self, file_path: str, task_id: Optional[str] = None, dataset_path: Optional[str] = None) -> dict:
+        """Runs the clustering for a saved CSV in the worker pool."""
+        return await self._run_in_pool(
+            analyze_csv_file,
+            file_path,
+            settings.ANALYSIS_MEMORY_BUDGET_MB * 2**20,
+            settings.ANALYSIS_CHUNK_ROWS,
+            task_id,
+            dataset_path,
+            task_id=task_id
+        )
+
+    async def _run_in_pool(self, fn, *args, task_id: Optional[str] = None) -> dict:
+        # Run the clustering in the worker pool so the event loop stays responsive
+        try:
+            result = await worker_pool.run_in_pool(
+                fn,
+                *args,
+                timeout=settings.ANALYSIS_JOB_TIMEOUT_SECONDS,
+                job_id=task_id,
+                on_progress=_task_progress_listener(task_id) if task_id else None
+            )
+        except worker_pool.JobTimeoutError:
+            raise HTTPException(status_code=504, detail="Analysis took too long. Try a smaller file.")
+        except MemoryError:
+            raise HTTPException(status_code=413, detail="CSV is too large to analyse within the memory limit.")
+        except worker_pool.WorkerCrashedError:
+            raise HTTPException(status_code=503, detail="Analysis worker crashed. Please retry.")
         return result
 
-    async def simulate_message(self, message: str, personas: list):
-        # Mock simulation
-        results = []
-        for p in personas:
-            sentiment = random.choice(["Positive", "Neutral", "Negative"])
-            results.append({
-                "persona_id": p["id"],
-                "reaction": sentiment,
-                "reason": f"The message aligns with their motivation: {p.get('motivation', 'Unknown')}",
-                "suggestion": "Make it shorter" if sentiment == "Negative" else "Good to go"
-            })
-        return results
+    async def save_result(
+        self, conn, user: dict, filename: str, upload: SavedUpload, result: dict, task_id: Optional[str] = None
+    ) -> Optional[int]:
+        """
+        Stores a finished analysis in analysis_results, keyed for the result cache.
+        The stored dataset described under result["dataset"] is recorded too (the key is
+        removed from `result`); returns its id.
+        """
+        if task_id:
+            task_manager.update_task_progress(task_id, "saving", 95)
+        dataset = result.pop("dataset", None)
+        if not (user and "sub" in user):
+            return None
+        user_id = int(user["sub"])
+        await self.analysis_repo.create_result(
+            conn, user_id, filename, upload.url, result,
+            content_hash=upload.content_hash,
+            cache_key=make_cache_key(upload.content_hash, analysis_params())
+        )
+        if dataset is None:
+            return None
+        return await self.analysis_repo.upsert_dataset(conn, user_id, upload.content_hash, filename, upload.url, dataset)
+
+    async def get_history(self, conn: asyncpg.Connection, user: dict, limit: int = 20, cursor: Optional[str] = None) -> dict:
+        """
+        One page of the user's analysis summaries, newest first. Pass `next_cursor`
+        back as `cursor` for the following page; it is None on the last page.
+        """
+        before = _decode_history_cursor(cursor) if cursor else None
+        rows = await self.analysis_repo.list_history(conn, int(user["sub"]), limit + 1, before)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_history_cursor(rows[-1]["created_at"], rows[-1]["id"])
+        return {"items": rows, "next_cursor": next_cursor}
+
+    async def get_history_result(self, conn: asyncpg.Connection, user: dict, result_id: int) -> dict:
+        record = await self.analysis_repo.get_result(conn, result_id, int(user["sub"]))
+        if not record:
+            raise HTTPException(status_code=404, detail="Analysis result not found")
+        return record
+
+    async def list_datasets(self, conn: asyncpg.Connection, user: dict) -> List[dict]:
+        datasets = await self.analysis_repo.list_datasets(conn, int(user["sub"]))
+        for dataset in datasets:
+            dataset.pop("path")
+        return datasets
+
+    async def prepare_rerun(
+        self,
+        conn: asyncpg.Connection,
+        dataset_id: int,
+        user: dict,
+        k: Optional[int],
+        columns: Optional[List[str]],
+        exclude_columns: List[str],
+        scaler: str
+    ) -> RerunPlan:
+        """
+        Validates re-run parameters against a stored dataset owned by `user`.
+        Raises 404 for unknown datasets and 400 for invalid column selections.
+        """
+        dataset = await self.analysis_repo.get_dataset(conn, dataset_id, int(user["sub"]))
+        if not dataset or not os.path.exists(dataset["path"]):
+            raise HTTPException(status_code=404, detail="Dataset not found")
+        available = [c for c in dataset["columns"] if c != csv_ingest.ID_COLUMN]
+        if columns:
+            unknown = sorted(set(columns) - set(available))
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}")
+            # Keep the dataset's column order so equal selections share a cache key
+            selected = [c for c in available if c in set(columns)]
+        else:
+            selected = available
+        selected = [c for c in selected if c not in set(exclude_columns)]
+        if not selected:
+            raise HTTPException(status_code=400, detail="No feature columns left to cluster on")
+        if scaler not in SCALERS:
+            raise HTTPException(status_code=400, detail=f"Unknown scaler: {scaler}")
+
+        params = {
+            "algorithm": clustering.ALGORITHM_VERSION,
+            "k": k,
+            "criterion": settings.ANALYSIS_K_CRITERION if k is None else None,
+            "columns": selected,
+            "scaler": scaler,
+            "analysed_rows": dataset["analysed_rows"],
+        }
+        return RerunPlan(dataset, selected, k, scaler, make_cache_key(dataset["content_hash"], params))
+
+    async def get_cached_rerun(self, conn: asyncpg.Connection, plan: RerunPlan, user: dict) -> Optional[dict]:
+        cached = await self.analysis_repo.get_cached_result(conn, plan.cache_key)
+        metrics.record_cache("analysis", cached is not None)
+        if not cached:
+            return None
+        await self.save_rerun_result(conn, user, plan, cached["result"])
+        return cached["result"]
+
+    async def rerun(self, plan: RerunPlan, task_id: Optional[str] = None) -> dict:
+        """Re-clusters a stored dataset in the worker pool, reading only the selected columns."""
+        return await self._run_in_pool(
+            rerun_dataset_file,
+            plan.dataset["path"],
+            plan.columns,
+            plan.k,
+            plan.scaler,
+            plan.dataset["total_rows"],
+            task_id,
+            task_id=task_id
+        )
+
+    async def save_rerun_result(self, conn, user: dict, plan: RerunPlan, result: dict, task_id: Optional[str] = None):
+        if task_id:
+            task_manager.update_task_progress(task_id, "saving", 95)
+        await self.analysis_repo.create_result(
+            conn, int(user["sub"]), plan.dataset["filename"], plan.dataset["filelink"], result,
+            content_hash=plan.dataset["content_hash"], cache_key=plan.cache_key
+        )
+
+    async def simulate_message(self, message: str, personas: list, seed: int = 0):
+        # Mock simulation; deterministic for a given (seed, message, persona)
+        return message_simulation.simulate([message], personas, seed)[0]
+
+    def simulate_batch(self, messages: List[str], personas: list, seed: int = 0) -> Iterator[str]:
+        """NDJSON lines with the reaction of every persona to every message."""
+        for row in message_simulation.simulate_stream(messages, personas, seed):
+            yield json.dumps(row) + "\n"
+
+
+async def _delete_orphaned_datasets(conn: asyncpg.Connection) -> int:
+    """
+    Deletes stored dataset files no analysis_datasets row points to any more (their users
+    were deleted). Files are shared by content hash, so one remaining row keeps a file.
+    """
+    grace = settings.STORAGE_ORPHAN_GRACE_SECONDS
+    stored = dataset_store.stored_dataset_files(grace)
+    if not stored:
+        return 0
+    referenced = await AnalysisRepository().get_referenced_dataset_hashes(conn, list(stored))
+    return sum(
+        dataset_store.delete_dataset(path, grace)
+        for content_hash, path in stored.items()
+        if content_hash not in referenced
+    )
+
+
+async def run_cache_eviction_job():
+    """Periodically detaches expired results from the analysis cache and deletes orphaned datasets."""
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        evicted = await AnalysisRepository().evict_cache_entries(conn, settings.ANALYSIS_CACHE_TTL_HOURS)
+        if evicted:
+            logger.info("Evicted %d analysis cache entries", evicted)
+        deleted = await _delete_orphaned_datasets(conn)
+        if deleted:
+            logger.info("Deleted %d orphaned analysis datasets", deleted)
+    finally:
+        await conn.close()
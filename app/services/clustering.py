@@ -0,0 +1,119 @@
+from typing import Dict, Any, Callable, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score, calinski_harabasz_score
+
+# Bump whenever a change here can alter analysis results (used to key cached results).
+ALGORITHM_VERSION = "2"
+
+# Up to this many rows, fit full KMeans; above it, MiniBatchKMeans.
+FULL_KMEANS_MAX_ROWS = 20_000
+# Silhouette is O(n^2); it is always scored on a fixed random sample of this many rows.
+SILHOUETTE_SAMPLE_SIZE = 5_000
+MINIBATCH_SIZE = 4_096
+
+CRITERIA = ("silhouette", "calinski_harabasz")
+
+# Numbers of clusters tried when K is not given. Part of the result cache key
+# (analysis_service.analysis_params), so changing it invalidates cached results.
+K_CANDIDATES = range(3, 8)
+
+
+def _make_model(k: int, n_rows: int, random_state: int):
+    if n_rows <= FULL_KMEANS_MAX_ROWS:
+        return KMeans(n_clusters=k, random_state=random_state, n_init="auto")
+    return MiniBatchKMeans(
+        n_clusters=k, random_state=random_state, batch_size=MINIBATCH_SIZE, n_init=3
+    )
+
+
+def _score(X: np.ndarray, labels: np.ndarray, criterion: str, sample_idx: Optional[np.ndarray]) -> float:
+    if len(np.unique(labels if sample_idx is None else labels[sample_idx])) < 2:
+        return -1.0
+    if criterion == "calinski_harabasz":
+        return calinski_harabasz_score(X, labels)
+    if sample_idx is None:
+        return silhouette_score(X, labels)
+    return silhouette_score(X[sample_idx], labels[sample_idx])
+
+
+def search_k(
+    X: np.ndarray,
+    k_values: Iterable[int] = K_CANDIDATES,
+    criterion: str = "silhouette",
+    random_state: int = 42,
+    on_k: Optional[Callable[[int], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Fits one model per candidate K and keeps the labels of the best one, so the winner
+    is never refitted. Returns {"k", "labels", "scores"}.
+    `on_k(k)` is called before each fit (for progress reporting).
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(f"Unknown criterion '{criterion}'. Use one of {CRITERIA}.")
+    n_rows = X.shape[0]
+    rng = np.random.default_rng(random_state)
+    sample_idx = None
+    if criterion == "silhouette" and n_rows > SILHOUETTE_SAMPLE_SIZE:
+        sample_idx = np.sort(rng.choice(n_rows, SILHOUETTE_SAMPLE_SIZE, replace=False))
+
+    best = {"k": None, "labels": None, "score": -np.inf}
+    scores = {}
+    for k in k_values:
+        if n_rows < k:
+            break
+        if on_k:
+            on_k(k)
+        labels = _make_model(k, n_rows, random_state).fit_predict(X)
+        score = float(_score(X, labels, criterion, sample_idx))
+        scores[k] = score
+        if score > best["score"]:
+            best = {"k": k, "labels": labels, "score": score}
+
+    if best["labels"] is None:
+        # Fewer rows than the smallest K: everything is one cluster
+        return {"k": 1, "labels": np.zeros(n_rows, dtype=np.int32), "scores": scores}
+    return {"k": best["k"], "labels": best["labels"], "scores": scores}
+
+
+def fit_fixed_k(X: np.ndarray, k: int, random_state: int = 42) -> np.ndarray:
+    """Fits a single model with a caller-chosen K and returns the labels."""
+    k = max(1, min(k, X.shape[0]))
+    return _make_model(k, X.shape[0], random_state).fit_predict(X)
+
+
+def cluster_profiles(df: pd.DataFrame, labels: np.ndarray, k: int) -> List[Dict[str, Any]]:
+    """
+    Per-cluster size and feature means from one vectorized groupby
+    (instead of filtering the frame once per cluster).
+    """
+    numeric = df.select_dtypes(include=["number"])
+    means = numeric.groupby(labels).mean()
+    sizes = np.bincount(labels, minlength=k)
+    profiles = []
+    for i in range(k):
+        # float(): downcast float32 columns yield numpy scalars that json.dumps rejects
+        features = {name: float(v) for name, v in means.loc[i].items()} if i in means.index else {}
+        features["cluster"] = float(i)
+        profiles.append({"id": i, "size": int(sizes[i]), "features": features})
+    return profiles
+
+
+def build_personas(profiles: List[Dict[str, Any]], total_rows: int) -> List[Dict[str, Any]]:
+    """Mock persona generation based on cluster stats (stands in for an LLM)."""
+    k = len(profiles)
+    personas = []
+    for p in profiles:
+        i, size = p["id"], p["size"]
+        personas.append({
+            "id": i,
+            "name": f"Persona Type {i+1}",
+            "summary": f"This group represents {size} users with distinct behaviors.",
+            "features": p["features"],
+            "motivation": "Value for money" if i % 2 == 0 else "Premium quality",
+            "risk_signal": "High churn risk" if size < total_rows / k else "Loyal",
+            "content_preference": "Email newsletters" if i % 2 == 0 else "Social media ads"
+        })
+    return personas
@@ -0,0 +1,122 @@
+import logging
+from typing import Iterable, List, Optional
+
+import asyncpg
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Creations are embedded locally and deterministically: each metadata field is hashed
+# into the same 256-dimensional space (feature hashing, no vocabulary to fit or store),
+# the fields are weighted, and the sum is L2-normalised so pgvector's cosine distance
+# ranks by shared attributes. The dimension must match the creations.embedding column.
+EMBEDDING_DIM = 256
+
+FIELD_WEIGHTS = {
+    "tag": 2.0,
+    "style": 1.5,
+    "color": 1.0,
+    "body": 1.0,
+    "prompt": 0.5,
+}
+
+
+def _identity(tokens: List[str]) -> List[str]:
+    return tokens
+
+
+# Pre-tokenised, field-prefixed tokens ("style:casual") so a word means different things in different fields
+_token_vectorizer = HashingVectorizer(n_features=EMBEDDING_DIM, analyzer=_identity, norm=None, alternate_sign=False)
+_prompt_vectorizer = HashingVectorizer(
+    n_features=EMBEDDING_DIM, stop_words="english", norm=None, alternate_sign=False, ngram_range=(1, 2)
+)
+
+
+def _field_tokens(prefix: str, values: Iterable[Optional[str]]) -> List[str]:
+    return [f"{prefix}:{v.strip().lower()}" for v in values if v and v.strip()]
+
+
+def embed_creation(
+    tags: Optional[List[str]] = None,
+    style: Optional[str] = None,
+    colors: Optional[str] = None,
+    body_type: Optional[str] = None,
+    prompt: Optional[str] = None,
+) -> Optional[np.ndarray]:
+    """
+    Embeds a creation's metadata. Returns a unit-length float32 vector, or None when
+    there is nothing to embed.
+    """
+    fields = {
+        "tag": _field_tokens("tag", tags or []),
+        "style": _field_tokens("style", [style]),
+        "color": _field_tokens("color", (colors or "").split(",")),
+        "body": _field_tokens("body", [body_type]),
+    }
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float64)
+    for field, tokens in fields.items():
+        if tokens:
+            vector += FIELD_WEIGHTS[field] * _token_vectorizer.transform([tokens]).toarray()[0]
+    if prompt:
+        vector += FIELD_WEIGHTS["prompt"] * _prompt_vectorizer.transform([prompt]).toarray()[0]
+
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        return None
+    return (vector / norm).astype(np.float32)
+
+
+def to_pgvector(vector: Optional[np.ndarray]) -> Optional[str]:
+    """pgvector text literal ('[0.1,0.2,...]'), passed to SQL as $n::text::vector."""
+    if vector is None:
+        return None
+    return "[" + ",".join(f"{x:.6g}" for x in vector) + "]"
+
+
+def embedding_literal(**fields) -> Optional[str]:
+    return to_pgvector(embed_creation(**fields))
+
+
+async def backfill_embeddings(conn: asyncpg.Connection, batch_size: int = 500) -> int:
+    """Embeds every creation that has no embedding yet. Returns the number of rows updated."""
+    updated = 0
+    last_id = 0
+    while True:
+        rows = await conn.fetch(
+            """
+            SELECT id, tags_array, style, colors, body_type, prompt
+            FROM creations
+            WHERE embedding IS NULL AND id > $1
+            ORDER BY id
+            LIMIT $2
+            """,
+            last_id, batch_size
+        )
+        if not rows:
+            return updated
+        last_id = rows[-1]["id"]
+        pairs = []
+        for row in rows:
+            literal = embedding_literal(
+                tags=row["tags_array"], style=row["style"], colors=row["colors"],
+                body_type=row["body_type"], prompt=row["prompt"]
+            )
+            if literal is not None:
+                pairs.append((row["id"], literal))
+        if pairs:
+            await conn.executemany("UPDATE creations SET embedding = $2::text::vector WHERE id = $1", pairs)
+            updated += len(pairs)
+
+
+async def run_embedding_backfill_job():
+    """Periodic safety net for creations saved without an embedding."""
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        updated = await backfill_embeddings(conn)
+        if updated:
+            logger.info("Embedded %d creations", updated)
+    finally:
+        await conn.close()
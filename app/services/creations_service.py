@@ -1,4 +1,9 @@
 from app.repositories.creations_repository import CreationsRepository
+from app.services.storage_service import StorageService
+from app.services.image_hash import creation_hash_index, dhash_async, DEFAULT_MAX_DISTANCE
+from app.services.creation_embedding import embedding_literal
+from app.services.recommendations import for_you_cache, get_for_you_ids
+from app.services import facets
 from fastapi import Depends, UploadFile, HTTPException, status
 import asyncpg
 from typing import List, Dict, Any, Optional
@@ -6,10 +11,16 @@ import os
 import uuid
 import base64 # Import base64 for decoding
 import io
+import logging
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
 
 class CreationsService:
-    def __init__(self, creations_repo: CreationsRepository = Depends()):
+    def __init__(self, creations_repo: CreationsRepository = Depends(), storage_service: StorageService = Depends()):
         self.creations_repo = creations_repo
+        self.storage_service = storage_service
 
     async def save_creation(
         self, 
@@ -64,11 +75,15 @@ class CreationsService:
         
         # 5. Determine media type
         media_type = 'video' if mime_type and mime_type.startswith('video') else 'image'
+        phash = await dhash_async(media_blob.getvalue()) if media_type == 'image' else None
         
         # 6. Save metadata to DB
         new_creation = await self.creations_repo.create_creation(
-            conn, user_id, media_url, media_type, prompt, gender, age_group, is_public, analysis_text, recommendation_text, tags_array
+            conn, user_id, media_url, media_type, prompt, gender, age_group, is_public, analysis_text, recommendation_text, tags_array,
+            phash=phash,
+            embedding=embedding_literal(tags=tags_array, prompt=prompt)
         )
+        creation_hash_index.add(new_creation["id"], phash)
         
         return new_creation
 
@@ -80,9 +95,75 @@ class CreationsService:
         """Retrieves creations liked by a specific user."""
         return await self.creations_repo.get_liked_creations_by_user(conn, user_id, limit, offset)
 
-    async def get_feed_creations(self, conn: asyncpg.Connection, sort_by: str = "latest", limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
-        """Retrieves public creations for the feed, with sorting and pagination."""
-        return await self.creations_repo.get_feed_creations(conn, sort_by, limit, offset)
+    async def get_feed_creations(self, conn: asyncpg.Connection, sort_by: str = "latest", limit: int = 10, offset: int = 0, collapse_duplicates: bool = False, user_id: Optional[int] = None, after_score: Optional[float] = None, after_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Retrieves public creations for the feed, with sorting and pagination.
+        'hot' is keyset-paginated with after_score/after_id (offset is ignored).
+        'for_you' pages through the user's precomputed recommendations and falls back to
+        'popular' for anonymous users and users without recommendations yet.
+        With collapse_duplicates, near-duplicate images on the page are reduced to their first occurrence.
+        """
+        recommended = await get_for_you_ids(conn, user_id) if sort_by == "for_you" and user_id else []
+        if sort_by == "hot":
+            creations = await self.creations_repo.get_hot_creations(conn, limit, after_score, after_id)
+        elif recommended:
+            page_ids = recommended[offset:offset + limit]
+            rank = {creation_id: i for i, creation_id in enumerate(page_ids)}
+            creations = await self.creations_repo.get_public_creations_by_ids(conn, page_ids) if page_ids else []
+            creations.sort(key=lambda c: rank[c["id"]])
+        else:
+            if sort_by == "for_you":
+                sort_by = "popular"
+            creations = await self.creations_repo.get_feed_creations(conn, sort_by, limit, offset)
+        if collapse_duplicates and creations:
+            await creation_hash_index.refresh(conn)
+            kept_ids = set(creation_hash_index.collapse([c["id"] for c in creations]))
+            creations = [c for c in creations if c["id"] in kept_ids]
+        return creations
+
+    async def get_facet_counts(self, conn: asyncpg.Connection, tag: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Counts of public creations per gender, age group, body type, style and color, optionally within a tag."""
+        return await facets.get_facet_counts(conn, tag)
+
+    async def get_near_duplicates(self, conn: asyncpg.Connection, creation_id: int, max_distance: int = DEFAULT_MAX_DISTANCE, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Retrieves public creations whose image is perceptually close to the given creation's image,
+        nearest first. Each result carries its Hamming `distance`.
+        """
+        creation = await self.creations_repo.get_creation_by_id(conn, creation_id)
+        if not creation:
+            raise HTTPException(status_code=404, detail="Creation not found")
+
+        await creation_hash_index.refresh(conn)
+        phash = creation_hash_index.get_hash(creation_id)
+        if phash is None:
+            return []
+
+        matches = [(d, i) for d, i in creation_hash_index.search(phash, max_distance) if i != creation_id]
+        # Private and deleted matches drop out in the DB lookup, so look up nearest-first
+        # batches until `limit` public ones are found
+        batch_size = max(limit, 100)
+        rows = []
+        for start in range(0, len(matches), batch_size):
+            distances = {i: d for d, i in matches[start:start + batch_size]}
+            found = await self.creations_repo.get_public_creations_by_ids(conn, list(distances))
+            for row in found:
+                row["distance"] = distances[row["id"]]
+            rows.extend(found)
+            if len(rows) >= limit:
+                break
+        rows.sort(key=lambda r: (r["distance"], r["id"]))
+        return rows[:limit]
+
+    async def get_similar_creations(self, conn: asyncpg.Connection, creation_id: int, limit: int = 12) -> List[Dict[str, Any]]:
+        """
+        "More like this": public creations with the most similar tags, style, colors,
+        body type and prompt, nearest first.
+        """
+        creation = await self.creations_repo.get_creation_by_id(conn, creation_id)
+        if not creation:
+            raise HTTPException(status_code=404, detail="Creation not found")
+        return await self.creations_repo.get_similar_creations(conn, creation_id, limit)
 
     async def get_picked_creations(self, conn: asyncpg.Connection, limit: int = 9) -> List[Dict[str, Any]]:
         """Retrieves creations picked by admin for the home screen."""
@@ -104,16 +185,24 @@ class CreationsService:
 
     async def like_creation(self, conn: asyncpg.Connection, creation_id: int, user_id: int) -> bool:
         """User likes a creation."""
+        for_you_cache.discard(user_id)
         return await self.creations_repo.add_like(conn, user_id, creation_id)
     
     async def unlike_creation(self, conn: asyncpg.Connection, creation_id: int, user_id: int) -> bool:
         """User unlikes a creation."""
+        for_you_cache.discard(user_id)
         return await self.creations_repo.remove_like(conn, user_id, creation_id)
     
     async def check_if_liked(self, conn: asyncpg.Connection, creation_id: int, user_id: int) -> bool:
         """Checks if a user has liked a specific creation."""
         return await self.creations_repo.check_if_liked(conn, user_id, creation_id)
 
+    async def mark_liked(self, conn: asyncpg.Connection, creations: List[Dict[str, Any]], user_id: int) -> None:
+        """Sets `is_liked` on each creation for this user, with a single query for the whole list."""
+        liked_ids = await self.creations_repo.get_liked_ids(conn, user_id, [c["id"] for c in creations])
+        for creation in creations:
+            creation["is_liked"] = creation["id"] in liked_ids
+
     async def delete_creation(self, conn: asyncpg.Connection, creation_id: int, user_id: int, is_admin: bool = False) -> Optional[Dict[str, Any]]:
         """
         Deletes a creation after verifying ownership or if the caller is an admin.
@@ -127,18 +216,26 @@ class CreationsService:
         if not is_admin and creation_to_delete["user_id"] != user_id:
             raise HTTPException(status_code=403, detail="Not authorized to delete this creation")
 
-        # 3. Delete the physical file only if it is a local file
-        media_url = creation_to_delete["media_url"]
-        if media_url.startswith('/static/uploads/'):
-            # Convert URL path to system file path: /static/uploads/file.png -> app/static/uploads/file.png
-            file_path = "app" + media_url
-            if os.path.exists(file_path):
-                os.remove(file_path)
-
-        # 4. Delete the record from the database
-        deleted_creation = await self.creations_repo.delete_creation_by_id(conn, creation_id)
+        # 3. Delete the record and queue the local file for removal in one transaction.
+        # The file itself is removed by the background deletion worker, off the request path.
+        async with conn.transaction():
+            deleted_creation = await self.creations_repo.delete_creation_by_id(conn, creation_id)
+            if deleted_creation:
+                await self.storage_service.schedule_deletion(conn, deleted_creation["media_url"], "creation_deleted")
+        creation_hash_index.discard(creation_id)
         return deleted_creation
 
     async def get_recent_tags(self, conn: asyncpg.Connection, limit: int = 5) -> List[str]:
         """Retrieves a list of the most recent unique tags."""
-        return await self.creations_repo.get_recent_tags(conn, limit)
\ No newline at end of file
+        return await self.creations_repo.get_recent_tags(conn, limit)
+
+
+async def run_hot_score_refresh_job():
+    """Periodic batch pass that brings every creation's hot score in line with its likes."""
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        updated = await CreationsRepository().refresh_hot_scores(conn)
+        if updated:
+            logger.info("Refreshed %d hot scores", updated)
+    finally:
+        await conn.close()
@@ -0,0 +1,234 @@
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Column that identifies a respondent; never encoded or used as a feature.
+ID_COLUMN = "user_id"
+
+
+@dataclass
+class IngestResult:
+    df: pd.DataFrame
+    total_rows: int
+    sampled: bool
+    data_bytes: int
+    peak_memory_bytes: Optional[int] = None
+    categorical_columns: List[str] = field(default_factory=list)
+
+    def report(self) -> Dict[str, object]:
+        return {
+            "total_rows": self.total_rows,
+            "analysed_rows": len(self.df),
+            "sampled": self.sampled,
+            "data_mb": round(self.data_bytes / 2**20, 2),
+            "peak_memory_mb": round(self.peak_memory_bytes / 2**20, 2) if self.peak_memory_bytes else None,
+        }
+
+
+def reset_peak_memory():
+    """
+    Resets the kernel's peak-RSS counter (VmHWM) for this process, so a reused worker
+    reports the peak of the current job only. Linux-only; silently ignored elsewhere.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_memory_bytes() -> Optional[int]:
+    """Peak resident set size since the last reset_peak_memory() (or process start)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in KiB on Linux; it cannot be reset, so it covers the worker's lifetime
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _downcast(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(series):
+        return series.astype(np.int8)
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast="integer")
+    return pd.to_numeric(series, downcast="float")
+
+
+def _smallest_int_dtype(n_values: int):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_values <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+class _CategoryEncoder:
+    """
+    Maps string values to integer codes consistently across chunks. Codes are assigned in
+    first-seen order while streaming and remapped to sorted order at the end, which matches
+    what sklearn's LabelEncoder would produce on the full column.
+    """
+
+    def __init__(self):
+        self.categories = pd.Index([], dtype=object)
+
+    def encode(self, values: pd.Series) -> np.ndarray:
+        values = values.astype(str)
+        unseen = pd.unique(values[~values.isin(self.categories)])
+        if len(unseen):
+            self.categories = self.categories.append(pd.Index(unseen, dtype=object))
+        return self.categories.get_indexer(values).astype(np.int64)
+
+    def sorted_remap(self) -> np.ndarray:
+        order = np.argsort(self.categories.to_numpy(dtype=str), kind="stable")
+        remap = np.empty(len(order), dtype=np.int64)
+        remap[order] = np.arange(len(order))
+        return remap
+
+
+class _Reservoir:
+    """Uniform reservoir sample (Algorithm R) over numeric column arrays, vectorized per chunk."""
+
+    def __init__(self, columns: Dict[str, np.ndarray], capacity: int, rng: np.random.Generator):
+        self.capacity = capacity
+        self.rng = rng
+        self.columns = {name: arr[:capacity].copy() for name, arr in columns.items()}
+        self.seen = min(capacity, len(next(iter(columns.values()))))
+        if self.seen < capacity:
+            raise ValueError("Reservoir must be seeded with at least `capacity` rows")
+        self._offer({name: arr[capacity:] for name, arr in columns.items()})
+
+    def _offer(self, columns: Dict[str, np.ndarray]):
+        n = len(next(iter(columns.values()))) if columns else 0
+        if n == 0:
+            return
+        positions = np.arange(self.seen, self.seen + n)
+        slots = self.rng.integers(0, positions + 1)
+        accept = np.nonzero(slots < self.capacity)[0]
+        self.seen += n
+        if len(accept) == 0:
+            return
+        # When several rows land in the same slot, the last one wins (as in the sequential algorithm)
+        target = slots[accept]
+        _, last = np.unique(target[::-1], return_index=True)
+        keep = accept[::-1][last]
+        for name, arr in columns.items():
+            current = self.columns[name]
+            # Chunks are downcast independently; widen the reservoir column if needed
+            dtype = np.result_type(current.dtype, arr.dtype)
+            if dtype != current.dtype:
+                current = self.columns[name] = current.astype(dtype)
+            current[slots[keep]] = arr[keep]
+
+    def add(self, columns: Dict[str, np.ndarray]):
+        self._offer(columns)
+
+
+def ingest_csv(
+    file_path: str,
+    memory_budget_bytes: int,
+    chunk_rows: int = 50_000,
+    random_state: int = 42,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> IngestResult:
+    """
+    Reads a CSV in chunks into a compact, all-numeric DataFrame:
+    missing values become 0, numeric columns are downcast, and text columns become
+    integer category codes. If the encoded data would exceed `memory_budget_bytes`,
+    the rest of the file is streamed through a reservoir so only a uniform sample is kept.
+    `on_progress(fraction)` is called after each chunk with the share of the file read.
+    """
+    reset_peak_memory()
+    rng = np.random.default_rng(random_state)
+    encoders: Dict[str, _CategoryEncoder] = {}
+    dropped = set()
+    parts: Dict[str, List[np.ndarray]] = {}
+    column_order: List[str] = []
+    kept_bytes = 0
+    total_rows = 0
+    reservoir: Optional[_Reservoir] = None
+
+    with open(file_path, "rb") as handle:
+        file_size = max(1, os.fstat(handle.fileno()).st_size)
+        for chunk in pd.read_csv(handle, chunksize=chunk_rows):
+            chunk = chunk.fillna(0)
+            if not column_order:
+                column_order = list(chunk.columns)
+            arrays: Dict[str, np.ndarray] = {}
+            for column in column_order:
+                if column in dropped:
+                    continue
+                series = chunk[column]
+                is_text = not pd.api.types.is_numeric_dtype(series) or column in encoders
+                if column == ID_COLUMN and is_text:
+                    # Non-numeric IDs are neither features nor summary stats
+                    dropped.add(column)
+                    parts.pop(column, None)
+                    if reservoir is not None:
+                        reservoir.columns.pop(column, None)
+                    continue
+                if is_text:
+                    encoder = encoders.get(column)
+                    if encoder is None:
+                        encoder = encoders[column] = _CategoryEncoder()
+                        # Column looked numeric in earlier chunks: re-encode what we kept as text
+                        previous = parts.pop(column, [])
+                        if reservoir is not None and column in reservoir.columns:
+                            reservoir.columns[column] = encoder.encode(pd.Series(reservoir.columns[column]))
+                        elif previous:
+                            parts[column] = [encoder.encode(pd.Series(p)) for p in previous]
+                    arrays[column] = encoder.encode(series)
+                else:
+                    arrays[column] = _downcast(series).to_numpy()
+            total_rows += len(chunk)
+            del chunk
+            if on_progress:
+                on_progress(min(1.0, handle.tell() / file_size))
+
+            if reservoir is not None:
+                reservoir.add(arrays)
+                continue
+
+            for column, arr in arrays.items():
+                parts.setdefault(column, []).append(arr)
+            kept_bytes += sum(arr.nbytes for arr in arrays.values())
+
+            if kept_bytes > memory_budget_bytes and total_rows > 0:
+                # Switch to sampling: keep as many rows as fit in the budget
+                bytes_per_row = max(1, kept_bytes // total_rows)
+                capacity = max(1, memory_budget_bytes // bytes_per_row)
+                merged = {column: np.concatenate(chunks) for column, chunks in parts.items()}
+                parts.clear()
+                reservoir = _Reservoir(merged, capacity, rng)
+                del merged
+
+    if reservoir is not None:
+        columns = reservoir.columns
+    else:
+        columns = {column: np.concatenate(chunks) for column, chunks in parts.items()}
+
+    for column, encoder in encoders.items():
+        if column in columns:
+            remap = encoder.sorted_remap()
+            columns[column] = remap[columns[column]].astype(_smallest_int_dtype(len(remap)))
+
+    df = pd.DataFrame({column: columns[column] for column in column_order if column in columns})
+    return IngestResult(
+        df=df,
+        total_rows=total_rows,
+        sampled=reservoir is not None,
+        data_bytes=int(df.memory_usage(index=False).sum()),
+        peak_memory_bytes=peak_memory_bytes(),
+        categorical_columns=[c for c in column_order if c in encoders],
+    )
+
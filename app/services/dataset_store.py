@@ -0,0 +1,66 @@
+import os
+import time
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from app.config.settings import settings
+
+# Encoded datasets are stored as uncompressed Feather (Arrow IPC) files, one per upload
+# content hash. Uncompressed files can be memory-mapped, so a re-run reads only the
+# columns it asks for, straight from the page cache, without parsing anything.
+DATASET_SUFFIX = ".feather"
+
+
+def dataset_path(content_hash: str) -> str:
+    return os.path.join(settings.ANALYSIS_DATASET_DIR, f"{content_hash}{DATASET_SUFFIX}")
+
+
+def write_dataset(df: pd.DataFrame, path: str) -> int:
+    """
+    Writes an encoded DataFrame to `path` atomically and returns the file size in bytes.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def read_columns(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Memory-maps a stored dataset and loads only `columns` (all columns if None).
+    """
+    table = feather.read_table(path, columns=columns, memory_map=True)
+    return table.to_pandas()
+
+
+def stored_dataset_files(min_age_seconds: float) -> Dict[str, str]:
+    """Content hash -> path of every stored dataset last written more than `min_age_seconds` ago."""
+    cutoff = time.time() - min_age_seconds
+    found = {}
+    try:
+        with os.scandir(settings.ANALYSIS_DATASET_DIR) as entries:
+            for entry in entries:
+                if entry.name.endswith(DATASET_SUFFIX) and entry.is_file() and entry.stat().st_mtime < cutoff:
+                    found[entry.name[:-len(DATASET_SUFFIX)]] = entry.path
+    except FileNotFoundError:
+        pass
+    return found
+
+
+def delete_dataset(path: str, min_age_seconds: float) -> bool:
+    """
+    Deletes a stored dataset unless it was (re)written in the last `min_age_seconds`,
+    i.e. by an analysis whose row is not saved yet. Returns True if it was deleted.
+    """
+    try:
+        if os.stat(path).st_mtime >= time.time() - min_age_seconds:
+            return False
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    return True
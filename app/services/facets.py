@@ -0,0 +1,59 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+
+from app.config.settings import settings
+from app.repositories.creations_repository import ALL_TAGS, CreationsRepository
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Feed explorer facet counts. creation_facet_counts is kept up to date by
+# CreationsRepository on create/delete; reads are served from a short-lived
+# per-tag snapshot so page views do not touch the table at all.
+
+MAX_CACHED_TAGS = 1_000
+
+_snapshots: "OrderedDict[str, tuple[float, Dict[str, List[Dict[str, Any]]]]]" = OrderedDict()
+
+
+def _group(rows: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    facets: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        facets.setdefault(row["facet"], []).append({"value": row["value"], "count": row["count"]})
+    return facets
+
+
+async def get_facet_counts(conn: asyncpg.Connection, tag: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    {facet: [{"value", "count"}, ...]} over public creations, most common value first,
+    optionally limited to creations with `tag`.
+    """
+    key = tag or ALL_TAGS
+    snapshot = _snapshots.get(key)
+    if snapshot is not None and snapshot[0] > time.monotonic():
+        _snapshots.move_to_end(key)
+        metrics.record_cache("facets", True)
+        return snapshot[1]
+    metrics.record_cache("facets", False)
+
+    facets = _group(await CreationsRepository().get_facet_counts(conn, key))
+    _snapshots[key] = (time.monotonic() + settings.FACET_CACHE_TTL_SECONDS, facets)
+    _snapshots.move_to_end(key)
+    while len(_snapshots) > MAX_CACHED_TAGS:
+        _snapshots.popitem(last=False)
+    return facets
+
+
+async def run_facet_rebuild_job():
+    """Periodic full recount; also fills the table on first start."""
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        rows = await CreationsRepository().rebuild_facet_counts(conn)
+        _snapshots.clear()
+        logger.info("Rebuilt facet counts: %d rows", rows)
+    finally:
+        await conn.close()
@@ -0,0 +1,194 @@
+import asyncio
+import io
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import asyncpg
+from PIL import Image, UnidentifiedImageError
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+_MASK = (1 << HASH_BITS) - 1
+
+# Default Hamming distance under which two images count as near-duplicates.
+# dHash distances of 0-5 are usually the same picture re-encoded or lightly edited.
+DEFAULT_MAX_DISTANCE = 6
+
+
+def dhash(data: bytes) -> Optional[int]:
+    """
+    Computes a 64-bit difference hash (dHash) of an image.
+    Returns a signed 64-bit integer (fits a Postgres BIGINT), or None if `data` is not an image.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            # For JPEGs, let the decoder downscale while decoding; a no-op for other formats
+            img.draft("L", (64, 64))
+            small = img.convert("L").resize((9, 8), Image.Resampling.BOX)
+            pixels = small.tobytes()
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None
+
+    value = 0
+    for row in range(8):
+        offset = row * 9
+        for col in range(8):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value - (1 << HASH_BITS) if value >> (HASH_BITS - 1) else value
+
+
+async def dhash_async(data: bytes) -> Optional[int]:
+    """Runs dhash() in a worker thread so image decoding stays off the event loop."""
+    return await asyncio.to_thread(dhash, data)
+
+
+def hamming(a: int, b: int) -> int:
+    return ((a ^ b) & _MASK).bit_count()
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over Hamming distance. Lookups only descend into children whose
+    edge distance lies within [d - radius, d + radius], so a small radius touches a small
+    fraction of the tree.
+    """
+
+    def __init__(self):
+        # node: [hash, item_ids, {distance: child}]
+        self._root: Optional[list] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, value: int, item_id: int) -> None:
+        self._size += 1
+        if self._root is None:
+            self._root = [value, [item_id], {}]
+            return
+        node = self._root
+        while True:
+            d = hamming(value, node[0])
+            if d == 0:
+                node[1].append(item_id)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, [item_id], {}]
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, int]]:
+        """Returns (distance, item_id) pairs within `radius`, nearest first."""
+        if self._root is None:
+            return []
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            d = hamming(value, node[0])
+            if d <= radius:
+                found.extend((d, item_id) for item_id in node[1])
+            for edge, child in node[2].items():
+                if d - radius <= edge <= d + radius:
+                    stack.append(child)
+        found.sort()
+        return found
+
+
+class NearDuplicateIndex:
+    """
+    In-process perceptual hash index of creations. Loaded lazily from the `creations.phash`
+    column and topped up incrementally (rows with a higher id) before each query, so creations
+    saved by other workers show up too. Rows the incremental refresh cannot see (hashes
+    backfilled into old rows, rows committed late with a lower id) arrive with the periodic
+    full reload(). Deleted creations are filtered out by the caller's DB lookup; local
+    deletes are tombstoned here.
+    """
+
+    def __init__(self):
+        self._tree = BKTree()
+        self._hashes: Dict[int, int] = {}
+        self._deleted: set = set()
+        self._max_loaded_id = 0
+        self._lock = asyncio.Lock()
+
+    def add(self, item_id: int, value: Optional[int]) -> None:
+        if value is None or item_id in self._hashes:
+            return
+        self._tree.add(value, item_id)
+        self._hashes[item_id] = value
+        self._deleted.discard(item_id)
+
+    def discard(self, item_id: int) -> None:
+        if item_id in self._hashes:
+            self._deleted.add(item_id)
+
+    def get_hash(self, item_id: int) -> Optional[int]:
+        return None if item_id in self._deleted else self._hashes.get(item_id)
+
+    async def refresh(self, conn: asyncpg.Connection) -> None:
+        async with self._lock:
+            rows = await conn.fetch(
+                "SELECT id, phash FROM creations WHERE phash IS NOT NULL AND id > $1 ORDER BY id",
+                self._max_loaded_id
+            )
+            for row in rows:
+                self.add(row["id"], row["phash"])
+            if rows:
+                self._max_loaded_id = rows[-1]["id"]
+
+    async def reload(self, conn: asyncpg.Connection) -> int:
+        """Rebuilds the index from every stored hash; returns the number of hashes loaded."""
+        rows = await conn.fetch("SELECT id, phash FROM creations WHERE phash IS NOT NULL")
+        # Building the tree is pure Python; keep it off the event loop
+        tree, hashes = await asyncio.to_thread(self._build, rows)
+        async with self._lock:
+            # Anything saved since the SELECT has a higher id and comes with the next refresh()
+            self._tree, self._hashes = tree, hashes
+            self._deleted &= hashes.keys()
+            self._max_loaded_id = max(hashes, default=0)
+        return len(hashes)
+
+    @staticmethod
+    def _build(rows: List[asyncpg.Record]) -> Tuple[BKTree, Dict[int, int]]:
+        tree, hashes = BKTree(), {}
+        for row in rows:
+            tree.add(row["phash"], row["id"])
+            hashes[row["id"]] = row["phash"]
+        return tree, hashes
+
+    def search(self, value: int, max_distance: int = DEFAULT_MAX_DISTANCE) -> List[Tuple[int, int]]:
+        return [(d, i) for d, i in self._tree.search(value, max_distance) if i not in self._deleted]
+
+    def collapse(self, item_ids: List[int], max_distance: int = DEFAULT_MAX_DISTANCE) -> List[int]:
+        """
+        Keeps the first item of every group of near-duplicates, preserving order.
+        Items without a known hash are always kept.
+        """
+        kept, kept_hashes = [], []
+        for item_id in item_ids:
+            value = self.get_hash(item_id)
+            if value is not None and any(hamming(value, h) <= max_distance for h in kept_hashes):
+                continue
+            kept.append(item_id)
+            if value is not None:
+                kept_hashes.append(value)
+        return kept
+
+
+# Process-wide index of creation image hashes
+creation_hash_index = NearDuplicateIndex()
+
+
+async def run_hash_index_reload_job():
+    """Periodic full reload of this process's creation hash index."""
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        count = await creation_hash_index.reload(conn)
+        logger.info("Reloaded near-duplicate index: %d hashes", count)
+    finally:
+        await conn.close()
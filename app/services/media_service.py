@@ -6,6 +6,7 @@ from fastapi import UploadFile, HTTPException, status, Depends
 from sqlalchemy.orm import Session
 
 from app.repositories.media_repository import MediaRepository
+from app.services.image_hash import dhash_async
 
 
 class MediaService:
@@ -51,6 +52,7 @@ class MediaService:
 
         size_bytes = len(content)
         tags_array = tags if tags else None
+        phash = None if (file.content_type or "").startswith("video/") else await dhash_async(content)
 
         created = self.media_repo.create_media(
             db,
@@ -61,6 +63,7 @@ class MediaService:
             size_bytes=size_bytes,
             description=description,
             tags_array=tags_array,
+            phash=phash,
         )
         return created
 
@@ -0,0 +1,128 @@
+import hashlib
+import re
+from typing import Any, Dict, Iterator, List, Sequence
+
+import numpy as np
+
+# Mock message scoring (stands in for an LLM). Messages and personas are turned into
+# small feature/weight vectors so an M x N batch is scored with one matrix product.
+# The noise term is a hash of (seed, message, persona), so a pair always gets the same
+# reaction whatever else is in the batch.
+
+VALUE_TERMS = {"save", "saving", "savings", "discount", "deal", "deals", "free", "cheap", "offer", "price", "off", "sale", "bonus"}
+PREMIUM_TERMS = {"premium", "exclusive", "luxury", "quality", "crafted", "best", "finest", "elite", "signature"}
+URGENCY_TERMS = {"now", "today", "hurry", "limited", "last", "ends", "soon", "only"}
+
+# Columns of the message feature matrix / persona weight matrix
+FEATURES = ("value", "premium", "urgency", "length")
+LONG_MESSAGE_WORDS = 40
+NOISE_WEIGHT = 0.35
+POSITIVE_THRESHOLD = 0.25
+NEGATIVE_THRESHOLD = -0.15
+
+_TOKEN = re.compile(r"[a-z%]+")
+
+
+def _message_features(messages: Sequence[str]) -> np.ndarray:
+    features = np.zeros((len(messages), len(FEATURES)))
+    for i, message in enumerate(messages):
+        tokens = _TOKEN.findall(message.lower())
+        if not tokens:
+            continue
+        n = len(tokens)
+        features[i, 0] = sum(t in VALUE_TERMS or t == "%" for t in tokens) / np.sqrt(n)
+        features[i, 1] = sum(t in PREMIUM_TERMS for t in tokens) / np.sqrt(n)
+        features[i, 2] = sum(t in URGENCY_TERMS for t in tokens) / np.sqrt(n)
+        features[i, 3] = min(n / LONG_MESSAGE_WORDS, 2.0)
+    return features
+
+
+def _persona_weights(personas: Sequence[Dict[str, Any]]) -> np.ndarray:
+    weights = np.zeros((len(personas), len(FEATURES)))
+    for j, persona in enumerate(personas):
+        motivation = str(persona.get("motivation", "")).lower()
+        if "value" in motivation:
+            weights[j, :2] = (1.2, -0.4)
+        elif "premium" in motivation or "quality" in motivation:
+            weights[j, :2] = (-0.4, 1.2)
+        else:
+            weights[j, :2] = (0.5, 0.5)
+        weights[j, 2] = 0.5 if "churn" in str(persona.get("risk_signal", "")).lower() else -0.2
+        # Newsletter readers tolerate longer copy than ad viewers
+        weights[j, 3] = -0.1 if "email" in str(persona.get("content_preference", "")).lower() else -0.5
+    return weights
+
+
+def _stable_hashes(values: Sequence[str], seed: int) -> np.ndarray:
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(f"{seed}\x00{v}".encode(), digest_size=8).digest(), "little") for v in values],
+        dtype=np.uint64,
+    )
+
+
+def _pair_noise(message_hashes: np.ndarray, persona_hashes: np.ndarray) -> np.ndarray:
+    """Uniform noise in [-1, 1) for every (message, persona) pair (splitmix64 finalizer)."""
+    with np.errstate(over="ignore"):
+        x = message_hashes[:, None] ^ (persona_hashes[None, :] * np.uint64(0x9E3779B97F4A7C15))
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x = x ^ (x >> np.uint64(31))
+    return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53) * 2.0 - 1.0
+
+
+def score_matrix(messages: Sequence[str], personas: Sequence[Dict[str, Any]], seed: int = 0) -> np.ndarray:
+    """Scores in [-1, 1] for every message (rows) against every persona (columns)."""
+    if not len(messages) or not len(personas):
+        return np.zeros((len(messages), len(personas)))
+    affinity = np.tanh(_message_features(messages) @ _persona_weights(personas).T)
+    noise = _pair_noise(
+        _stable_hashes(messages, seed),
+        _stable_hashes([str(p.get("id")) for p in personas], seed),
+    )
+    return np.clip((1 - NOISE_WEIGHT) * affinity + NOISE_WEIGHT * noise, -1.0, 1.0)
+
+
+def _reaction(score: float) -> str:
+    if score >= POSITIVE_THRESHOLD:
+        return "Positive"
+    if score <= NEGATIVE_THRESHOLD:
+        return "Negative"
+    return "Neutral"
+
+
+def _row(message: str, persona: Dict[str, Any], score: float) -> Dict[str, Any]:
+    reaction = _reaction(score)
+    motivation = persona.get("motivation", "Unknown")
+    if reaction == "Negative":
+        reason = f"The message misses their motivation: {motivation}"
+        suggestion = "Make it shorter" if len(message.split()) > LONG_MESSAGE_WORDS else f"Speak to {str(motivation).lower()}"
+    else:
+        reason = f"The message aligns with their motivation: {motivation}"
+        suggestion = "Good to go"
+    return {
+        "persona_id": persona.get("id"),
+        "reaction": reaction,
+        "score": round(float(score), 4),
+        "reason": reason,
+        "suggestion": suggestion,
+    }
+
+
+def simulate(messages: Sequence[str], personas: Sequence[Dict[str, Any]], seed: int = 0) -> List[List[Dict[str, Any]]]:
+    """Reactions of every persona to every message, as one list of rows per message."""
+    scores = score_matrix(messages, personas, seed)
+    return [[_row(message, persona, scores[i, j]) for j, persona in enumerate(personas)] for i, message in enumerate(messages)]
+
+
+def simulate_stream(
+    messages: Sequence[str], personas: Sequence[Dict[str, Any]], seed: int = 0, block_size: int = 64
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yields one row per (message, persona), scoring `block_size` messages at a time so the
+    first rows are available before the whole batch is scored.
+    """
+    for start in range(0, len(messages), block_size):
+        block = messages[start:start + block_size]
+        for offset, rows in enumerate(simulate(block, personas, seed)):
+            for row in rows:
+                yield {"message_index": start + offset, **row}
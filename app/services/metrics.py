@@ -0,0 +1,176 @@
+import math
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+# In-process metrics rendered in the Prometheus text exposition format (served at /metrics).
+#
+# Recording is a dict lookup plus an addition, without locks: almost everything is
+# recorded on the event loop thread, and the rare updates from worker threads rely on the
+# GIL (at worst an increment is lost under contention, which is fine for monitoring).
+# Series are keyed by label-value tuples; label values must come from small fixed sets
+# (route templates, status codes, cache names), never from user input.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# For slow external calls and background jobs
+LONG_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+LabelValues = Tuple[str, ...]
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _registry.append(self)
+
+    def _labels(self, values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(f'{extra[0]}="{extra[1]}"')
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {} if self.labelnames else {(): 0.0}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in list(self._values.items()):
+            yield f"{self.name}{self._labels(labels)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down. With `collect`, the value is computed at scrape time
+    instead: a number, or a {label values: number} dict for labelled gauges.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        collect: Optional[Callable[[], Union[float, Dict[LabelValues, float]]]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {} if self.labelnames else {(): 0.0}
+        self.collect = collect
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) - amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> Iterable[str]:
+        values = self._values
+        if self.collect is not None:
+            collected = self.collect()
+            values = collected if isinstance(collected, dict) else {(): collected}
+        for labels, value in list(values.items()):
+            yield f"{self.name}{self._labels(labels)} {_format_value(float(value))}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per series: a count per bucket (the last one is +Inf), then the sum of observations
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series.setdefault(labels, [0] * (len(self.buckets) + 1) + [0.0])
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def samples(self) -> Iterable[str]:
+        bounds = self.buckets + (math.inf,)
+        for labels, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                yield f"{self.name}_bucket{self._labels(labels, ('le', _format_value(float(bound))))} {cumulative}"
+            yield f"{self.name}_sum{self._labels(labels)} {_format_value(series[-1])}"
+            yield f"{self.name}_count{self._labels(labels)} {cumulative}"
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text format (version 0.0.4)."""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+# --- Application metrics -------------------------------------------------------------
+
+http_requests = Counter("http_requests_total", "HTTP requests by route template and status code.", ("method", "route", "status"))
+http_request_duration = Histogram("http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route"))
+http_exceptions = Counter("http_exceptions_total", "Requests that raised an unhandled exception.", ("method", "route"))
+
+db_connections_open = Gauge("db_connections_open", "Request-scoped database connections currently open.")
+db_connections_connecting = Gauge("db_connections_connecting", "Requests currently waiting for a database connection.")
+db_connect_duration = Histogram("db_connect_duration_seconds", "Time to open a request-scoped database connection.")
+db_queries_per_request = Histogram(
+    "db_queries_per_request", "Database statements run per HTTP request.", ("route",), buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+
+task_outcomes = Counter("tasks_finished_total", "Background tasks that reached a terminal status.", ("kind", "status"))
+n8n_webhook_duration = Histogram(
+    "n8n_webhook_duration_seconds", "Latency of the n8n generation webhook call.", ("outcome",), buckets=LONG_BUCKETS
+)
+analysis_job_duration = Histogram(
+    "analysis_job_duration_seconds", "Wall time of CSV analysis jobs, queueing included.", ("job", "outcome"), buckets=LONG_BUCKETS
+)
+cache_requests = Counter("cache_requests_total", "Cache lookups by cache and result (hit/miss).", ("cache", "result"))
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    cache_requests.inc(cache, "hit" if hit else "miss")
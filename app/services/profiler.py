@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from types import CodeType
+from typing import Dict, Iterable, List, Optional
+
+from app.config.settings import settings
+
+# On-demand sampling profiler for the live process. While a profile runs, a daemon thread
+# wakes every `interval` seconds, reads the target threads' current stacks through
+# sys._current_frames() and counts them; nothing is installed in between, so there is no
+# cost at all when idle (unlike sys.setprofile-based profilers).
+#
+# By default only the thread that creates the profiler (the event loop thread) is sampled;
+# samples where it is waiting in the selector (idle) are dropped unless include_idle is set.
+
+MAX_STORED_REQUEST_PROFILES = 20
+
+_IDLE_FILES = ("selectors.py",)
+
+_busy = threading.Lock()
+# Recent per-request profiles by id (see ProfilingMiddleware)
+request_profiles: "OrderedDict[str, SamplingProfiler]" = OrderedDict()
+
+
+class ProfilerBusyError(Exception):
+    """Only one profile runs at a time."""
+
+
+@lru_cache(maxsize=4096)
+def _frame_name(code: CodeType) -> str:
+    filename = code.co_filename
+    for prefix in sorted((p for p in sys.path if p and filename.startswith(p)), key=len, reverse=True)[:1]:
+        filename = os.path.relpath(filename, prefix)
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005, thread_ids: Optional[Iterable[int]] = None, include_idle: bool = False):
+        self.interval = interval
+        self.thread_ids = set(thread_ids) if thread_ids is not None else {threading.get_ident()}
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self.started_at = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if not _busy.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already running")
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            self.duration = time.perf_counter() - self.started_at
+            _busy.release()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            current = sys._current_frames()
+            for thread_id in self.thread_ids:
+                frame = current.get(thread_id)
+                if frame is None or thread_id == own:
+                    continue
+                if not self.include_idle and frame.f_code.co_filename.endswith(_IDLE_FILES):
+                    self.idle_samples += 1
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                stack.reverse()
+                self.stacks[tuple(stack)] += 1
+                self.samples += 1
+            # Do not keep other threads' frames (and their locals) alive between samples
+            del current
+
+    def to_folded(self) -> str:
+        """Brendan Gregg's folded format ("root;child;leaf count"), for flamegraph.pl or speedscope."""
+        lines = []
+        for stack, count in self.stacks.most_common():
+            lines.append(";".join(_frame_name(code) for code in stack) + f" {count}")
+        return "\n".join(lines) + "\n"
+
+    def to_speedscope(self, name: str = "profile") -> dict:
+        """A speedscope (https://www.speedscope.app) sampled profile, weighted in seconds."""
+        frame_index: Dict[CodeType, int] = {}
+        frames: List[dict] = []
+        samples: List[List[int]] = []
+        weights: List[float] = []
+        for stack, count in self.stacks.items():
+            indices = []
+            for code in stack:
+                index = frame_index.get(code)
+                if index is None:
+                    index = frame_index[code] = len(frames)
+                    frames.append({
+                        "name": getattr(code, "co_qualname", code.co_name),
+                        "file": code.co_filename,
+                        "line": code.co_firstlineno,
+                    })
+                indices.append(index)
+            samples.append(indices)
+            weights.append(round(count * self.interval, 6))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": round(sum(weights), 6),
+                "samples": samples,
+                "weights": weights,
+            }],
+            "name": name,
+            "exporter": "persona-survey-api sampling profiler",
+        }
+
+    def stats(self) -> dict:
+        return {
+            "duration_seconds": round(self.duration, 3),
+            "interval_seconds": self.interval,
+            "samples": self.samples,
+            "idle_samples": self.idle_samples,
+            "unique_stacks": len(self.stacks),
+        }
+
+
+async def profile_for(seconds: float, interval: float, include_idle: bool = False, all_threads: bool = False) -> SamplingProfiler:
+    """Samples the live process for `seconds` while the event loop keeps serving requests."""
+    thread_ids = [t.ident for t in threading.enumerate()] if all_threads else None
+    profiler = SamplingProfiler(interval, thread_ids, include_idle)
+    profiler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop()
+    return profiler
+
+
+# --- Per-request profiling -------------------------------------------------------------
+# A request carrying "X-Profile-Request: <expires>.<signature>" is profiled, where the
+# signature is HMAC-SHA256(PROFILING_SECRET, "<METHOD> <path> <expires>"). Admins mint the
+# header with POST /admin/profile/request-token. The profile id is returned in the
+# X-Profile-Id response header and the profile is kept in memory for the admin API.
+
+PROFILE_HEADER = b"x-profile-request"
+
+
+def sign_request(method: str, path: str, expires: int) -> str:
+    message = f"{method.upper()} {path} {expires}".encode()
+    signature = hmac.new(settings.PROFILING_SECRET.encode(), message, hashlib.sha256).hexdigest()
+    return f"{expires}.{signature}"
+
+
+def verify_request_signature(method: str, path: str, value: str) -> bool:
+    if not settings.PROFILING_SECRET:
+        return False
+    expires, _, _ = value.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(sign_request(method, path, int(expires)), value)
+
+
+def store_request_profile(profiler: SamplingProfiler) -> str:
+    profile_id = uuid.uuid4().hex
+    request_profiles[profile_id] = profiler
+    while len(request_profiles) > MAX_STORED_REQUEST_PROFILES:
+        request_profiles.popitem(last=False)
+    return profile_id
@@ -0,0 +1,152 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import asyncpg
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Per-request query accounting. Request connections are opened with TracingConnection,
+# which reports every fetch/fetchrow/fetchval/execute/executemany to the QueryStats of
+# the current request (a context variable set by QueryTracingMiddleware). Outside a
+# request (background jobs, scripts) only the slow-query log applies. Transaction control
+# (BEGIN, COMMIT, SAVEPOINT...) is only subject to the slow-query log too.
+
+SLOWEST_KEPT = 5
+
+_SQL_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_SQL_STRING = re.compile(r"'(?:[^']|'')*'")
+_SQL_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_SQL_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+# Sent by asyncpg's Transaction through execute(); not queries of the request's own
+_TRANSACTION_CONTROL = re.compile(r"\s*(?:BEGIN|START\s+TRANSACTION|COMMIT|END|ROLLBACK|SAVEPOINT|RELEASE)\b", re.I)
+
+
+class QueryBudgetExceededError(Exception):
+    """Raised in strict mode (tests) when a request exceeds its query budget or repeats a statement."""
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql: str) -> str:
+    """
+    The statement's shape: comments dropped, literals replaced by ?, whitespace collapsed.
+    Queries that differ only in their literal values normalize to the same string.
+    """
+    sql = _SQL_COMMENT.sub(" ", sql)
+    sql = _SQL_STRING.sub("?", sql)
+    sql = _SQL_NUMBER.sub("?", sql)
+    sql = _SQL_IN_LIST.sub("(?)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.shapes: Counter = Counter()
+        # (seconds, normalized sql), slowest first
+        self.slowest: List[Tuple[float, str]] = []
+
+    def record(self, shape: str, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        self.shapes[shape] += 1
+        if len(self.slowest) < SLOWEST_KEPT or seconds > self.slowest[-1][0]:
+            self.slowest.append((seconds, shape))
+            self.slowest.sort(reverse=True)
+            del self.slowest[SLOWEST_KEPT:]
+
+    def problems(self) -> List[str]:
+        found = []
+        if settings.DB_QUERY_BUDGET > 0 and self.count > settings.DB_QUERY_BUDGET:
+            found.append(f"{self.count} queries (budget {settings.DB_QUERY_BUDGET})")
+        if settings.DB_REPEATED_QUERY_THRESHOLD > 0:
+            for shape, count in self.shapes.items():
+                if count >= settings.DB_REPEATED_QUERY_THRESHOLD:
+                    found.append(f"possible N+1: {count}x {shape[:200]}")
+        return found
+
+    def summary(self) -> dict:
+        return {
+            "queries": self.count,
+            "db_ms": round(self.total_seconds * 1000, 2),
+            "slowest": [{"ms": round(s * 1000, 2), "sql": shape[:200]} for s, shape in self.slowest],
+        }
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def start_request() -> Tuple[QueryStats, object]:
+    """Starts counting the current context's queries; returns the stats and a reset token."""
+    stats = QueryStats()
+    return stats, _current.set(stats)
+
+
+def end_request(token) -> None:
+    _current.reset(token)
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def _record(query: str, seconds: float) -> None:
+    shape = None
+    if seconds * 1000 >= settings.DB_SLOW_QUERY_MS > 0:
+        shape = normalize_sql(query)
+        logger.warning("Slow query", extra={"duration_ms": round(seconds * 1000, 2), "sql": shape})
+    stats = _current.get()
+    if stats is None or _TRANSACTION_CONTROL.match(query):
+        return
+    stats.record(shape or normalize_sql(query), seconds)
+    if settings.DB_QUERY_BUDGET_STRICT:
+        problems = stats.problems()
+        if problems:
+            raise QueryBudgetExceededError("; ".join(problems))
+
+
+class TracingConnection(asyncpg.Connection):
+    """asyncpg connection that times each statement for the per-request query stats."""
+
+    async def fetch(self, query, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().fetch(query, *args, **kwargs)
+        finally:
+            _record(query, time.perf_counter() - start)
+
+    async def fetchrow(self, query, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().fetchrow(query, *args, **kwargs)
+        finally:
+            _record(query, time.perf_counter() - start)
+
+    async def fetchval(self, query, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().fetchval(query, *args, **kwargs)
+        finally:
+            _record(query, time.perf_counter() - start)
+
+    async def execute(self, query, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().execute(query, *args, **kwargs)
+        finally:
+            _record(query, time.perf_counter() - start)
+
+    async def executemany(self, command, args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().executemany(command, args, **kwargs)
+        finally:
+            _record(command, time.perf_counter() - start)
@@ -0,0 +1,107 @@
+import logging
+import math
+import time
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Sliding-window rate limiting (the "sliding window counter" approximation): each key
+# keeps a count per fixed window, and the current rate is the current window's count
+# plus the previous window's count weighted by how much of it still overlaps the
+# sliding window. Two integers per key, and it maps directly onto Redis INCR/EXPIRE.
+
+
+class MemoryBackend:
+    """Per-process counters. Each worker process enforces its own limits."""
+
+    def __init__(self):
+        self._counts: Dict[Tuple[str, int], int] = {}
+        self._calls = 0
+
+    async def increment(self, key: str, window_index: int, window_seconds: float) -> Tuple[int, int]:
+        """Adds one hit to `key` in window `window_index`; returns (current, previous) window counts."""
+        current = self._counts.get((key, window_index), 0) + 1
+        self._counts[(key, window_index)] = current
+        self._calls += 1
+        if self._calls % 1024 == 0:
+            self._prune(window_index)
+        return current, self._counts.get((key, window_index - 1), 0)
+
+    def _prune(self, window_index: int):
+        # Windows older than the previous one can no longer affect any decision
+        stale = [k for k in self._counts if k[1] < window_index - 1]
+        for k in stale:
+            del self._counts[k]
+
+
+class RedisBackend:
+    """Counters shared by every worker through Redis. Requires the optional `redis` package."""
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise ImportError("RATE_LIMIT_REDIS_URL is set but the 'redis' package is not installed (pip install redis)") from e
+        self._redis = redis.from_url(url)
+
+    async def increment(self, key: str, window_index: int, window_seconds: float) -> Tuple[int, int]:
+        current_key = f"ratelimit:{key}:{window_index}"
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.incr(current_key)
+            pipe.expire(current_key, int(math.ceil(window_seconds * 2)))
+            pipe.get(f"ratelimit:{key}:{window_index - 1}")
+            current, _, previous = await pipe.execute()
+        return int(current), int(previous or 0)
+
+
+class SlidingWindowLimiter:
+    def __init__(self, name: str, limit: int, window_seconds: float, backend=None):
+        self.name = name
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.backend = backend
+
+    async def hit(self, key: str, now: Optional[float] = None) -> Tuple[bool, float]:
+        """
+        Records one attempt for `key`. Returns (allowed, retry_after_seconds).
+        Rejected attempts are counted too, so a client that keeps hammering stays blocked.
+        """
+        if self.limit <= 0:
+            return True, 0.0
+        now = time.time() if now is None else now
+        window_index = int(now // self.window_seconds)
+        elapsed = (now % self.window_seconds) / self.window_seconds
+        current, previous = await (self.backend or get_backend()).increment(
+            f"{self.name}:{key}", window_index, self.window_seconds
+        )
+        rate = current + previous * (1 - elapsed)
+        if rate <= self.limit:
+            return True, 0.0
+        return False, self.window_seconds * (1 - elapsed)
+
+
+# Outcome counters, by limiter name: "<name>.allowed" / "<name>.rejected"
+counters: Counter = Counter()
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if settings.RATE_LIMIT_REDIS_URL:
+            _backend = RedisBackend(settings.RATE_LIMIT_REDIS_URL)
+            logger.info("Rate limiting uses the shared Redis backend")
+        else:
+            _backend = MemoryBackend()
+    return _backend
+
+
+def reset():
+    """Drops all counters and the backend (used by tests)."""
+    global _backend
+    _backend = None
+    counters.clear()
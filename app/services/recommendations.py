@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+import asyncpg
+import numpy as np
+from scipy import sparse
+
+from app.config.settings import settings
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Item-to-item "For You" recommendations from like co-occurrence.
+# A periodic job builds the user x creation like matrix, multiplies it into a sparse
+# creation x creation co-occurrence matrix, normalises it to cosine similarity and stores
+# the top-N neighbours of every creation in creation_neighbors. Serving a user merges the
+# stored neighbours of their recent likes into one ranked list, cached per user.
+
+NEIGHBORS_PER_CREATION = 50
+# Heavy likers add O(likes^2) pairs and say little about any single item
+MAX_LIKES_PER_USER = 500
+RECENT_LIKES = 50
+FOR_YOU_LIST_SIZE = 500
+
+
+def top_neighbors(
+    user_ids: Sequence[int], creation_ids: Sequence[int], top_n: int = NEIGHBORS_PER_CREATION
+) -> List[Tuple[int, int, float]]:
+    """
+    Builds (creation_id, neighbor_id, score) rows from (user_id, creation_id) like pairs.
+    The score is the cosine similarity of the two creations' liker sets.
+    """
+    if not len(user_ids):
+        return []
+    users, user_index = np.unique(np.asarray(user_ids), return_inverse=True)
+    items, item_index = np.unique(np.asarray(creation_ids), return_inverse=True)
+    likes = sparse.csr_matrix(
+        (np.ones(len(user_index), dtype=np.float32), (user_index, item_index)),
+        shape=(len(users), len(items)),
+    )
+    likes.data[:] = 1.0  # duplicate pairs collapse to a single like
+
+    co = (likes.T @ likes).tocsr()
+    counts = co.diagonal()
+    co.setdiag(0)
+    co.eliminate_zeros()
+    # cosine: co[i, j] / sqrt(n_i * n_j)
+    inv = 1.0 / np.sqrt(np.maximum(counts, 1))
+    co = sparse.diags(inv) @ co @ sparse.diags(inv)
+    co = co.tocsr()
+
+    rows: List[Tuple[int, int, float]] = []
+    for i in range(co.shape[0]):
+        start, end = co.indptr[i], co.indptr[i + 1]
+        if start == end:
+            continue
+        scores = co.data[start:end]
+        cols = co.indices[start:end]
+        if len(scores) > top_n:
+            keep = np.argpartition(-scores, top_n - 1)[:top_n]
+            scores, cols = scores[keep], cols[keep]
+        source = int(items[i])
+        rows.extend((source, int(items[j]), float(s)) for j, s in zip(cols, scores))
+    return rows
+
+
+async def rebuild_neighbors(conn: asyncpg.Connection, top_n: int = NEIGHBORS_PER_CREATION) -> int:
+    """Recomputes creation_neighbors from the likes table. Returns the number of rows stored."""
+    likes = await conn.fetch(
+        """
+        SELECT l.user_id, l.creation_id
+        FROM (
+            SELECT user_id, creation_id,
+                   ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY created_at DESC) AS rn
+            FROM likes
+        ) l
+        JOIN creations c ON c.id = l.creation_id AND c.is_public = TRUE
+        WHERE l.rn <= $1
+        """,
+        MAX_LIKES_PER_USER
+    )
+    user_ids = [r["user_id"] for r in likes]
+    creation_ids = [r["creation_id"] for r in likes]
+    del likes
+    # The sparse product is CPU-bound; keep it off the event loop
+    rows = await asyncio.to_thread(top_neighbors, user_ids, creation_ids, top_n)
+
+    async with conn.transaction():
+        await conn.execute("DELETE FROM creation_neighbors")
+        if rows:
+            await conn.copy_records_to_table(
+                "creation_neighbors", records=rows, columns=["creation_id", "neighbor_id", "score"]
+            )
+    for_you_cache.clear()
+    return len(rows)
+
+
+async def run_neighbors_job():
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        count = await rebuild_neighbors(conn)
+        logger.info("Rebuilt creation neighbours: %d rows", count)
+    finally:
+        await conn.close()
+
+
+class ForYouCache:
+    """Per-user ranked creation id lists with a TTL, bounded in size (least recently used evicted)."""
+
+    def __init__(self, ttl_seconds: float, max_users: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max_users
+        self._entries: "OrderedDict[int, Tuple[float, List[int]]]" = OrderedDict()
+
+    def get(self, user_id: int) -> Optional[List[int]]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, creation_ids = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return creation_ids
+
+    def put(self, user_id: int, creation_ids: List[int]):
+        self._entries[user_id] = (time.monotonic() + self.ttl_seconds, creation_ids)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+
+    def discard(self, user_id: int):
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+for_you_cache = ForYouCache(settings.FOR_YOU_CACHE_TTL_SECONDS, settings.FOR_YOU_CACHE_MAX_USERS)
+
+
+async def get_for_you_ids(conn: asyncpg.Connection, user_id: int) -> List[int]:
+    """
+    The user's ranked "For You" creation ids: neighbours of their most recent likes,
+    summed over likes, excluding what they already liked. Cached per user.
+    """
+    cached = for_you_cache.get(user_id)
+    metrics.record_cache("for_you", cached is not None)
+    if cached is not None:
+        return cached
+    rows = await conn.fetch(
+        """
+        WITH recent AS (
+            SELECT creation_id FROM likes WHERE user_id = $1 ORDER BY created_at DESC LIMIT $2
+        )
+        SELECT n.neighbor_id
+        FROM recent r
+        JOIN creation_neighbors n ON n.creation_id = r.creation_id
+        WHERE NOT EXISTS (SELECT 1 FROM likes l WHERE l.user_id = $1 AND l.creation_id = n.neighbor_id)
+        GROUP BY n.neighbor_id
+        ORDER BY SUM(n.score) DESC, n.neighbor_id DESC
+        LIMIT $3
+        """,
+        user_id, RECENT_LIKES, FOR_YOU_LIST_SIZE
+    )
+    creation_ids = [r["neighbor_id"] for r in rows]
+    for_you_cache.put(user_id, creation_ids)
+    return creation_ids
@@ -0,0 +1,101 @@
+import asyncio
+import hashlib
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+import asyncpg
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Periodic background jobs started from the application lifespan.
+# Each job runs in its own asyncio task; a failing run is logged and retried on the next tick.
+_jobs: Dict[str, asyncio.Task] = {}
+
+
+def _lock_key(name: str) -> int:
+    """Stable 64-bit advisory lock key for a job name (hash() differs between processes)."""
+    return int.from_bytes(hashlib.blake2b(f"periodic:{name}".encode(), digest_size=8).digest(), "big", signed=True)
+
+
+class _JobLeases:
+    """
+    Postgres advisory locks of exclusive jobs, held on one connection per process. The
+    process holding a job's lock runs it on every tick; the others skip the tick and try
+    for the lock again on the next one, so the job moves on when its holder exits (its
+    connection closes and Postgres releases the lock).
+    """
+
+    def __init__(self):
+        self._conn: Optional[asyncpg.Connection] = None
+        self._held: Set[str] = set()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, name: str) -> bool:
+        async with self._lock:
+            try:
+                if self._conn is None or self._conn.is_closed():
+                    self._held.clear()
+                    self._conn = await asyncpg.connect(settings.DATABASE_URL)
+                # Session locks stack; only take each one once
+                if name not in self._held and await self._conn.fetchval("SELECT pg_try_advisory_lock($1)", _lock_key(name)):
+                    self._held.add(name)
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+                self._drop()
+                raise
+            return name in self._held
+
+    def _drop(self):
+        conn, self._conn = self._conn, None
+        self._held.clear()
+        if conn is not None and not conn.is_closed():
+            conn.terminate()
+
+    async def close(self):
+        async with self._lock:
+            if self._conn is not None and not self._conn.is_closed():
+                await self._conn.close()
+            self._conn = None
+            self._held.clear()
+
+
+_leases = _JobLeases()
+
+
+async def _run_periodically(name: str, interval_seconds: float, job: Callable[[], Awaitable[None]], exclusive: bool):
+    while True:
+        try:
+            if not exclusive or await _leases.acquire(name):
+                await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Periodic job '%s' failed", name)
+        await asyncio.sleep(interval_seconds)
+
+
+def start_periodic(name: str, interval_seconds: float, job: Callable[[], Awaitable[None]], exclusive: bool = False) -> None:
+    """
+    Starts `job` every `interval_seconds`. A non-positive interval disables the job.
+    An `exclusive` job runs in a single process among all those sharing the database
+    (for jobs that write shared state); others refresh per-process state and run everywhere.
+    """
+    if interval_seconds <= 0:
+        logger.info("Periodic job '%s' disabled", name)
+        return
+    existing = _jobs.get(name)
+    if existing and not existing.done():
+        return
+    _jobs[name] = asyncio.create_task(_run_periodically(name, interval_seconds, job, exclusive), name=f"periodic:{name}")
+
+
+async def stop_all() -> None:
+    """Cancels every periodic job and waits for them to finish."""
+    tasks = list(_jobs.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _jobs.clear()
+    # Releases the locks, so another process takes the exclusive jobs over
+    await _leases.close()
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import asyncpg
+from fastapi import Depends
+
+from app.config.settings import settings
+from app.repositories.storage_repository import StorageRepository
+
+logger = logging.getLogger(__name__)
+
+# Public URL prefix -> directory on disk, for every location the app writes files to.
+# /static/files/ holds analysed CSV uploads, written to the configurable UPLOAD_DIRECTORY.
+STORAGE_ROOTS = {
+    "/static/uploads/": "app/static/uploads",
+    "/static/files/": settings.UPLOAD_DIRECTORY,
+}
+
+
+def url_to_path(file_url: str) -> Optional[str]:
+    """Maps a public /static URL to its local path. Returns None for remote or unmanaged URLs."""
+    for prefix, directory in STORAGE_ROOTS.items():
+        if file_url and file_url.startswith(prefix):
+            name = file_url[len(prefix):]
+            # Never follow nested paths out of the storage root
+            if not name or "/" in name or name in (".", ".."):
+                return None
+            return os.path.join(directory, name)
+    return None
+
+
+def _remove_files(paths: List[Tuple[int, Optional[str]]]) -> Tuple[List[int], List[Tuple[int, str]]]:
+    """Blocking part of the deletion batch; runs in a worker thread."""
+    done, failed = [], []
+    for queue_id, path in paths:
+        try:
+            if path:
+                os.remove(path)
+            done.append(queue_id)
+        except FileNotFoundError:
+            done.append(queue_id)
+        except OSError as e:
+            failed.append((queue_id, str(e)))
+    return done, failed
+
+
+def _scan_storage(grace_seconds: float) -> List[Dict[str, Any]]:
+    """Sweep phase: lists stored files older than the grace period. Runs in a worker thread."""
+    cutoff = time.time() - grace_seconds
+    found = []
+    for prefix, directory in STORAGE_ROOTS.items():
+        if not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                # Skip fresh files: an upload writes the file before its row is inserted
+                if stat.st_mtime > cutoff:
+                    continue
+                found.append({"url": prefix + entry.name, "size_bytes": stat.st_size, "modified_at": stat.st_mtime})
+    return found
+
+
+class StorageService:
+    def __init__(self, storage_repo: StorageRepository = Depends()):
+        self.storage_repo = storage_repo
+
+    async def schedule_deletion(self, conn: asyncpg.Connection, file_url: str, reason: str) -> None:
+        """
+        Queues a local file for deletion. Call this in the same transaction that removes the
+        referencing row so that either both happen or neither does.
+        """
+        if url_to_path(file_url):
+            await self.storage_repo.enqueue_deletion(conn, file_url, reason)
+
+    async def process_deletion_queue(self, conn: asyncpg.Connection, batch_size: Optional[int] = None) -> Dict[str, int]:
+        """Deletes one batch of queued files off the request path."""
+        batch_size = batch_size or settings.STORAGE_DELETION_BATCH_SIZE
+        async with conn.transaction():
+            batch = await self.storage_repo.claim_deletion_batch(conn, batch_size)
+            if not batch:
+                return {"deleted": 0, "failed": 0}
+            paths = [(item["id"], url_to_path(item["file_url"])) for item in batch]
+            done, failed = await asyncio.to_thread(_remove_files, paths)
+            await self.storage_repo.complete_deletions(conn, done)
+            for queue_id, error in failed:
+                await self.storage_repo.fail_deletion(conn, queue_id, error)
+        return {"deleted": len(done), "failed": len(failed)}
+
+    async def find_orphans(self, conn: asyncpg.Connection, grace_seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Mark-and-sweep: marks every URL referenced by creations, media_files and analysis_results,
+        then sweeps the storage directories for files nothing references.
+        """
+        if grace_seconds is None:
+            grace_seconds = settings.STORAGE_ORPHAN_GRACE_SECONDS
+        referenced = await self.storage_repo.get_referenced_file_urls(conn)
+        stored = await asyncio.to_thread(_scan_storage, grace_seconds)
+        return [f for f in stored if f["url"] not in referenced]
+
+    async def reconcile(self, conn: asyncpg.Connection, reclaim: bool = False, report_limit: int = 100) -> Dict[str, Any]:
+        """
+        Reports orphaned files and, if `reclaim` is set, queues them for deletion.
+        """
+        orphans = await self.find_orphans(conn)
+        if reclaim and orphans:
+            await self.storage_repo.enqueue_deletions(conn, [o["url"] for o in orphans], "orphan")
+        return {
+            "orphan_count": len(orphans),
+            "orphan_bytes": sum(o["size_bytes"] for o in orphans),
+            "reclaimed": reclaim,
+            "pending_deletions": await self.storage_repo.count_pending_deletions(conn),
+            "orphans": orphans[:report_limit],
+        }
+
+
+# --- Periodic jobs (started from the application lifespan) ---
+
+async def run_deletion_queue_job():
+    """Drains the deletion queue batch by batch using a dedicated connection."""
+    service = StorageService(StorageRepository())
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        while True:
+            stats = await service.process_deletion_queue(conn)
+            if stats["deleted"] or stats["failed"]:
+                logger.info("Storage deletion batch: %s", stats)
+            if stats["deleted"] + stats["failed"] < settings.STORAGE_DELETION_BATCH_SIZE:
+                break
+    finally:
+        await conn.close()
+
+
+async def run_reconcile_job():
+    """Periodic orphan sweep. Only reports unless STORAGE_RECONCILE_RECLAIM is enabled."""
+    service = StorageService(StorageRepository())
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        report = await service.reconcile(conn, reclaim=settings.STORAGE_RECONCILE_RECLAIM, report_limit=0)
+        if report["orphan_count"]:
+            logger.warning(
+                "Storage reconcile found %d orphaned files (%d bytes), reclaimed=%s",
+                report["orphan_count"], report["orphan_bytes"], report["reclaimed"]
+            )
+    finally:
+        await conn.close()
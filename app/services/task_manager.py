@@ -1,17 +1,41 @@
+import asyncio
 import uuid
-from typing import Dict, Any, Optional
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional
+
+from app.services import metrics, tracing
 
 # This is a simple in-memory task manager.
 # In a real-world application, you might use Redis, Celery, or a database for this.
 tasks: Dict[str, Dict[str, Any]] = {}
 
-def create_task() -> str:
+# Bumped whenever a task changes. Subscribers wait for the version to pass the last one they
+# saw, so a change made while they were busy (not waiting) is not missed.
+_task_versions: Dict[str, int] = {}
+# Signalled on every change, so subscribers can wait instead of polling.
+_task_events: Dict[str, asyncio.Event] = {}
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+# Diagnostics shown to admins only
+ADMIN_ONLY_FIELDS = ("trace_id", "timings")
+
+def _queue_depth():
+    depth = Counter((t["kind"], t["status"]) for t in list(tasks.values()) if t["status"] not in TERMINAL_STATUSES)
+    return {**{(kind, status): 0 for kind in ("creation", "analysis") for status in ("pending", "processing")}, **depth}
+
+metrics.Gauge("tasks_in_progress", "Background tasks not yet finished, by kind and status.", ("kind", "status"), collect=_queue_depth)
+
+def create_task(kind: str = "creation", owner_id: Optional[int] = None, trace_id: Optional[str] = None) -> str:
     """
     Creates a new task with a unique ID and sets its status to 'pending'.
     Returns the new task ID.
     """
     task_id = str(uuid.uuid4())
-    tasks[task_id] = {"status": "pending", "result": None}
+    tasks[task_id] = {"status": "pending", "result": None, "kind": kind, "owner_id": owner_id}
+    if trace_id:
+        tasks[task_id]["trace_id"] = trace_id
     return task_id
 
 def get_task(task_id: str) -> Optional[Dict[str, Any]]:
@@ -20,6 +44,16 @@ def get_task(task_id: str) -> Optional[Dict[str, Any]]:
     """
     return tasks.get(task_id)
 
+def get_task_version(task_id: str) -> int:
+    """The task's change counter; pass it to wait_for_update()."""
+    return _task_versions.get(task_id, 0)
+
+def _notify(task_id: str):
+    _task_versions[task_id] = _task_versions.get(task_id, 0) + 1
+    event = _task_events.pop(task_id, None)
+    if event is not None:
+        event.set()
+
 def update_task_status(task_id: str, status: str, result: Any = None):
     """
     Updates the status and result of a task.
@@ -27,7 +61,58 @@ def update_task_status(task_id: str, status: str, result: Any = None):
     if task_id in tasks:
         tasks[task_id]["status"] = status
         tasks[task_id]["result"] = result
+        if status == "completed" and tasks[task_id].get("progress"):
+            tasks[task_id]["progress"] = {"stage": "done", "percent": 100.0}
+        if status in TERMINAL_STATUSES:
+            metrics.task_outcomes.inc(tasks[task_id]["kind"], status)
+        _notify(task_id)
     else:
         # Handle the case where the task ID is not found, maybe log a warning
         print(f"Warning: Task ID {task_id} not found for update.")
 
+def update_task_progress(task_id: str, stage: str, percent: float, **details: Any):
+    """
+    Records the current stage and percent complete of a running task.
+    Late updates for a finished task are ignored.
+    """
+    task = tasks.get(task_id)
+    if task is None or task["status"] in TERMINAL_STATUSES:
+        return
+    task["progress"] = {"stage": stage, "percent": percent, **details}
+    _notify(task_id)
+
+def record_stage(task_id: str, stage: str, duration_ms: float, status: str = "OK"):
+    """Appends a stage to the task's timing breakdown."""
+    task = tasks.get(task_id)
+    if task is not None:
+        task.setdefault("timings", []).append({"stage": stage, "ms": round(duration_ms, 2), "status": status})
+
+@contextmanager
+def stage(task_id: str, name: str, parent: Optional[tracing.SpanContext] = None, **attributes: Any) -> Iterator[tracing.Span]:
+    """
+    Runs one stage of a task inside a span (linked to the task id) and records its
+    duration in the task's timing breakdown.
+    """
+    span = None
+    try:
+        with tracing.start_span(f"{tasks.get(task_id, {}).get('kind', 'task')}.{name}", parent, **{"task.id": task_id, **attributes}) as span:
+            yield span
+    finally:
+        if span is not None:
+            record_stage(task_id, name, span.duration_ms, span.status)
+
+async def wait_for_update(task_id: str, seen_version: int, timeout: float) -> int:
+    """
+    Waits until the task's version passes `seen_version` or `timeout` elapses.
+    Returns the current version (still `seen_version` on timeout).
+    """
+    if get_task_version(task_id) > seen_version:
+        return get_task_version(task_id)
+    event = _task_events.get(task_id)
+    if event is None:
+        event = _task_events[task_id] = asyncio.Event()
+    try:
+        await asyncio.wait_for(event.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        pass
+    return get_task_version(task_id)
@@ -0,0 +1,147 @@
+import json
+import logging
+import os
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from typing import Any, Dict, Iterator, Optional
+
+from app.config.settings import settings
+
+# Minimal span tracing. Spans use OpenTelemetry's data model (32-hex trace ids, 16-hex
+# span ids, parent ids, unix-nano timestamps, attributes, status) and are exported as one
+# JSON object per line, so a collector's filelog receiver or any JSON tooling can read them.
+# TRACING_EXPORTER selects "console" (the application log), "file" (TRACING_FILE) or "none".
+#
+# A trace can continue in a background task: pass the SpanContext of the request span
+# (span.context) as `parent`.
+
+SERVICE_NAME = "persona-survey-api"
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_span_logger: Optional[logging.Logger] = None
+_file_listener: Optional[QueueListener] = None
+
+
+class _SpanLineFormatter(logging.Formatter):
+    # Serialises on the listener thread, not in the request
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.span, default=str)
+
+
+class SpanContext:
+    __slots__ = ("trace_id", "span_id")
+
+    def __init__(self, trace_id: str, span_id: str):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+
+class Span:
+    def __init__(self, name: str, parent: Optional[SpanContext], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.start_time_unix_nano = time.time_ns()
+        self._start = time.perf_counter()
+        self.duration_ms = 0.0
+        self.status = "OK"
+        self.status_message: Optional[str] = None
+
+    @property
+    def context(self) -> SpanContext:
+        return SpanContext(self.trace_id, self.span_id)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, exc: BaseException) -> None:
+        self.status = "ERROR"
+        self.status_message = f"{type(exc).__name__}: {exc}"[:500]
+
+    def end(self) -> None:
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+        _export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "resource": {"service.name": SERVICE_NAME},
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time_unix_nano": self.start_time_unix_nano,
+            "end_time_unix_nano": self.start_time_unix_nano + int(self.duration_ms * 1e6),
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.status_message},
+        }
+
+
+def _get_span_logger() -> Optional[logging.Logger]:
+    global _span_logger, _file_listener
+    if settings.TRACING_EXPORTER == "none":
+        return None
+    if _span_logger is None:
+        span_logger = logging.getLogger("app.tracing.spans")
+        if settings.TRACING_EXPORTER == "file":
+            os.makedirs(os.path.dirname(settings.TRACING_FILE) or ".", exist_ok=True)
+            file_handler = logging.FileHandler(settings.TRACING_FILE)
+            file_handler.setFormatter(_SpanLineFormatter())
+            # Written by a listener thread, like the application log
+            span_queue: SimpleQueue = SimpleQueue()
+            _file_listener = QueueListener(span_queue, file_handler)
+            _file_listener.start()
+            span_logger.addHandler(QueueHandler(span_queue))
+            span_logger.propagate = False
+        span_logger.setLevel(logging.INFO)
+        _span_logger = span_logger
+    return _span_logger
+
+
+def _export(span: Span) -> None:
+    span_logger = _get_span_logger()
+    if span_logger is None:
+        return
+    span_logger.info("span", extra={"span": span.to_dict()})
+
+
+@contextmanager
+def start_span(name: str, parent: Optional[SpanContext] = None, **attributes: Any) -> Iterator[Span]:
+    """
+    Runs the block inside a span, a child of `parent` or else of the current span.
+    An exception marks the span as failed and propagates.
+    """
+    if parent is None:
+        current = _current_span.get()
+        parent = current.context if current is not None else None
+    span = Span(name, parent, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as exc:
+        span.record_error(exc)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def shutdown() -> None:
+    global _file_listener, _span_logger
+    if _file_listener is not None:
+        _file_listener.stop()
+        _file_listener = None
+    if _span_logger is not None:
+        for handler in list(_span_logger.handlers):
+            _span_logger.removeHandler(handler)
+        _span_logger = None
@@ -2,7 +2,12 @@ from app.repositories.users_repository import UserRepository
 from fastapi import Depends, HTTPException
 import asyncpg
 from typing import List, Dict, Any, Optional
-from app.auth.password_util import hash_password, verify_password
+from app.auth.password_util import (
+    PasswordHasherBusyError,
+    PasswordHashTimeoutError,
+    hash_password_async,
+    verify_and_update_async,
+)
 
 class UserService:
     def __init__(self, user_repo: UserRepository = Depends()):
@@ -10,10 +15,7 @@ class UserService:
 
     async def get_or_create_user(self, conn: asyncpg.Connection, email: str, name: str, picture: str):
         """For Google OAuth: Finds a user or creates them if they don't exist."""
-        user = await self.user_repo.get_user_by_email(conn, email)
-        if not user:
-            user = await self.user_repo.create_user(conn, email=email, name=name, picture=picture, role="MEMBER", hashed_password=None)
-        return user
+        return await self.user_repo.upsert_oauth_user(conn, email=email, name=name or email.split("@")[0], picture=picture)
 
     async def register_new_user(self, conn: asyncpg.Connection, email: str, password: str, name: str) -> Dict[str, Any]:
         """Registers a new user with an email and password."""
@@ -21,7 +23,7 @@ class UserService:
         if existing_user:
             raise HTTPException(status_code=400, detail="Email already registered")
 
-        hashed_pass = hash_password(password)
+        hashed_pass = await self._hash_call(hash_password_async(password))
         
         # For email signups, we can use a generic or generated profile picture
         default_picture = f"https://api.multiavatar.com/{email}.png"
@@ -42,11 +44,30 @@ class UserService:
         if not user:
             return None
         
-        if not user["hashed_password"] or not verify_password(password, user["hashed_password"]):
+        if not user["hashed_password"]:
             return None
-            
+        verified, new_hash = await self._hash_call(verify_and_update_async(password, user["hashed_password"]))
+        if not verified:
+            return None
+        if new_hash:
+            # Stored hash uses an old work factor (BCRYPT_ROUNDS changed); upgrade it transparently
+            await self.user_repo.update_password_hash(conn, user["id"], new_hash)
+            user["hashed_password"] = new_hash
+
         return user
 
+    @staticmethod
+    async def _hash_call(call):
+        """Awaits a password hashing call, mapping executor overload to 503."""
+        try:
+            return await call
+        except (PasswordHasherBusyError, PasswordHashTimeoutError):
+            raise HTTPException(
+                status_code=503,
+                detail="Too many sign-in attempts right now. Please retry shortly.",
+                headers={"Retry-After": "2"},
+            )
+
     async def get_user_creations(self, conn: asyncpg.Connection, user_id: int) -> List[Dict[str, Any]]:
         """Retrieves all creations for a specific user."""
         return await self.user_repo.get_creations_by_user_id(conn, user_id)
@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import multiprocessing
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Set
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Shared process pool for CPU-heavy jobs (CSV analysis). Created lazily on first use
+# and shut down from the application lifespan.
+_pool: Optional[ProcessPoolExecutor] = None
+
+# Progress messages flow from workers to the app through one queue, shared by successive
+# pools. A daemon thread drains it and hands each message to the listener registered for its job.
+_progress_queue = None
+_progress_listeners: Dict[str, Callable[[dict], None]] = {}
+
+# Set inside worker processes by _init_worker
+_worker_progress_queue = None
+
+# Time limits are enforced inside the worker (SIGALRM), which aborts just that job. A job
+# that still has not returned this long after its limit (stuck in C code that never yields
+# to the signal handler) gets its pool retired: new jobs go to a fresh pool while the old
+# one's other jobs finish, then its workers are terminated, the stuck one included.
+JOB_TIMEOUT_GRACE_SECONDS = 30
+# A retired pool's workers are terminated after this long even if jobs are still running
+RETIRED_POOL_MAX_WAIT_SECONDS = 600
+
+# Jobs in flight per pool, and the reaper task of every retired pool
+_pool_jobs: Dict[ProcessPoolExecutor, Set[asyncio.Future]] = {}
+_retired: Dict[ProcessPoolExecutor, asyncio.Task] = {}
+
+
+class JobTimeoutError(Exception):
+    """Raised when a pooled job exceeds its time limit. Other jobs in the pool are unaffected."""
+
+
+class _DeadlineExceeded(BaseException):
+    """
+    Raised inside a worker when its job runs out of time. A BaseException, so the job's
+    own `except Exception` handlers do not swallow it.
+    """
+
+
+class WorkerCrashedError(Exception):
+    """Raised when a worker process dies mid-job (e.g. killed by the OS)."""
+
+
+def _init_worker(memory_limit_mb: int, progress_queue=None):
+    global _worker_progress_queue
+    _worker_progress_queue = progress_queue
+    # Cap the address space of each worker so a huge upload raises MemoryError
+    # in the worker instead of taking the whole host down.
+    if memory_limit_mb > 0:
+        try:
+            import resource
+            limit = memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass
+
+
+def _run_with_deadline(fn: Callable[..., Any], timeout: Optional[float], *args: Any) -> Any:
+    """Runs `fn(*args)` in the worker, aborting it with _DeadlineExceeded after `timeout` seconds."""
+    if not timeout or not hasattr(signal, "setitimer"):
+        return fn(*args)
+
+    def expired(signum, frame):
+        raise _DeadlineExceeded()
+
+    previous = signal.signal(signal.SIGALRM, expired)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return fn(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def report_progress(job_id: Optional[str], stage: str, percent: float, **details: Any) -> None:
+    """
+    Called from inside a pooled job to publish progress. A no-op outside a worker
+    or when the job is not tracked.
+    """
+    if job_id and _worker_progress_queue is not None:
+        try:
+            _worker_progress_queue.put_nowait({"job_id": job_id, "stage": stage, "percent": round(percent, 1), **details})
+        except Exception:
+            pass  # progress is best-effort; never fail the job over it
+
+
+def _drain_progress(queue, loop: asyncio.AbstractEventLoop):
+    while True:
+        message = queue.get()
+        if message is None:
+            return
+        listener = _progress_listeners.get(message.get("job_id"))
+        if listener is not None:
+            loop.call_soon_threadsafe(listener, message)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool, _progress_queue
+    if _pool is None:
+        context = multiprocessing.get_context("spawn")
+        if _progress_queue is None:
+            _progress_queue = context.Queue()
+            threading.Thread(
+                target=_drain_progress, args=(_progress_queue, asyncio.get_running_loop()),
+                name="worker-pool-progress", daemon=True
+            ).start()
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.ANALYSIS_POOL_SIZE,
+            # spawn: workers must not inherit the event loop, sockets or DB connections
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(settings.ANALYSIS_WORKER_MEMORY_MB, _progress_queue),
+            max_tasks_per_child=settings.ANALYSIS_WORKER_MAX_TASKS,
+        )
+    return _pool
+
+
+def _close_progress_queue():
+    global _progress_queue
+    if _progress_queue is not None:
+        _progress_queue.put(None)
+        _progress_queue = None
+
+
+def _workers(pool: ProcessPoolExecutor) -> list:
+    # Read before pool.shutdown(), which drops the executor's reference to them
+    return list((getattr(pool, "_processes", None) or {}).values())
+
+
+def _terminate_workers(processes: list, join_timeout: float = 5.0):
+    """Terminates (then kills, if need be) worker processes and waits for them. Blocking."""
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join(join_timeout)
+        if process.is_alive():
+            process.kill()
+            process.join(join_timeout)
+
+
+async def _reap(pool: ProcessPoolExecutor):
+    """Waits for a retired pool's other jobs (at most RETIRED_POOL_MAX_WAIT_SECONDS), then ends its workers."""
+    try:
+        jobs = [job for job in _pool_jobs.get(pool, ()) if not job.done()]
+        if jobs:
+            await asyncio.wait(jobs, timeout=RETIRED_POOL_MAX_WAIT_SECONDS)
+        processes = _workers(pool)
+        pool.shutdown(wait=False, cancel_futures=True)
+        await asyncio.to_thread(_terminate_workers, processes)
+    finally:
+        _retired.pop(pool, None)
+        _pool_jobs.pop(pool, None)
+
+
+def _retire_pool(pool: ProcessPoolExecutor):
+    """
+    Sends new jobs to a fresh pool. The old pool's jobs still complete, then its workers are
+    terminated: a stuck worker never goes idle, so it would otherwise live as long as the app.
+    (Killing only the stuck worker right away would break the pool and fail its other jobs.)
+    """
+    global _pool
+    if _pool is pool:
+        _pool = None
+    if pool not in _retired:
+        _retired[pool] = asyncio.get_running_loop().create_task(_reap(pool), name="worker-pool-reaper")
+
+
+async def run_in_pool(
+    fn: Callable[..., Any],
+    *args: Any,
+    timeout: Optional[float] = None,
+    job_id: Optional[str] = None,
+    on_progress: Optional[Callable[[dict], None]] = None,
+) -> Any:
+    """
+    Runs `fn(*args)` in a worker process without blocking the event loop.
+    `fn` and its arguments must be picklable, so pass file paths rather than DataFrames.
+    Progress published by the job via report_progress(job_id, ...) is delivered to
+    `on_progress` on the event loop.
+    """
+    pool = get_pool()
+    loop = asyncio.get_running_loop()
+    if job_id and on_progress:
+        _progress_listeners[job_id] = on_progress
+    future = loop.run_in_executor(pool, _run_with_deadline, fn, timeout, *args)
+    _pool_jobs.setdefault(pool, set()).add(future)
+    try:
+        return await asyncio.wait_for(future, timeout=timeout + JOB_TIMEOUT_GRACE_SECONDS if timeout else None)
+    except _DeadlineExceeded:
+        logger.warning("Pooled job %s timed out after %ss", getattr(fn, "__name__", fn), timeout)
+        raise JobTimeoutError(f"Job exceeded the {timeout}s time limit")
+    except asyncio.TimeoutError:
+        logger.warning(
+            "Pooled job %s did not stop %ss after its time limit; retiring its pool",
+            getattr(fn, "__name__", fn), JOB_TIMEOUT_GRACE_SECONDS
+        )
+        _retire_pool(pool)
+        raise JobTimeoutError(f"Job exceeded the {timeout}s time limit")
+    except BrokenProcessPool:
+        _retire_pool(pool)
+        raise WorkerCrashedError("Worker process terminated unexpectedly")
+    finally:
+        _pool_jobs.get(pool, set()).discard(future)
+        if job_id:
+            _progress_listeners.pop(job_id, None)
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+    for pool, reaper in list(_retired.items()):
+        reaper.cancel()
+        processes = _workers(pool)
+        pool.shutdown(wait=False, cancel_futures=True)
+        _terminate_workers(processes, join_timeout=1.0)
+    _retired.clear()
+    _pool_jobs.clear()
+    _close_progress_queue()
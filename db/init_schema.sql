@@ -56,6 +56,29 @@ CREATE TABLE IF NOT EXISTS media_files (
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
+-- Analysis results (CSV persona clustering)
+CREATE TABLE IF NOT EXISTS analysis_results (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    filename TEXT,
+    filelink TEXT,
+    result JSONB,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Files waiting to be removed from storage (processed in batches by a background worker)
+CREATE TABLE IF NOT EXISTS storage_deletion_queue (
+    id BIGSERIAL PRIMARY KEY,
+    file_url TEXT NOT NULL,
+    reason VARCHAR(50),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    enqueued_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_storage_deletion_queue_next_attempt ON storage_deletion_queue(next_attempt_at);
+
 CREATE INDEX IF NOT EXISTS idx_media_files_user_id ON media_files(user_id);
 CREATE INDEX IF NOT EXISTS idx_media_files_created_at ON media_files(created_at DESC);
 
@@ -66,5 +89,87 @@ CREATE INDEX IF NOT EXISTS idx_creations_likes_count ON creations(likes_count DE
 CREATE INDEX IF NOT EXISTS idx_likes_user_id ON likes(user_id);
 CREATE INDEX IF NOT EXISTS idx_likes_creation_id ON likes(creation_id);
 
+-- Perceptual (dHash) image hashes for near-duplicate detection
+ALTER TABLE creations ADD COLUMN IF NOT EXISTS phash BIGINT;
+ALTER TABLE media_files ADD COLUMN IF NOT EXISTS phash BIGINT;
+CREATE INDEX IF NOT EXISTS idx_creations_phash_not_null ON creations(id) WHERE phash IS NOT NULL;
+
+-- Analysis result cache: content hash of the uploaded CSV and the key (content + parameters + versions)
+ALTER TABLE analysis_results ADD COLUMN IF NOT EXISTS content_hash CHAR(64);
+ALTER TABLE analysis_results ADD COLUMN IF NOT EXISTS cache_key CHAR(64);
+CREATE INDEX IF NOT EXISTS idx_analysis_results_cache_key ON analysis_results(cache_key, created_at DESC) WHERE cache_key IS NOT NULL;
+
+-- Creation embeddings (app/services/creation_embedding.py, EMBEDDING_DIM) for "more like this"
+CREATE EXTENSION IF NOT EXISTS vector;
+ALTER TABLE creations ADD COLUMN IF NOT EXISTS embedding vector(256);
+CREATE INDEX IF NOT EXISTS idx_creations_embedding_hnsw ON creations USING hnsw (embedding vector_cosine_ops);
+CREATE INDEX IF NOT EXISTS idx_creations_embedding_missing ON creations(id) WHERE embedding IS NULL;
+
+-- Item-to-item neighbours from like co-occurrence (rebuilt by app/services/recommendations.py)
+CREATE TABLE IF NOT EXISTS creation_neighbors (
+    creation_id INTEGER NOT NULL REFERENCES creations(id) ON DELETE CASCADE,
+    neighbor_id INTEGER NOT NULL REFERENCES creations(id) ON DELETE CASCADE,
+    score REAL NOT NULL,
+    PRIMARY KEY (creation_id, neighbor_id)
+);
+CREATE INDEX IF NOT EXISTS idx_likes_user_created ON likes(user_id, created_at DESC);
+
+-- 'hot' feed ordering (score maintained by the app on like/unlike and by a periodic refresh)
+ALTER TABLE creations ADD COLUMN IF NOT EXISTS hot_score DOUBLE PRECISION;
+CREATE INDEX IF NOT EXISTS idx_creations_hot ON creations(hot_score DESC, id DESC) WHERE is_public = TRUE;
+
+-- Feed explorer facet counts over public creations; tag '' counts all of them
+CREATE TABLE IF NOT EXISTS creation_facet_counts (
+    tag TEXT NOT NULL DEFAULT '',
+    facet TEXT NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (tag, facet, value)
+);
+
+-- Analysis history: JSONB result documents, summary columns for listings, keyset index
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'analysis_results' AND column_name = 'result') = 'json' THEN
+        ALTER TABLE analysis_results ALTER COLUMN result TYPE JSONB USING result::jsonb;
+    END IF;
+END $$;
+ALTER TABLE analysis_results ADD COLUMN IF NOT EXISTS cluster_count INTEGER;
+ALTER TABLE analysis_results ADD COLUMN IF NOT EXISTS total_users INTEGER;
+UPDATE analysis_results
+SET cluster_count = (result->>'clusters')::int,
+    total_users = (result->>'total_users')::int
+WHERE cluster_count IS NULL AND result ? 'clusters';
+CREATE INDEX IF NOT EXISTS idx_analysis_results_user_created ON analysis_results(user_id, created_at DESC, id DESC);
+
+-- Columnar (Feather) copies of analysed uploads, re-runnable without re-uploading
+CREATE TABLE IF NOT EXISTS analysis_datasets (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    content_hash CHAR(64) NOT NULL,
+    filename TEXT,
+    filelink TEXT,
+    path TEXT NOT NULL,
+    columns JSONB NOT NULL,
+    total_rows INTEGER NOT NULL,
+    analysed_rows INTEGER NOT NULL,
+    sampled BOOLEAN NOT NULL DEFAULT FALSE,
+    size_bytes BIGINT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    UNIQUE (user_id, content_hash)
+);
+CREATE INDEX IF NOT EXISTS idx_analysis_datasets_content_hash ON analysis_datasets(content_hash);
+
+-- Token revocation (app/auth/jwt_handler.py): tokens carry their user's token_version, which
+-- is bumped to revoke all of them; single tokens (logout) are listed until they expire
+ALTER TABLE users ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0;
+CREATE INDEX IF NOT EXISTS idx_users_token_version ON users(id) WHERE token_version > 0;
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    digest BYTEA PRIMARY KEY,
+    expires_at TIMESTAMPTZ NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires_at ON revoked_tokens(expires_at);
+
 -- Optional: sample admin user insert (commented out)
 -- INSERT INTO users (email, name, role, hashed_password) VALUES ('admin@example.com', 'Admin', 'ADMIN', '<hashed_password>');
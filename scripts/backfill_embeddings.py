@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""Compute metadata embeddings for creations saved before the embedding column existed.
+
+The app also runs this periodically (EMBEDDING_BACKFILL_INTERVAL_SECONDS); the script
+is for covering a large existing table in one go.
+
+Usage (from repo root): python scripts/backfill_embeddings.py [--batch-size 500]
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import asyncpg  # noqa: E402
+
+from app.config.settings import settings  # noqa: E402
+from app.services.creation_embedding import backfill_embeddings  # noqa: E402
+
+
+async def main(batch_size: int) -> int:
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        count = await backfill_embeddings(conn, batch_size)
+        print(f"creations: embedded {count} rows")
+    finally:
+        await conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.batch_size)))
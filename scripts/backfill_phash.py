@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Compute perceptual hashes for creations and media files saved before phash existed.
+
+Usage (from repo root): python scripts/backfill_phash.py [--batch-size 200]
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import asyncpg  # noqa: E402
+
+from app.config.settings import settings  # noqa: E402
+from app.services.image_hash import dhash  # noqa: E402
+from app.services.storage_service import url_to_path  # noqa: E402
+
+TABLES = {"creations": "media_url", "media_files": "file_url"}
+
+
+def _hash_file(file_url: str) -> int | None:
+    path = url_to_path(file_url)
+    if not path or not Path(path).is_file():
+        return None
+    return dhash(Path(path).read_bytes())
+
+
+async def backfill(conn: asyncpg.Connection, table: str, url_column: str, batch_size: int) -> int:
+    updated = 0
+    last_id = 0
+    while True:
+        rows = await conn.fetch(
+            f"SELECT id, {url_column} AS url FROM {table} WHERE phash IS NULL AND id > $1 ORDER BY id LIMIT $2",
+            last_id, batch_size
+        )
+        if not rows:
+            return updated
+        last_id = rows[-1]["id"]
+        hashes = await asyncio.gather(*(asyncio.to_thread(_hash_file, r["url"]) for r in rows))
+        pairs = [(r["id"], h) for r, h in zip(rows, hashes) if h is not None]
+        if pairs:
+            await conn.executemany(f"UPDATE {table} SET phash = $2 WHERE id = $1", pairs)
+            updated += len(pairs)
+
+
+async def main(batch_size: int) -> int:
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        for table, url_column in TABLES.items():
+            count = await backfill(conn, table, url_column, batch_size)
+            print(f"{table}: hashed {count} rows")
+    finally:
+        await conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.batch_size)))
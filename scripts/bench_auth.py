@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Benchmark the per-request cost of the auth dependency chain.
+
+Runs get_token -> get_optional_user -> get_current_user the way FastAPI does for
+one request, for a valid token with the verified-token cache cold (full HMAC
+verification on every call) and warm (repeat token), and for an invalid token.
+
+Usage (from repo root):
+    python scripts/bench_auth.py [--iterations 20000]
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+from starlette.requests import Request  # noqa: E402
+
+from app.auth import jwt_handler  # noqa: E402
+from app.dependencies.auth import get_current_user, get_optional_user, get_token  # noqa: E402
+
+
+def _request(token: str) -> Request:
+    return Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())]})
+
+
+async def _resolve(request: Request, token: str):
+    raw = await get_token(request, token)
+    user = await get_optional_user(raw)
+    if user is not None:
+        await get_current_user(user)
+    return user
+
+
+async def bench(token: str, iterations: int, clear_cache: bool) -> float:
+    request = _request(token)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        if clear_cache:
+            jwt_handler.token_cache.clear()
+        await _resolve(request, token)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def main(iterations: int) -> int:
+    token = jwt_handler.create_access_token({"sub": "1", "email": "bench@example.com", "role": "USER", "name": "Bench"})
+    cases = [
+        ("valid token, cache cold", token, True),
+        ("valid token, cache warm", token, False),
+        ("invalid signature", token[:-2] + ("AA" if not token.endswith("AA") else "BB"), False),
+    ]
+    print(f"{'case':<28} {'us/request':>12}")
+    for name, case_token, clear_cache in cases:
+        await bench(case_token, min(iterations, 1000), clear_cache)  # warm-up
+        print(f"{name:<28} {await bench(case_token, iterations, clear_cache):>12.1f}")
+    print(f"cache stats: {jwt_handler.token_cache_stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.iterations)))
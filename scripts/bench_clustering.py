@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Benchmark the analysis clustering engine on synthetic survey data.
+
+Compares the engine in app/services/clustering.py (MiniBatchKMeans above
+FULL_KMEANS_MAX_ROWS, sampled silhouette or Calinski-Harabasz, groupby profiles)
+with the previous approach (full KMeans + full silhouette per K, one filter per cluster).
+The legacy path is O(n^2) and is only run up to --legacy-max-rows.
+
+Usage (from repo root):
+    python scripts/bench_clustering.py                    # 10k, 100k, 1M rows
+    python scripts/bench_clustering.py --rows 10000 50000 --criterion calinski_harabasz
+"""
+from __future__ import annotations
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from sklearn.cluster import KMeans  # noqa: E402
+from sklearn.datasets import make_blobs  # noqa: E402
+from sklearn.metrics import silhouette_score  # noqa: E402
+from sklearn.preprocessing import StandardScaler  # noqa: E402
+
+from app.services import clustering  # noqa: E402
+
+
+def make_dataset(n_rows: int, n_features: int, seed: int = 0) -> pd.DataFrame:
+    X, _ = make_blobs(n_samples=n_rows, n_features=n_features, centers=5, cluster_std=2.5, random_state=seed)
+    df = pd.DataFrame(X, columns=[f"q{i}" for i in range(n_features)])
+    df.insert(0, "user_id", np.arange(n_rows))
+    return df
+
+
+def run_engine(df: pd.DataFrame, criterion: str) -> tuple[int, float]:
+    start = time.perf_counter()
+    X = StandardScaler().fit_transform(df.drop(columns=["user_id"]))
+    search = clustering.search_k(X, clustering.K_CANDIDATES, criterion=criterion)
+    clustering.cluster_profiles(df, search["labels"], search["k"])
+    return search["k"], time.perf_counter() - start
+
+
+def run_legacy(df: pd.DataFrame) -> tuple[int, float]:
+    start = time.perf_counter()
+    X = StandardScaler().fit_transform(df.drop(columns=["user_id"]))
+    best_k, best_score = 3, -1
+    for k in clustering.K_CANDIDATES:
+        labels = KMeans(n_clusters=k, random_state=42).fit_predict(X)
+        score = silhouette_score(X, labels)
+        if score > best_score:
+            best_k, best_score = k, score
+    labels = KMeans(n_clusters=best_k, random_state=42).fit_predict(X)
+    frame = df.assign(cluster=labels)
+    for i in range(best_k):
+        frame[frame["cluster"] == i].mean(numeric_only=True)
+    return best_k, time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--features", type=int, default=12)
+    parser.add_argument("--criterion", choices=clustering.CRITERIA, default="silhouette")
+    parser.add_argument("--legacy-max-rows", type=int, default=10_000)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'engine k':>9} {'engine s':>10} {'legacy k':>9} {'legacy s':>10}")
+    for n_rows in args.rows:
+        df = make_dataset(n_rows, args.features)
+        k, seconds = run_engine(df, args.criterion)
+        legacy = run_legacy(df) if n_rows <= args.legacy_max_rows else None
+        legacy_cols = f"{legacy[0]:>9} {legacy[1]:>10.2f}" if legacy else f"{'-':>9} {'skipped':>10}"
+        print(f"{n_rows:>10} {k:>9} {seconds:>10.2f} {legacy_cols}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
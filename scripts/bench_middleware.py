@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Benchmark request throughput through the access-log middleware.
+
+Serves a small FastAPI app in-process (httpx ASGITransport, no network) with:
+  none    - no middleware
+  before  - the previous BaseHTTPMiddleware implementation (f-string log line on the
+            event loop, X-Server-Version header)
+  after   - app.middlewares.logging_middleware.LoggingMiddleware (pure ASGI, queued JSON)
+and reports requests/second for a small JSON endpoint and a streaming endpoint.
+Log output goes to /dev/null through each variant's own logging path.
+
+Usage (from repo root):
+    python scripts/bench_middleware.py [--requests 5000] [--concurrency 50] [--sample-rate 1.0]
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import httpx  # noqa: E402
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.responses import StreamingResponse  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+
+from app.config import logging_setup  # noqa: E402
+from app.config.settings import settings  # noqa: E402
+from app.middlewares.logging_middleware import LoggingMiddleware  # noqa: E402
+
+before_logger = logging.getLogger("bench.before")
+
+
+class BeforeLoggingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        response = await call_next(request)
+        process_time = time.time() - start_time
+        response.headers["X-Server-Version"] = str(datetime.now(timezone.utc).timestamp())
+        before_logger.info(f"{request.method} {request.url.path} - {response.status_code} - {process_time:.4f}s")
+        return response
+
+
+def build_app(variant: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id, "name": f"item {item_id}", "tags": ["a", "b", "c"]}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(20):
+                yield b"x" * 512
+        return StreamingResponse(chunks(), media_type="application/octet-stream")
+
+    if variant == "before":
+        app.add_middleware(BeforeLoggingMiddleware)
+    elif variant == "after":
+        app.add_middleware(LoggingMiddleware)
+    return app
+
+
+async def run(app: FastAPI, path_for, requests: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        counter = iter(range(requests))
+
+        async def worker():
+            for i in counter:
+                response = await client.get(path_for(i))
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - start)
+
+
+async def main(requests: int, concurrency: int) -> int:
+    cases = [
+        ("json", lambda i: f"/items/{i}"),
+        ("stream", lambda i: "/stream"),
+    ]
+    print(f"{'variant':<8} {'endpoint':<8} {'req/s':>10}")
+    for variant in ("none", "before", "after"):
+        app = build_app(variant)
+        for endpoint, path_for in cases:
+            await run(app, path_for, min(requests, 500), concurrency)  # warm-up
+            rate = await run(app, path_for, requests, concurrency)
+            print(f"{variant:<8} {endpoint:<8} {rate:>10.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--sample-rate", type=float, default=1.0, help="ACCESS_LOG_SAMPLE_RATE for the 'after' variant")
+    args = parser.parse_args()
+
+    settings.ACCESS_LOG_SAMPLE_RATE = args.sample_rate
+    devnull = open(os.devnull, "w")
+    # 'after' logs through the queued JSON pipeline; 'before' the way the old middleware did,
+    # with a synchronous stream handler on the root logger (logging.basicConfig)
+    logging_setup.setup_logging(stream=devnull)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    before_logger.propagate = False
+    before_logger.addHandler(logging.StreamHandler(devnull))
+    try:
+        sys.exit(asyncio.run(main(args.requests, args.concurrency)))
+    finally:
+        logging_setup.shutdown_logging()
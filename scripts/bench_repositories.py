@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""Time the repository methods and check their query plans on a generated dataset.
+
+For each CreationsRepository / UserRepository / MediaRepository method (one case per
+interesting argument set, e.g. feed sorts and deep offsets):
+  - runs it once while recording the SQL statements it sends, then --repeat more times,
+    reporting min/p50/p95 latency
+  - runs EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) on every recorded statement and keeps a
+    summary of the plan: how each relation is scanned (Seq Scan, Index Scan using ...),
+    shared buffers hit/read, planning and execution time
+Everything runs inside one transaction that is rolled back, each call in its own
+savepoint, so writes (likes, inserts, deletes, the hot-score refresh) leave the data as
+it was. Arguments (a prolific user, a typical user, a liked pair...) are picked from the
+data itself, deterministically, so runs on the same dataset compare.
+
+--save-baseline stores the results. Later runs compare with it and flag:
+  - plan regressions: a relation now read by a Seq Scan that the baseline read through an
+    index (exit code 1)
+  - slowdowns: p50 above the baseline by more than --tolerance (exit 1 with --fail-on-slowdown)
+Sequential scans of large relations are listed in any case (--seq-scan-rows).
+
+Usage (from repo root; generate the data with scripts/datagen.py first):
+    python scripts/bench_repositories.py --database-url postgresql://postgres:pw@localhost:5432/bench --save-baseline
+    python scripts/bench_repositories.py --database-url ... --cases 'creations.get_feed*' --plans-dir /tmp/plans
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import fnmatch
+import json
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import asyncpg  # noqa: E402
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.repositories.creations_repository import ALL_TAGS, CreationsRepository  # noqa: E402
+from app.repositories.media_repository import MediaRepository  # noqa: E402
+from app.repositories.users_repository import UserRepository  # noqa: E402
+from app.services.query_tracing import normalize_sql  # noqa: E402
+
+DEFAULT_BASELINE = ROOT / "scripts" / "bench_repositories.baseline.json"
+EXPLAIN = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) "
+# p50 differences below this are noise, whatever the ratio
+MIN_SLOWDOWN_MS = 1.0
+
+
+class _Rollback(Exception):
+    """Raised inside a savepoint to roll it back."""
+
+
+async def in_savepoint(conn: asyncpg.Connection, fn: Callable[[], Awaitable[Any]]) -> Any:
+    """Runs `fn` in a savepoint that is always rolled back; returns its result."""
+    try:
+        async with conn.transaction():
+            result = await fn()
+            raise _Rollback(result)
+    except _Rollback as rollback:
+        return rollback.args[0]
+
+
+class RecordingConnection:
+    """An asyncpg connection that keeps the statements (and arguments) sent through it."""
+
+    def __init__(self, conn: asyncpg.Connection):
+        self._conn = conn
+        self.statements: List[Tuple[str, tuple]] = []
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    async def fetch(self, query, *args, **kwargs):
+        self.statements.append((query, args))
+        return await self._conn.fetch(query, *args, **kwargs)
+
+    async def fetchrow(self, query, *args, **kwargs):
+        self.statements.append((query, args))
+        return await self._conn.fetchrow(query, *args, **kwargs)
+
+    async def fetchval(self, query, *args, **kwargs):
+        self.statements.append((query, args))
+        return await self._conn.fetchval(query, *args, **kwargs)
+
+    async def execute(self, query, *args, **kwargs):
+        self.statements.append((query, args))
+        return await self._conn.execute(query, *args, **kwargs)
+
+
+class MediaSession:
+    """
+    A SQLAlchemy session for MediaRepository inside an outer transaction that is rolled
+    back at the end; the repository's commits only release savepoints.
+    """
+
+    def __init__(self, dsn: str):
+        self.engine = create_engine(dsn)
+        self.connection = self.engine.connect()
+        self.outer = self.connection.begin()
+        self.session = Session(bind=self.connection, join_transaction_mode="create_savepoint")
+        self.recording = False
+        self.statements: List[Tuple[str, Any]] = []
+        event.listen(self.connection, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if self.recording:
+            self.statements.append((statement, parameters))
+
+    def call(self, fn: Callable[[Session], Any]) -> Any:
+        nested = self.connection.begin_nested()
+        try:
+            return fn(self.session)
+        finally:
+            self.session.rollback()
+            nested.rollback()
+
+    def explain(self, statement: str, parameters: Any) -> list:
+        nested = self.connection.begin_nested()
+        try:
+            plan = self.connection.exec_driver_sql(EXPLAIN + statement, parameters).scalar()
+        finally:
+            nested.rollback()
+        return json.loads(plan) if isinstance(plan, str) else plan
+
+    def close(self) -> None:
+        self.session.close()
+        self.outer.rollback()
+        self.connection.close()
+        self.engine.dispose()
+
+
+@dataclass
+class Params:
+    heavy_user: int
+    user: int
+    email: str
+    creation: int
+    liked: Tuple[int, int]
+    unliked: Tuple[int, int]
+    page_ids: List[int]
+    tag: str
+    hot_after: Tuple[float, int]
+    media_user: int
+    media_id: int
+
+
+async def pick_params(conn: asyncpg.Connection) -> Params:
+    """Deterministic arguments taken from the data: the same dataset gives the same cases."""
+    heavy_user = await conn.fetchval("SELECT user_id FROM creations GROUP BY user_id ORDER BY COUNT(*) DESC, user_id LIMIT 1")
+    user = await conn.fetchrow("SELECT id, email FROM users ORDER BY id OFFSET (SELECT COUNT(*) FROM users) / 2 LIMIT 1")
+    liked = await conn.fetchrow("SELECT user_id, creation_id FROM likes WHERE user_id >= $1 ORDER BY user_id, creation_id LIMIT 1", user["id"])
+    page_ids = [r["id"] for r in await conn.fetch("SELECT id FROM creations WHERE is_public = TRUE ORDER BY created_at DESC LIMIT 20")]
+    unliked = await conn.fetchval(
+        """
+        SELECT c.id FROM creations c
+        WHERE c.is_public = TRUE AND NOT EXISTS (SELECT 1 FROM likes l WHERE l.user_id = $1 AND l.creation_id = c.id)
+        ORDER BY c.id DESC LIMIT 1
+        """,
+        user["id"],
+    )
+    tag = await conn.fetchval(
+        "SELECT tag FROM creation_facet_counts WHERE tag <> $1 GROUP BY tag ORDER BY SUM(count) DESC, tag LIMIT 1", ALL_TAGS
+    )
+    hot_after = await conn.fetchrow(
+        """
+        SELECT hot_score, id FROM creations WHERE is_public = TRUE AND hot_score IS NOT NULL
+        ORDER BY hot_score DESC, id DESC OFFSET 100 LIMIT 1
+        """
+    )
+    media = await conn.fetchrow(
+        """
+        SELECT user_id, MAX(id) AS id FROM media_files
+        GROUP BY user_id ORDER BY COUNT(*) DESC, user_id LIMIT 1
+        """
+    )
+    if heavy_user is None or liked is None or not page_ids:
+        raise SystemExit("the database has no creations or likes; generate data with scripts/datagen.py first")
+    return Params(
+        heavy_user=heavy_user,
+        user=user["id"],
+        email=user["email"],
+        creation=page_ids[len(page_ids) // 2],
+        liked=(liked["user_id"], liked["creation_id"]),
+        unliked=(user["id"], unliked or page_ids[0]),
+        page_ids=page_ids,
+        tag=tag or "ootd",
+        hot_after=(hot_after["hot_score"], hot_after["id"]) if hot_after else (0.0, 0),
+        media_user=media["user_id"] if media else heavy_user,
+        media_id=media["id"] if media else 0,
+    )
+
+
+@dataclass
+class Case:
+    name: str
+    call: Callable[[Any], Any]
+    # MediaRepository is synchronous (SQLAlchemy session); the others take an asyncpg connection
+    sync: bool = False
+    # Full-table maintenance statements: timed once, whatever --repeat says
+    maintenance: bool = False
+
+
+def build_cases(p: Params) -> List[Case]:
+    creations, users, media = CreationsRepository(), UserRepository(db_pool=None), MediaRepository()
+    return [
+        Case("creations.get_creation_by_id", lambda c: creations.get_creation_by_id(c, p.creation)),
+        Case("creations.get_public_creations_by_ids", lambda c: creations.get_public_creations_by_ids(c, p.page_ids)),
+        Case("creations.get_similar_creations", lambda c: creations.get_similar_creations(c, p.creation)),
+        Case("creations.get_user_creations", lambda c: creations.get_user_creations(c, p.heavy_user)),
+        Case("creations.get_user_creations[offset=1000]", lambda c: creations.get_user_creations(c, p.heavy_user, 10, 1000)),
+        Case("creations.get_liked_creations_by_user", lambda c: creations.get_liked_creations_by_user(c, p.liked[0])),
+        Case("creations.get_feed_creations[latest]", lambda c: creations.get_feed_creations(c, "latest")),
+        Case("creations.get_feed_creations[latest,offset=10000]", lambda c: creations.get_feed_creations(c, "latest", 10, 10000)),
+        Case("creations.get_feed_creations[popular]", lambda c: creations.get_feed_creations(c, "popular")),
+        Case("creations.get_feed_creations[popular,offset=10000]", lambda c: creations.get_feed_creations(c, "popular", 10, 10000)),
+        Case("creations.get_hot_creations", lambda c: creations.get_hot_creations(c)),
+        Case("creations.get_hot_creations[keyset]", lambda c: creations.get_hot_creations(c, 10, *p.hot_after)),
+        Case("creations.get_picked_creations", lambda c: creations.get_picked_creations(c)),
+        Case("creations.get_facet_counts", lambda c: creations.get_facet_counts(c)),
+        Case("creations.get_facet_counts[tag]", lambda c: creations.get_facet_counts(c, p.tag)),
+        Case("creations.get_recent_tags", lambda c: creations.get_recent_tags(c)),
+        Case("creations.check_if_liked", lambda c: creations.check_if_liked(c, *p.liked)),
+        Case("creations.get_liked_ids", lambda c: creations.get_liked_ids(c, p.user, p.page_ids)),
+        Case("creations.add_like", lambda c: creations.add_like(c, *p.unliked)),
+        Case("creations.remove_like", lambda c: creations.remove_like(c, *p.liked)),
+        Case("creations.increment_likes_count", lambda c: creations.increment_likes_count(c, p.creation)),
+        Case("creations.decrement_likes_count", lambda c: creations.decrement_likes_count(c, p.creation)),
+        Case("creations.toggle_admin_pick", lambda c: creations.toggle_admin_pick(c, p.creation, True)),
+        Case("creations.create_creation", lambda c: creations.create_creation(
+            c, p.user, "/static/uploads/bench.png", "image", "bench prompt", gender="female", age_group="20s",
+            tags_array=["ootd", "minimal"], height=170, body_type="average", style="Casual", colors="Black, White",
+        )),
+        Case("creations.delete_creation_by_id", lambda c: creations.delete_creation_by_id(c, p.creation)),
+        Case("creations.refresh_hot_scores", lambda c: creations.refresh_hot_scores(c), maintenance=True),
+        Case("creations.rebuild_facet_counts", lambda c: creations.rebuild_facet_counts(c), maintenance=True),
+        Case("users.get_user_by_email", lambda c: users.get_user_by_email(c, p.email)),
+        Case("users.get_user_by_id", lambda c: users.get_user_by_id(c, p.user)),
+        Case("users.get_all_users", lambda c: users.get_all_users(c), maintenance=True),
+        Case("users.create_user", lambda c: users.create_user(c, "bench-new@datagen.local", "Bench")),
+        Case("users.upsert_oauth_user", lambda c: users.upsert_oauth_user(c, p.email, "Bench", "https://example.com/a.png")),
+        Case("users.update_password_hash", lambda c: users.update_password_hash(c, p.user, "x" * 60)),
+        Case("users.get_creations_by_user_id", lambda c: users.get_creations_by_user_id(c, p.heavy_user)),
+        Case("users.count_creations_today", lambda c: users.count_creations_today(c, p.heavy_user)),
+        Case("media.get_media_by_id", lambda s: media.get_media_by_id(s, p.media_id), sync=True),
+        Case("media.list_user_media", lambda s: media.list_user_media(s, p.media_user), sync=True),
+        Case("media.get_media_stats_by_user", lambda s: media.get_media_stats_by_user(s, p.media_user), sync=True),
+        Case("media.create_media", lambda s: media.create_media(
+            s, p.user, "/static/uploads/bench.png", "image/png", "bench.png", 1024, tags_array=["ootd"],
+        ), sync=True),
+        Case("media.delete_media", lambda s: media.delete_media(s, p.media_id, p.media_user), sync=True),
+    ]
+
+
+def summarize_plan(plan: list) -> Dict[str, Any]:
+    root = plan[0]
+    scans: List[str] = []
+    seq_scans = set()
+
+    def walk(node: dict) -> None:
+        relation = node.get("Relation Name")
+        if relation:
+            label = f"{node['Node Type']} on {relation}"
+            if node.get("Index Name"):
+                label += f" using {node['Index Name']}"
+            scans.append(label)
+            if node["Node Type"] == "Seq Scan":
+                seq_scans.add(relation)
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(root["Plan"])
+    return {
+        "execution_ms": round(root.get("Execution Time", 0.0), 3),
+        "planning_ms": round(root.get("Planning Time", 0.0), 3),
+        "shared_hit": root["Plan"].get("Shared Hit Blocks", 0),
+        "shared_read": root["Plan"].get("Shared Read Blocks", 0),
+        "scans": scans,
+        "seq_scans": sorted(seq_scans),
+    }
+
+
+async def run_case(case: Case, conn: asyncpg.Connection, media: MediaSession, repeat: int) -> Tuple[dict, List[list]]:
+    """Times the case and explains its statements; returns (result, raw plans)."""
+    timings = []
+    if case.sync:
+        media.statements.clear()
+        media.recording = True
+        try:
+            media.call(case.call)
+        finally:
+            media.recording = False
+        statements = [(normalize_sql(sql), media.explain(sql, params)) for sql, params in media.statements]
+        for _ in range(1 if case.maintenance else repeat):
+            started = time.perf_counter()
+            media.call(case.call)
+            timings.append(time.perf_counter() - started)
+    else:
+        recorder = RecordingConnection(conn)
+        await in_savepoint(conn, lambda: case.call(recorder))
+        statements = []
+        for sql, args in recorder.statements:
+            plan = await in_savepoint(conn, lambda: conn.fetchval(EXPLAIN + sql, *args))
+            statements.append((normalize_sql(sql), json.loads(plan)))
+        for _ in range(1 if case.maintenance else repeat):
+            async def timed():
+                started = time.perf_counter()
+                await case.call(conn)
+                return time.perf_counter() - started
+            timings.append(await in_savepoint(conn, timed))
+
+    timings.sort()
+    result = {
+        "runs": len(timings),
+        "min_ms": round(timings[0] * 1000, 3),
+        "p50_ms": round(statistics.median(timings) * 1000, 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(0.95 * len(timings)))] * 1000, 3),
+        "statements": [dict(sql=sql[:300], **summarize_plan(plan)) for sql, plan in statements],
+    }
+    return result, [plan for _, plan in statements]
+
+
+def format_table(cases: Dict[str, dict]) -> str:
+    lines = [f"{'case':<52} {'p50 ms':>9} {'p95 ms':>9} {'stmts':>5}  scans"]
+    for name, result in cases.items():
+        scans = sorted({scan for statement in result["statements"] for scan in statement["scans"]})
+        lines.append(
+            f"{name:<52} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {len(result['statements']):>5}  {'; '.join(scans)}"
+        )
+    return "\n".join(lines)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> Tuple[List[str], List[str]]:
+    """(plan regressions, slowdowns) of `results` against `baseline`; cases missing from either are skipped."""
+    regressions, slowdowns = [], []
+    for name, base in baseline.get("cases", {}).items():
+        current = results["cases"].get(name)
+        if current is None:
+            continue
+        for index, (base_stmt, stmt) in enumerate(zip(base["statements"], current["statements"]), start=1):
+            if base_stmt["sql"] != stmt["sql"]:
+                # The method now sends a different statement; its plan is not comparable
+                continue
+            for relation in sorted(set(stmt["seq_scans"]) - set(base_stmt["seq_scans"])):
+                before = [scan for scan in base_stmt["scans"] if scan.endswith(f" on {relation}") or f" on {relation} " in scan]
+                regressions.append(
+                    f"{name} statement {index}: Seq Scan on {relation} (baseline: {', '.join(before) or 'not read'})"
+                )
+        if current["p50_ms"] > base["p50_ms"] * (1 + tolerance) and current["p50_ms"] - base["p50_ms"] > MIN_SLOWDOWN_MS:
+            slowdowns.append(f"{name}: p50 {current['p50_ms']:.2f}ms vs baseline {base['p50_ms']:.2f}ms")
+    return regressions, slowdowns
+
+
+async def table_sizes(conn: asyncpg.Connection) -> Dict[str, int]:
+    rows = await conn.fetch(
+        "SELECT relname, reltuples::bigint AS rows FROM pg_class WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace"
+    )
+    return {row["relname"]: row["rows"] for row in rows}
+
+
+async def main(args: argparse.Namespace) -> int:
+    conn = await asyncpg.connect(args.database_url)
+    media = MediaSession(args.database_url)
+    try:
+        await conn.execute(f"SET statement_timeout = {int(args.statement_timeout * 1000)}")
+        sizes = await table_sizes(conn)
+        params = await pick_params(conn)
+        cases = [c for c in build_cases(params) if not args.cases or any(fnmatch.fnmatch(c.name, p) for p in args.cases)]
+        if args.skip_maintenance:
+            cases = [c for c in cases if not c.maintenance]
+
+        results: Dict[str, dict] = {}
+        transaction = conn.transaction()
+        await transaction.start()
+        try:
+            for case in cases:
+                print(f"  {case.name}", file=sys.stderr, flush=True)
+                results[case.name], plans = await run_case(case, conn, media, args.repeat)
+                if args.plans_dir:
+                    plans_dir = Path(args.plans_dir)
+                    plans_dir.mkdir(parents=True, exist_ok=True)
+                    (plans_dir / f"{case.name}.json").write_text(json.dumps(plans, indent=2))
+        finally:
+            await transaction.rollback()
+        server_version = await conn.fetchval("SHOW server_version")
+    finally:
+        media.close()
+        await conn.close()
+
+    revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    output = {
+        "meta": {
+            "revision": revision,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "server_version": server_version,
+            "rows": {table: sizes.get(table, 0) for table in ("users", "creations", "likes", "media_files")},
+            "repeat": args.repeat,
+        },
+        "cases": results,
+    }
+    print(format_table(results))
+
+    large_seq_scans = sorted({
+        (name, relation)
+        for name, result in results.items()
+        for statement in result["statements"]
+        for relation in statement["seq_scans"]
+        if sizes.get(relation, 0) >= args.seq_scan_rows
+    })
+    if large_seq_scans:
+        print(f"\nsequential scans of relations with {args.seq_scan_rows:,}+ rows:")
+        for name, relation in large_seq_scans:
+            print(f"  {name}: {relation} (~{sizes[relation]:,} rows)")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(output, indent=2, sort_keys=True) + "\n")
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(output, indent=2, sort_keys=True) + "\n")
+        print(f"\nsaved baseline to {baseline_path}")
+        return 0
+    if not baseline_path.exists():
+        print(f"\nno baseline at {baseline_path}; record one with --save-baseline")
+        return 0
+
+    baseline = json.loads(baseline_path.read_text())
+    print(f"\ncompared with baseline {baseline['meta'].get('revision')} ({baseline['meta'].get('timestamp')}), rows {baseline['meta'].get('rows')}")
+    if baseline["meta"].get("rows") != output["meta"]["rows"]:
+        print("  warning: the dataset size differs from the baseline's; plans may change legitimately")
+    regressions, slowdowns = compare(output, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"  PLAN REGRESSION {regression}")
+    for slowdown in slowdowns:
+        print(f"  SLOWER {slowdown}")
+    if not regressions and not slowdowns:
+        print("  no regressions")
+    return 1 if regressions or (slowdowns and args.fail_on_slowdown) else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--cases", nargs="+", metavar="PATTERN", help="only cases matching these glob patterns")
+    parser.add_argument("--skip-maintenance", action="store_true", help="skip the full-table maintenance methods")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per case")
+    parser.add_argument("--statement-timeout", type=float, default=120.0, help="seconds")
+    parser.add_argument("--seq-scan-rows", type=int, default=10_000, help="list seq scans of relations at least this big")
+    parser.add_argument("--plans-dir", help="write each case's raw EXPLAIN JSON here")
+    parser.add_argument("--output", help="also write the results as JSON here")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative p50 slowdown")
+    parser.add_argument("--fail-on-slowdown", action="store_true", help="exit 1 on slowdowns too, not only plan regressions")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""Bulk-generate a realistic dataset (users, creations, likes, media) into Postgres with COPY.
+
+The data follows the shape of production rather than being uniform:
+  - creation ids grow with created_at (as SERIAL ids do), spread over --days up to now
+  - a few prolific users make most creations and uploads (power-law user choice)
+  - a few creations get most likes; popularity is scattered over the id range instead of
+    following it, so "popular" and "latest" pick different rows
+  - tags, styles, colors, body types... use the React generator's vocabularies
+Rows are streamed in --batch-size batches (asyncpg copy_records_to_table), so 10M-row
+runs do not hold the dataset in memory. likes_count is then set from the likes, and the
+state the app maintains (hot scores, facet counts and, with --embeddings, embeddings)
+is built with the app's own repository code.
+
+The target database needs the schema (db/init_schema.sql, pgvector included); pass
+--apply-schema to apply it, and --truncate to empty the tables first.
+
+Usage (from repo root):
+    python scripts/datagen.py --database-url postgresql://postgres:pw@localhost:5432/bench --apply-schema --scale 1000000
+    python scripts/datagen.py --database-url ... --truncate --users 50000 --creations 10000000 --likes 50000000
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import itertools
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import asyncpg  # noqa: E402
+
+from app.repositories.creations_repository import CreationsRepository  # noqa: E402
+from app.services.creation_embedding import backfill_embeddings  # noqa: E402
+
+SCHEMA_FILE = Path(__file__).resolve().parents[1] / "db" / "init_schema.sql"
+
+GENDERS = ("female", "male")
+AGE_GROUPS = ("10s", "20s", "30s", "40s", "50s")
+BODY_TYPES = ("slim", "average", "chubby")
+STYLES = ("Vintage", "Classic", "Casual", "Street", "Minimal", "Sporty")
+COLORS = ("Red", "Blue", "Pink", "Purple", "Brown", "White", "Grey", "Black")
+TAGS = (
+    "ootd", "streetwear", "minimal", "vintage", "y2k", "denim", "oversized", "layering",
+    "monochrome", "pastel", "workwear", "athleisure", "trench", "knit", "leather", "linen",
+    "summer", "winter", "fall", "spring", "office", "date", "weekend", "travel",
+    "preppy", "gorpcore", "cityboy", "classic", "boho", "techwear",
+)
+PROMPT_WORDS = (
+    "relaxed", "tailored", "cropped", "wide", "pleated", "checked", "striped", "soft",
+    "jacket", "coat", "shirt", "skirt", "trousers", "sneakers", "boots", "cardigan",
+    "for", "a", "rainy", "day", "night", "out", "in", "the", "city", "office",
+)
+MEDIA_TYPES = (("image/png", ".png"), ("image/jpeg", ".jpg"), ("image/webp", ".webp"), ("video/mp4", ".mp4"))
+
+# Spreads popularity ranks over the id range: rank r -> (r * prime) % n is a bijection
+# for any n below the prime
+_SCATTER_PRIME = 2_147_483_647
+
+# Every table the generator writes, in an order TRUNCATE ... CASCADE accepts
+TABLES = ("likes", "media_files", "creation_neighbors", "creation_facet_counts", "creations", "users")
+
+
+def skewed(rng: random.Random, n: int, power: float) -> int:
+    """An index in [0, n) biased towards 0; higher powers concentrate more."""
+    return min(n - 1, int(n * rng.random() ** power))
+
+
+def popular_creation_id(rank: int, creations: int) -> int:
+    """The id of the creation with popularity `rank` (0 = most liked)."""
+    return (rank * _SCATTER_PRIME) % creations + 1
+
+
+def _random_phash(rng: random.Random) -> int:
+    return rng.getrandbits(64) - 2 ** 63
+
+
+class Timeline:
+    """Creation ids map linearly onto [start, now], like SERIAL ids assigned over time."""
+
+    def __init__(self, creations: int, days: float, now: datetime):
+        self.creations = creations
+        self.now = now
+        self.start = now - timedelta(days=days)
+        self.span = now - self.start
+
+    def created_at(self, creation_id: int) -> datetime:
+        return self.start + self.span * ((creation_id - 0.5) / self.creations)
+
+
+def user_rows(rng: random.Random, users: int, now: datetime) -> Iterator[tuple]:
+    for user_id in range(1, users + 1):
+        yield (
+            user_id,
+            f"user{user_id}@datagen.local",
+            f"Datagen User {user_id}",
+            None,
+            "ADMIN" if user_id == 1 else "MEMBER",
+            now - timedelta(days=rng.uniform(30, 730)),
+        )
+
+
+def creation_rows(rng: random.Random, users: int, timeline: Timeline) -> Iterator[tuple]:
+    for creation_id in range(1, timeline.creations + 1):
+        yield (
+            creation_id,
+            skewed(rng, users, 2.5) + 1,
+            f"/static/uploads/datagen-{creation_id}.png",
+            "image",
+            " ".join(rng.choices(PROMPT_WORDS, k=rng.randint(4, 12))),
+            rng.choice(GENDERS),
+            rng.choice(AGE_GROUPS),
+            rng.random() < 0.9,
+            rng.random() < 0.001,
+            timeline.created_at(creation_id),
+            rng.sample(TAGS, rng.randint(2, 5)),
+            rng.randint(150, 190),
+            rng.choice(BODY_TYPES),
+            rng.choice(STYLES),
+            ", ".join(rng.sample(COLORS, rng.randint(1, 3))),
+            _random_phash(rng),
+        )
+
+
+def like_rows(rng: random.Random, users: int, likes: int, timeline: Timeline) -> Iterator[tuple]:
+    """About `likes` likes; each user likes a distinct, popularity-skewed set of creations."""
+    creations = timeline.creations
+    mean = likes / users
+    for user_id in range(1, users + 1):
+        wanted = min(creations, int(mean * rng.expovariate(1.0)))
+        liked = set()
+        for _ in range(wanted * 3):
+            if len(liked) >= wanted:
+                break
+            liked.add(popular_creation_id(skewed(rng, creations, 3), creations))
+        for creation_id in liked:
+            created_at = timeline.created_at(creation_id)
+            yield (user_id, creation_id, created_at + (timeline.now - created_at) * rng.random())
+
+
+def media_rows(rng: random.Random, users: int, media: int, now: datetime, days: float) -> Iterator[tuple]:
+    for media_id in range(1, media + 1):
+        mime_type, extension = rng.choices(MEDIA_TYPES, weights=(50, 35, 10, 5))[0]
+        yield (
+            media_id,
+            skewed(rng, users, 2.0) + 1,
+            f"/static/uploads/datagen-media-{media_id}{extension}",
+            mime_type,
+            f"upload-{media_id}{extension}",
+            int(rng.lognormvariate(13, 1)),
+            "datagen upload" if rng.random() < 0.5 else None,
+            rng.sample(TAGS, rng.randint(0, 3)) or None,
+            now - timedelta(days=days * rng.random()),
+            None if mime_type.startswith("video/") else _random_phash(rng),
+        )
+
+
+async def copy_rows(
+    conn: asyncpg.Connection, table: str, columns: List[str], rows: Iterable[tuple], batch_size: int,
+    log: Callable[[str], None] = print,
+) -> int:
+    """COPYs `rows` into `table` in batches; returns the number of rows."""
+    started = time.perf_counter()
+    total = 0
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            break
+        await conn.copy_records_to_table(table, records=batch, columns=columns)
+        total += len(batch)
+    elapsed = time.perf_counter() - started
+    log(f"  {table:<12} {total:>11,} rows in {elapsed:6.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+    return total
+
+
+async def apply_schema(conn: asyncpg.Connection) -> None:
+    await conn.execute(SCHEMA_FILE.read_text())
+
+
+async def truncate(conn: asyncpg.Connection) -> None:
+    await conn.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+
+
+async def generate(
+    conn: asyncpg.Connection,
+    users: int,
+    creations: int,
+    likes: int,
+    media: int = 0,
+    rng_seed: int = 0,
+    days: float = 365.0,
+    batch_size: int = 50_000,
+    embeddings: bool = False,
+    log: Callable[[str], None] = print,
+) -> None:
+    """Loads the dataset into empty tables. User 1 is an ADMIN; passwords are left unset."""
+    rng = random.Random(rng_seed)
+    now = datetime.now(timezone.utc)
+    timeline = Timeline(creations, days, now)
+
+    await copy_rows(
+        conn, "users", ["id", "email", "name", "picture", "role", "created_at"],
+        user_rows(rng, users, now), batch_size, log,
+    )
+    await copy_rows(
+        conn, "creations",
+        [
+            "id", "user_id", "media_url", "media_type", "prompt", "gender", "age_group", "is_public",
+            "is_picked_by_admin", "created_at", "tags_array", "height", "body_type", "style", "colors", "phash",
+        ],
+        creation_rows(rng, users, timeline), batch_size, log,
+    )
+    if creations:
+        await copy_rows(conn, "likes", ["user_id", "creation_id", "created_at"], like_rows(rng, users, likes, timeline), batch_size, log)
+    await copy_rows(
+        conn, "media_files",
+        ["id", "user_id", "file_url", "mime_type", "original_name", "size_bytes", "description", "tags_array", "created_at", "phash"],
+        media_rows(rng, users, media, now, days), batch_size, log,
+    )
+    for table in ("users", "creations", "likes", "media_files"):
+        await conn.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 1))")
+
+    steps = [
+        ("likes_count", lambda: conn.execute(
+            """
+            UPDATE creations c SET likes_count = l.count
+            FROM (SELECT creation_id, COUNT(*) AS count FROM likes GROUP BY creation_id) l
+            WHERE c.id = l.creation_id
+            """
+        )),
+        ("hot scores", lambda: CreationsRepository().refresh_hot_scores(conn)),
+        ("facet counts", lambda: CreationsRepository().rebuild_facet_counts(conn)),
+    ]
+    if embeddings:
+        steps.append(("embeddings", lambda: backfill_embeddings(conn)))
+    steps.append(("analyze", lambda: conn.execute("ANALYZE")))
+    for name, step in steps:
+        started = time.perf_counter()
+        await step()
+        log(f"  {name:<12} {'':>11}      in {time.perf_counter() - started:6.1f}s")
+
+
+async def main(args: argparse.Namespace) -> int:
+    creations = args.creations if args.creations is not None else args.scale
+    users = args.users if args.users is not None else max(10, creations // 20)
+    likes = args.likes if args.likes is not None else creations * 5
+    media = args.media if args.media is not None else creations // 4
+
+    conn = await asyncpg.connect(args.database_url)
+    try:
+        if args.apply_schema:
+            await apply_schema(conn)
+        if args.truncate:
+            await truncate(conn)
+        elif await conn.fetchval("SELECT EXISTS (SELECT 1 FROM users)"):
+            print("the users table is not empty; pass --truncate to replace its data", file=sys.stderr)
+            return 1
+        print(f"generating {users:,} users, {creations:,} creations, ~{likes:,} likes, {media:,} media files")
+        started = time.perf_counter()
+        await generate(
+            conn, users, creations, likes, media,
+            rng_seed=args.seed, days=args.days, batch_size=args.batch_size, embeddings=args.embeddings,
+        )
+        print(f"done in {time.perf_counter() - started:.1f}s")
+    finally:
+        await conn.close()
+    return 0
+
+
+def _count(value: str) -> int:
+    return int(value.replace("_", "").replace(",", ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--apply-schema", action="store_true", help="apply db/init_schema.sql first")
+    parser.add_argument("--truncate", action="store_true", help="empty the generated tables first")
+    parser.add_argument("--scale", type=_count, default=100_000,
+                        help="number of creations; users, likes and media are derived from it unless given")
+    parser.add_argument("--users", type=_count)
+    parser.add_argument("--creations", type=_count)
+    parser.add_argument("--likes", type=_count, help="approximate; repeated random pairs are dropped")
+    parser.add_argument("--media", type=_count)
+    parser.add_argument("--days", type=float, default=365.0, help="time span of the data, ending now")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=50_000, help="rows per COPY")
+    parser.add_argument("--embeddings", action="store_true", help="also compute creation embeddings (slow at scale)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Load test: feed latency before and during a burst of password logins.
+
+Probes GET /api/creations/feed at a steady rate, first alone (baseline) and then
+while --logins concurrent POST /auth/login requests run. With bcrypt on the event
+loop the feed percentiles jump by the length of the burst; with the hashing
+executor they should stay close to the baseline, and surplus logins get 503s.
+
+Usage (against a running server, from repo root):
+    python scripts/load_login_burst.py --email load@example.com --password secret --register
+    python scripts/load_login_burst.py --base-url http://localhost:8000 --logins 200 --concurrency 50
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+
+def percentiles(samples: list[float]) -> str:
+    if not samples:
+        return "no samples"
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+    return (
+        f"n={len(ordered):<5} p50={pct(50):7.1f}ms p95={pct(95):7.1f}ms "
+        f"p99={pct(99):7.1f}ms max={ordered[-1] * 1000:7.1f}ms mean={statistics.mean(ordered) * 1000:7.1f}ms"
+    )
+
+
+async def probe_feed(client: httpx.AsyncClient, rate: float, stop: asyncio.Event) -> list[float]:
+    latencies = []
+    interval = 1.0 / rate
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get("/api/creations/feed", params={"limit": 10})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - started)))
+    return latencies
+
+
+async def login_burst(client: httpx.AsyncClient, email: str, password: str, logins: int, concurrency: int) -> Counter:
+    outcomes: Counter = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with semaphore:
+            response = await client.post("/auth/login", json={"email": email, "password": password})
+            outcomes[response.status_code] += 1
+
+    await asyncio.gather(*(login() for _ in range(logins)))
+    return outcomes
+
+
+async def main(args: argparse.Namespace) -> int:
+    limits = httpx.Limits(max_connections=args.concurrency + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60, limits=limits) as client:
+        if args.register:
+            response = await client.post("/auth/register", json={"email": args.email, "password": args.password, "name": "Load Test"})
+            if response.status_code not in (201, 400):
+                response.raise_for_status()
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(probe_feed(client, args.feed_rate, stop))
+        await asyncio.sleep(args.baseline_seconds)
+        stop.set()
+        baseline = await probe
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(probe_feed(client, args.feed_rate, stop))
+        started = time.perf_counter()
+        outcomes = await login_burst(client, args.email, args.password, args.logins, args.concurrency)
+        burst_seconds = time.perf_counter() - started
+        stop.set()
+        during = await probe
+
+    print(f"feed baseline      {percentiles(baseline)}")
+    print(f"feed during burst  {percentiles(during)}")
+    print(f"logins: {args.logins} in {burst_seconds:.1f}s, status codes {dict(outcomes)}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", default="loadtest@example.com")
+    parser.add_argument("--password", default="loadtest-password")
+    parser.add_argument("--register", action="store_true", help="create the login user first")
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--feed-rate", type=float, default=20.0, help="feed requests per second")
+    parser.add_argument("--baseline-seconds", type=float, default=5.0)
+    sys.exit(asyncio.run(main(parser.parse_args())))
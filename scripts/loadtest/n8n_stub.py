@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Stand-in for the n8n image-generation webhook.
+
+Answers POST requests like the real workflow: after a configurable delay it returns
+{"inlineData": <base64 PNG>, "mimeType", "fashion_tags", "trend_insight"}. The PNGs are
+random noise (so they do not compress) of roughly --payload-kb each; a small pool of
+them is generated at startup so consecutive creations get different perceptual hashes.
+--error-rate answers that fraction of requests with a 500.
+
+The load test starts it itself; to run it alone (point N8N_WEBHOOK_URL at it):
+    python scripts/loadtest/n8n_stub.py --port 5679 --latency-ms 3000 --payload-kb 600
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import base64
+import io
+import random
+
+import uvicorn
+from PIL import Image
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+IMAGE_POOL_SIZE = 8
+
+
+def make_images(payload_kb: int, count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    side = max(8, int((payload_kb * 1024 / 3) ** 0.5))
+    images = []
+    for _ in range(count):
+        image = Image.frombytes("RGB", (side, side), rng.randbytes(side * side * 3))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG", compress_level=1)
+        images.append(base64.b64encode(buffer.getvalue()).decode("ascii"))
+    return images
+
+
+def build_app(latency_ms: float, jitter_ms: float, payload_kb: int, error_rate: float) -> Starlette:
+    images = make_images(payload_kb, IMAGE_POOL_SIZE)
+    rng = random.Random()
+
+    async def webhook(request: Request):
+        await request.body()
+        await asyncio.sleep(max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000)
+        if rng.random() < error_rate:
+            return JSONResponse({"message": "Workflow execution failed"}, status_code=500)
+        return JSONResponse({
+            "inlineData": rng.choice(images),
+            "mimeType": "image/png",
+            "fashion_tags": "#" + " #".join(rng.sample(["ootd", "minimal", "street", "vintage", "layering", "denim"], 3)),
+            "trend_insight": "Relaxed tailoring keeps trending this season.",
+        })
+
+    return Starlette(routes=[Route("/{path:path}", webhook, methods=["POST"])])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5679)
+    parser.add_argument("--latency-ms", type=float, default=3000, help="mean response delay")
+    parser.add_argument("--jitter-ms", type=float, default=500, help="uniform +/- jitter on the delay")
+    parser.add_argument("--payload-kb", type=int, default=600, help="approximate size of the returned PNG")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 500")
+    args = parser.parse_args()
+    app = build_app(args.latency_ms, args.jitter_ms, args.payload_kb, args.error_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,108 @@
+"""Latency/throughput bookkeeping for the load test, and the comparison with a baseline."""
+from __future__ import annotations
+import json
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+# Latency differences below this are noise on a developer machine, whatever the ratio
+MIN_LATENCY_DELTA_MS = 5.0
+# Absolute error-rate increase that counts as a regression
+MAX_ERROR_RATE_INCREASE = 0.01
+
+
+class Recorder:
+    """Outcomes of one scenario, per operation name (e.g. "feed.latest", "create_task.complete")."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, name: str, seconds: float, status, ok: bool) -> None:
+        self.latencies[name].append(seconds)
+        self.statuses[name][str(status)] += 1
+        if not ok:
+            self.errors[name] += 1
+
+    def summary(self, wall_seconds: float) -> Dict[str, dict]:
+        result = {}
+        for name, samples in sorted(self.latencies.items()):
+            ordered = sorted(samples)
+            result[name] = {
+                "requests": len(ordered),
+                "errors": self.errors[name],
+                "error_rate": round(self.errors[name] / len(ordered), 4),
+                "throughput_rps": round(len(ordered) / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+                "p50_ms": percentile_ms(ordered, 50),
+                "p95_ms": percentile_ms(ordered, 95),
+                "p99_ms": percentile_ms(ordered, 99),
+                "max_ms": round(ordered[-1] * 1000, 2),
+                "statuses": dict(self.statuses[name]),
+            }
+        return result
+
+
+def percentile_ms(ordered: List[float], p: float) -> float:
+    """Nearest-rank percentile of sorted samples (seconds), in milliseconds."""
+    if not ordered:
+        return 0.0
+    return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 2)
+
+
+def format_table(scenarios: Dict[str, Dict[str, dict]]) -> str:
+    lines = [
+        f"{'scenario':<12} {'operation':<24} {'n':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} "
+        f"{'p99 ms':>9} {'max ms':>9} {'errors':>7}  statuses"
+    ]
+    for scenario, operations in scenarios.items():
+        for name, m in operations.items():
+            statuses = " ".join(f"{code}:{count}" for code, count in sorted(m["statuses"].items()))
+            lines.append(
+                f"{scenario:<12} {name:<24} {m['requests']:>6} {m['throughput_rps']:>8.1f} {m['p50_ms']:>9.1f} "
+                f"{m['p95_ms']:>9.1f} {m['p99_ms']:>9.1f} {m['max_ms']:>9.1f} {m['error_rate']:>6.1%}  {statuses}"
+            )
+    return "\n".join(lines)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Regressions of `results` against `baseline`: p95/p99 latency above the baseline by more
+    than `tolerance` (and MIN_LATENCY_DELTA_MS), throughput below it by more than
+    `tolerance`, or an error rate up by more than MAX_ERROR_RATE_INCREASE.
+    Operations missing from either side are skipped.
+    """
+    regressions = []
+    for scenario, operations in baseline.get("scenarios", {}).items():
+        for name, base in operations.items():
+            current = results.get("scenarios", {}).get(scenario, {}).get(name)
+            if current is None:
+                continue
+            label = f"{scenario}/{name}"
+            for key in ("p95_ms", "p99_ms"):
+                limit = base[key] * (1 + tolerance)
+                if current[key] > limit and current[key] - base[key] > MIN_LATENCY_DELTA_MS:
+                    regressions.append(f"{label}: {key} {current[key]:.1f} vs baseline {base[key]:.1f}")
+            if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+                regressions.append(
+                    f"{label}: throughput {current['throughput_rps']:.1f}/s vs baseline {base['throughput_rps']:.1f}/s"
+                )
+            if current["error_rate"] > base["error_rate"] + MAX_ERROR_RATE_INCREASE:
+                regressions.append(f"{label}: error rate {current['error_rate']:.1%} vs baseline {base['error_rate']:.1%}")
+    return regressions
+
+
+def dataset_mismatch(results: dict, baseline: dict) -> List[str]:
+    """Run parameters that differ from the baseline's, which make the comparison unfair."""
+    keys = ("users", "creations", "likes", "n8n_latency_ms", "n8n_payload_kb", "workers")
+    current, base = results.get("meta", {}), baseline.get("meta", {})
+    return [f"{key}: {current.get(key)} vs baseline {base.get(key)}" for key in keys if current.get(key) != base.get(key)]
+
+
+def load(path: Path) -> dict:
+    return json.loads(path.read_text())
+
+
+def save(path: Path, results: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
@@ -0,0 +1,255 @@
+"""Load-test scenarios. Each is one virtual user's iteration, run in a loop by run_scenario().
+
+Operations are recorded per name in a Recorder; "expected" statuses (e.g. 409 for liking
+an already-liked creation) are not errors. Background work (creation generation, CSV
+analysis) is followed by polling, and the end-to-end time is recorded as "<op>.complete".
+"""
+from __future__ import annotations
+import asyncio
+import io
+import itertools
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+from jose import jwt
+from PIL import Image
+
+from scripts.datagen import AGE_GROUPS, BODY_TYPES, COLORS, GENDERS, STYLES
+from scripts.loadtest.report import Recorder
+from scripts.loadtest.seed import SeededData
+
+# Daily generation quota enforced by create_task (UserService.get_user_with_stats)
+DAILY_GENERATIONS = 3
+# The hot set of the like storm: everyone likes and unlikes the same few creations
+LIKE_STORM_CREATIONS = 10
+# Upload images are generated once, outside the timed requests
+IMAGE_POOL_SIZE = 8
+
+
+@dataclass
+class Context:
+    client: httpx.AsyncClient
+    data: SeededData
+    secret_key: str
+    rng: random.Random
+    poll_interval: float = 0.25
+    task_timeout: float = 300.0
+    csv_rows: int = 2000
+    upload_kb: int = 200
+    _tokens: Dict[int, str] = field(default_factory=dict)
+    _images: List[bytes] = field(default_factory=list)
+    _generation_users: Optional[Iterator[int]] = None
+
+    def token(self, user_id: int) -> str:
+        token = self._tokens.get(user_id)
+        if token is None:
+            token = self._tokens[user_id] = jwt.encode(
+                {
+                    "sub": str(user_id),
+                    "email": f"user{user_id}@loadtest.local",
+                    "role": "ADMIN" if user_id == self.data.admin_id else "MEMBER",
+                    "name": f"Load Test {user_id}",
+                    "picture": None,
+                    "exp": datetime.now(timezone.utc) + timedelta(hours=6),
+                },
+                self.secret_key,
+                algorithm="HS256",
+            )
+        return token
+
+    def auth(self, user_id: int) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token(user_id)}"}
+
+    def image(self) -> bytes:
+        if not self._images:
+            self._images = [make_png(self.rng, self.upload_kb) for _ in range(IMAGE_POOL_SIZE)]
+        return self.rng.choice(self._images)
+
+    def random_user(self) -> int:
+        return self.rng.choice(self.data.user_ids)
+
+    def next_generation_user(self) -> int:
+        """Users in turn, each up to the daily quota, starting from the least active ones."""
+        if self._generation_users is None:
+            users = reversed(self.data.user_ids)
+            self._generation_users = itertools.cycle(
+                itertools.chain.from_iterable(itertools.repeat(u, DAILY_GENERATIONS) for u in users)
+            )
+        return next(self._generation_users)
+
+
+async def _request(
+    ctx: Context, rec: Recorder, name: str, method: str, url: str, expected: Tuple[int, ...] = (200,), **kwargs
+) -> Optional[httpx.Response]:
+    started = time.perf_counter()
+    try:
+        response = await ctx.client.request(method, url, **kwargs)
+    except httpx.HTTPError as exc:
+        rec.record(name, time.perf_counter() - started, type(exc).__name__, ok=False)
+        return None
+    rec.record(name, time.perf_counter() - started, response.status_code, ok=response.status_code in expected)
+    return response
+
+
+async def _poll(ctx: Context, rec: Recorder, name: str, url: str, headers: Dict[str, str]) -> Optional[dict]:
+    """Polls a task/job until it completes or fails; None on timeout or request errors."""
+    deadline = time.perf_counter() + ctx.task_timeout
+    while time.perf_counter() < deadline:
+        response = await _request(ctx, rec, name, "GET", url, headers=headers)
+        if response is None or response.status_code != 200:
+            return None
+        task = response.json()
+        if task["status"] in ("completed", "failed"):
+            return task
+        await asyncio.sleep(ctx.poll_interval)
+    return None
+
+
+def make_png(rng: random.Random, size_kb: int) -> bytes:
+    side = max(8, int((size_kb * 1024 / 3) ** 0.5))
+    buffer = io.BytesIO()
+    Image.frombytes("RGB", (side, side), rng.randbytes(side * side * 3)).save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def make_survey_csv(rng: random.Random, rows: int) -> bytes:
+    """Persona-survey shaped CSV: a user_id, Likert answers and two categorical columns."""
+    lines = ["user_id,q1,q2,q3,q4,q5,q6,q7,q8,gender,age_group"]
+    for user_id in range(1, rows + 1):
+        answers = ",".join(str(rng.randint(1, 5)) for _ in range(8))
+        lines.append(f"{user_id},{answers},{rng.choice(GENDERS)},{rng.choice(AGE_GROUPS)}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+# --- Scenarios ---------------------------------------------------------------------------
+
+async def feed_browsing(ctx: Context, rec: Recorder) -> None:
+    """A visitor (half of them signed in) pages through a feed, then opens the explorer."""
+    headers = ctx.auth(ctx.random_user()) if ctx.rng.random() < 0.5 else {}
+    sort_by = ctx.rng.choice(("latest", "popular", "hot"))
+    if sort_by == "hot":
+        params = {"sort_by": "hot", "limit": 10}
+        for _ in range(3):
+            response = await _request(ctx, rec, "feed.hot", "GET", "/api/creations/feed", params=params, headers=headers)
+            if response is None or response.status_code != 200 or not response.json():
+                break
+            last = response.json()[-1]
+            if last.get("hot_score") is None:
+                break
+            params = {"sort_by": "hot", "limit": 10, "after_score": last["hot_score"], "after_id": last["id"]}
+    else:
+        for page in range(3):
+            params = {"sort_by": sort_by, "limit": 10, "offset": page * 10}
+            await _request(ctx, rec, f"feed.{sort_by}", "GET", "/api/creations/feed", params=params, headers=headers)
+    await _request(ctx, rec, "facets", "GET", "/api/creations/facets", headers=headers)
+    await _request(ctx, rec, "tags.recent", "GET", "/api/tags/recent", headers=headers)
+
+
+async def like_storm(ctx: Context, rec: Recorder) -> None:
+    """Many users like and unlike the same few creations (row contention on likes_count)."""
+    headers = ctx.auth(ctx.random_user())
+    creation_id = ctx.rng.choice(ctx.data.hot_creation_ids[:LIKE_STORM_CREATIONS])
+    url = f"/api/creations/{creation_id}/like"
+    # 409: liked already (seeded like), 404: nothing to unlike
+    await _request(ctx, rec, "like", "POST", url, expected=(200, 409), headers=headers)
+    await _request(ctx, rec, "unlike", "DELETE", url, expected=(200, 404), headers=headers)
+
+
+async def create_task_burst(ctx: Context, rec: Recorder) -> None:
+    """Submits a generation (against the stub n8n) and polls it to completion."""
+    user_id = ctx.next_generation_user()
+    headers = ctx.auth(user_id)
+    form = {
+        "text": "relaxed tailoring for a rainy city day",
+        "gender": ctx.rng.choice(GENDERS),
+        "height": str(ctx.rng.randint(150, 190)),
+        "body_type": ctx.rng.choice(BODY_TYPES),
+        "style": ctx.rng.choice(STYLES),
+        "colors": ", ".join(ctx.rng.sample(COLORS, 2)),
+        "is_public": "true",
+    }
+    files = None
+    if ctx.rng.random() < 0.5:
+        files = {"image": ("reference.png", ctx.image(), "image/png")}
+    started = time.perf_counter()
+    # 429: the user's daily quota is used up (seeded creations from today count)
+    response = await _request(
+        ctx, rec, "create_task", "POST", "/api/create_task", expected=(200, 429), data=form, files=files, headers=headers
+    )
+    if response is None or response.status_code != 200:
+        return
+    task = await _poll(ctx, rec, "task_status", f"/api/task_status/{response.json()['task_id']}", headers)
+    status = task["status"] if task else "timeout"
+    rec.record("create_task.complete", time.perf_counter() - started, status, ok=status == "completed")
+
+
+async def csv_analysis(ctx: Context, rec: Recorder) -> None:
+    """Uploads a fresh survey CSV (never a cache hit) and waits for the personas."""
+    headers = ctx.auth(ctx.random_user())
+    files = {"file": ("survey.csv", make_survey_csv(ctx.rng, ctx.csv_rows), "text/csv")}
+    started = time.perf_counter()
+    response = await _request(ctx, rec, "analysis.upload", "POST", "/api/analysis/upload", files=files, headers=headers)
+    if response is None or response.status_code != 200:
+        return
+    body = response.json()
+    if body.get("cached"):
+        status = "cached"
+    else:
+        task = await _poll(ctx, rec, "analysis.job", f"/api/analysis/jobs/{body['task_id']}", headers)
+        status = task["status"] if task else "timeout"
+    rec.record("analysis.complete", time.perf_counter() - started, status, ok=status in ("completed", "cached"))
+
+
+async def media_upload(ctx: Context, rec: Recorder) -> None:
+    """Uploads an image to the media library, then lists the library."""
+    headers = ctx.auth(ctx.random_user())
+    files = {"file": ("look.png", ctx.image(), "image/png")}
+    data = {"description": "load test upload", "tags": "ootd, minimal"}
+    await _request(ctx, rec, "media.upload", "POST", "/api/media/upload", files=files, data=data, headers=headers)
+    await _request(ctx, rec, "media.list", "GET", "/api/media/me", headers=headers)
+
+
+@dataclass
+class Scenario:
+    run: Callable[[Context, Recorder], Awaitable[None]]
+    concurrency: int
+    # Runs for `duration` seconds, or exactly `iterations` iterations (a burst) if set
+    duration: float = 30.0
+    iterations: Optional[int] = None
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "feed": Scenario(feed_browsing, concurrency=50),
+    "likes": Scenario(like_storm, concurrency=50),
+    "create_task": Scenario(create_task_burst, concurrency=30, iterations=30),
+    "analysis": Scenario(csv_analysis, concurrency=4, iterations=8),
+    "media": Scenario(media_upload, concurrency=20, duration=20.0),
+}
+
+
+async def run_scenario(ctx: Context, scenario: Scenario, concurrency: int, duration: float) -> Tuple[Recorder, float]:
+    """Runs `concurrency` virtual users; returns the recorder and the wall time."""
+    rec = Recorder()
+    remaining = [scenario.iterations]
+    deadline = time.perf_counter() + duration
+
+    def more() -> bool:
+        if remaining[0] is None:
+            return time.perf_counter() < deadline
+        if remaining[0] <= 0:
+            return False
+        remaining[0] -= 1
+        return True
+
+    async def virtual_user():
+        while more():
+            await scenario.run(ctx, rec)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user() for _ in range(concurrency)))
+    return rec, time.perf_counter() - started
+
@@ -0,0 +1,73 @@
+"""Disposable load-test database: create it, apply db/init_schema.sql, seed it, drop it.
+
+The dataset comes from scripts/datagen.py (COPY-loaded, production-shaped, with hot
+scores, facet counts and embeddings built), so the first requests do not pay for it.
+"""
+from __future__ import annotations
+import secrets
+from dataclasses import dataclass, field
+from typing import List
+from urllib.parse import urlsplit, urlunsplit
+
+import asyncpg
+
+from scripts import datagen
+
+# Most-liked public creations handed to the scenarios (the like storm's hot set)
+HOT_CREATIONS = 50
+
+
+@dataclass
+class SeededData:
+    user_ids: List[int] = field(default_factory=list)
+    hot_creation_ids: List[int] = field(default_factory=list)
+    admin_id: int = 1
+
+
+def database_dsn(dsn: str, database: str) -> str:
+    """`dsn` with its database name replaced."""
+    parts = urlsplit(dsn)
+    return urlunsplit(parts._replace(path=f"/{database}"))
+
+
+async def create_database(admin_dsn: str) -> str:
+    """Creates an empty, uniquely named database and returns its name."""
+    name = f"loadtest_{secrets.token_hex(4)}"
+    conn = await asyncpg.connect(admin_dsn)
+    try:
+        await conn.execute(f'CREATE DATABASE "{name}"')
+    finally:
+        await conn.close()
+    return name
+
+
+async def drop_database(admin_dsn: str, name: str) -> None:
+    conn = await asyncpg.connect(admin_dsn)
+    try:
+        await conn.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+    finally:
+        await conn.close()
+
+
+async def apply_schema(dsn: str) -> None:
+    conn = await asyncpg.connect(dsn)
+    try:
+        await datagen.apply_schema(conn)
+    finally:
+        await conn.close()
+
+
+async def seed(dsn: str, users: int, creations: int, likes: int, rng_seed: int = 0) -> SeededData:
+    """
+    Loads `users` users (user 1 is an ADMIN), `creations` creations and about `likes`
+    likes. Passwords are left unset: the load test mints its own tokens.
+    """
+    conn = await asyncpg.connect(dsn)
+    try:
+        await datagen.generate(conn, users, creations, likes, rng_seed=rng_seed, embeddings=True, log=lambda line: None)
+        hot = await conn.fetch(
+            "SELECT id FROM creations WHERE is_public = TRUE ORDER BY likes_count DESC, id LIMIT $1", HOT_CREATIONS
+        )
+    finally:
+        await conn.close()
+    return SeededData(user_ids=list(range(1, users + 1)), hot_creation_ids=[row["id"] for row in hot], admin_id=1)
@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.config.settings import settings
+from app.dependencies.db_connection import get_db_connection
+from app.main import app
+from app.services import rate_limiter
+from app.services.rate_limiter import MemoryBackend, SlidingWindowLimiter
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """
+    TestClient whose DB dependency only counts how often it was reached (and then fails),
+    so a test can tell attempts that got past the rate limiter from those refused before it.
+    """
+    monkeypatch.setattr(settings, "TRUST_PROXY_HEADERS", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_REDIS_URL", "")
+    monkeypatch.setattr(settings, "AUTH_RATE_LIMIT_IP_ATTEMPTS", 20)
+    monkeypatch.setattr(settings, "AUTH_RATE_LIMIT_EMAIL_ATTEMPTS", 5)
+    monkeypatch.setattr(settings, "AUTH_RATE_LIMIT_WINDOW_SECONDS", 60)
+    rate_limiter.reset()
+    db_calls = []
+
+    async def counting_db_connection():
+        db_calls.append(1)
+        raise HTTPException(status_code=503, detail="no database in tests")
+        yield  # pragma: no cover
+
+    app.dependency_overrides[get_db_connection] = counting_db_connection
+    test_client = TestClient(app)
+    test_client.db_calls = db_calls
+    yield test_client
+    app.dependency_overrides.pop(get_db_connection, None)
+    rate_limiter.reset()
+
+
+def login(client, email, ip):
+    return client.post(
+        "/auth/login",
+        json={"email": email, "password": "hunter2"},
+        headers={"X-Forwarded-For": ip},
+    )
+
+
+def test_credential_stuffing_from_one_ip_is_cut_off(client):
+    # One IP cycling through a leaked list: every email is new, only the IP limit applies
+    statuses = [login(client, f"victim{i}@example.com", "203.0.113.7").status_code for i in range(100)]
+
+    assert statuses[:20] == [503] * 20
+    assert statuses[20:] == [429] * 80
+    assert len(client.db_calls) == 20
+    assert rate_limiter.counters["login:ip.allowed"] == 20
+    assert rate_limiter.counters["login:ip.rejected"] == 80
+
+
+def test_distributed_attack_on_one_account_hits_the_email_limit(client):
+    statuses = [login(client, "Target@Example.com", f"198.51.100.{i}").status_code for i in range(30)]
+
+    assert statuses[:5] == [503] * 5
+    assert statuses[5:] == [429] * 25
+    assert len(client.db_calls) == 5
+    assert rate_limiter.counters["login:email.rejected"] == 25
+
+
+def test_rejection_carries_retry_after(client):
+    for _ in range(5):
+        login(client, "someone@example.com", "192.0.2.1")
+    response = login(client, "someone@example.com", "192.0.2.1")
+
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= 60
+
+
+def test_login_and_register_are_limited_separately(client):
+    for _ in range(5):
+        login(client, "new@example.com", "192.0.2.2")
+    response = client.post(
+        "/auth/register",
+        json={"email": "new@example.com", "password": "hunter2", "name": "New"},
+        headers={"X-Forwarded-For": "192.0.2.2"},
+    )
+
+    assert response.status_code == 503
+
+
+def test_sliding_window_weights_the_previous_window():
+    limiter = SlidingWindowLimiter("t", limit=10, window_seconds=60, backend=MemoryBackend())
+
+    async def scenario():
+        results = [await limiter.hit("k", now=50.0) for _ in range(10)]
+        # 25% into the next window, 75% of the previous 10 hits still count: 7.5 + 1 ok, up to 10
+        results += [await limiter.hit("k", now=75.0) for _ in range(3)]
+        return results
+
+    results = asyncio.run(scenario())
+    assert all(allowed for allowed, _ in results[:12])
+    allowed, retry_after = results[12]
+    assert not allowed
+    assert retry_after == pytest.approx(45.0)
+
+
+def test_sliding_window_forgets_after_two_windows():
+    limiter = SlidingWindowLimiter("t", limit=2, window_seconds=10, backend=MemoryBackend())
+
+    async def scenario():
+        for _ in range(5):
+            await limiter.hit("k", now=1.0)
+        return await limiter.hit("k", now=21.0)
+
+    assert asyncio.run(scenario()) == (True, 0.0)
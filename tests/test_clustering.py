@@ -0,0 +1,70 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.datasets import make_blobs
+
+from app.services import clustering
+
+
+def _blobs(n_rows: int, centers: int, seed: int = 0) -> np.ndarray:
+    X, _ = make_blobs(n_samples=n_rows, n_features=4, centers=centers, cluster_std=0.5, random_state=seed)
+    return X
+
+
+@pytest.mark.parametrize("criterion", clustering.CRITERIA)
+def test_search_k_finds_the_number_of_blobs(criterion):
+    seen = []
+    search = clustering.search_k(_blobs(600, centers=5), criterion=criterion, on_k=seen.append)
+
+    assert search["k"] == 5
+    assert seen == list(clustering.K_CANDIDATES)
+    assert set(search["scores"]) == set(clustering.K_CANDIDATES)
+    assert len(np.unique(search["labels"])) == 5
+
+
+def test_search_k_samples_silhouette_on_large_inputs(monkeypatch):
+    monkeypatch.setattr(clustering, "SILHOUETTE_SAMPLE_SIZE", 200)
+    monkeypatch.setattr(clustering, "FULL_KMEANS_MAX_ROWS", 500)
+    search = clustering.search_k(_blobs(3000, centers=4, seed=1))
+    assert search["k"] == 4
+    assert len(search["labels"]) == 3000
+
+
+def test_search_k_with_fewer_rows_than_candidates():
+    search = clustering.search_k(_blobs(2, centers=2))
+    assert search["k"] == 1
+    assert search["labels"].tolist() == [0, 0]
+
+
+def test_search_k_rejects_unknown_criterion():
+    with pytest.raises(ValueError):
+        clustering.search_k(_blobs(50, centers=3), criterion="elbow")
+
+
+def test_fit_fixed_k_is_reproducible():
+    X = _blobs(400, centers=3, seed=2)
+    first = clustering.fit_fixed_k(X, 6, random_state=7)
+    second = clustering.fit_fixed_k(X, 6, random_state=7)
+
+    assert np.array_equal(first, second)
+    assert len(np.unique(first)) == 6
+    # K is clamped to the number of rows
+    assert len(np.unique(clustering.fit_fixed_k(X[:3], 10))) == 3
+
+
+def test_personas_have_one_entry_per_cluster():
+    df = pd.DataFrame({"user_id": range(6), "q1": [1, 1, 1, 5, 5, 5], "q2": np.float32([2, 2, 2, 4, 4, 4])})
+    labels = np.array([0, 0, 0, 1, 1, 2])
+    profiles = clustering.cluster_profiles(df, labels, 3)
+    personas = clustering.build_personas(profiles, total_rows=6)
+
+    assert [p["id"] for p in personas] == [0, 1, 2]
+    assert [p["size"] for p in profiles] == [3, 2, 1]
+    assert personas[0]["features"] == {"user_id": 1.0, "q1": 1.0, "q2": 2.0, "cluster": 0.0}
+    for persona in personas:
+        assert set(persona) == {"id", "name", "summary", "features", "motivation", "risk_signal", "content_preference"}
+    # Smaller than an even share (6 / 3) is flagged
+    assert [p["risk_signal"] for p in personas] == ["Loyal", "Loyal", "High churn risk"]
+    json.dumps(personas)
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.csv_ingest import _CategoryEncoder, _Reservoir, ingest_csv
+
+
+def _write_csv(tmp_path, df: pd.DataFrame) -> str:
+    path = tmp_path / "data.csv"
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def test_small_csv_round_trips(tmp_path):
+    df = pd.DataFrame({
+        "user_id": [1, 2, 3, 4],
+        "age": [23, 35, None, 51],
+        "score": [0.5, 1.25, 3.0, 2.0],
+        "city": ["Oslo", "Lima", "Oslo", None],
+    })
+    progress = []
+    result = ingest_csv(_write_csv(tmp_path, df), memory_budget_bytes=2**20, chunk_rows=3, on_progress=progress.append)
+
+    assert not result.sampled
+    assert result.total_rows == 4
+    assert list(result.df.columns) == ["user_id", "age", "score", "city"]
+    assert result.df["age"].tolist() == [23, 35, 0, 51]
+    assert result.df["score"].tolist() == [0.5, 1.25, 3.0, 2.0]
+    # Sorted codes, as LabelEncoder would give: "0" (the filled gap) < "Lima" < "Oslo"
+    assert result.df["city"].tolist() == [2, 1, 2, 0]
+    assert result.categorical_columns == ["city"]
+    assert progress[-1] == 1.0
+    assert result.report()["analysed_rows"] == 4
+
+
+def test_category_codes_are_stable_across_chunks(tmp_path):
+    rng = np.random.default_rng(0)
+    colours = np.array(["red", "green", "blue", "amber"])
+    df = pd.DataFrame({"x": np.arange(500), "colour": colours[rng.integers(0, 4, 500)]})
+    # The first chunk only sees one value; the others appear in later chunks
+    df.loc[:49, "colour"] = "red"
+
+    result = ingest_csv(_write_csv(tmp_path, df), memory_budget_bytes=2**20, chunk_rows=50)
+    expected = {name: code for code, name in enumerate(sorted(colours))}
+    assert result.df["colour"].tolist() == [expected[c] for c in df["colour"]]
+
+
+def test_encoder_keeps_first_seen_codes_until_remap():
+    encoder = _CategoryEncoder()
+    assert encoder.encode(pd.Series(["b", "a", "b"])).tolist() == [0, 1, 0]
+    assert encoder.encode(pd.Series(["c", "a"])).tolist() == [2, 1]
+    assert encoder.sorted_remap()[[0, 1, 2]].tolist() == [1, 0, 2]
+
+
+def test_reservoir_keeps_exactly_capacity_rows():
+    rng = np.random.default_rng(1)
+    ids = np.arange(10_000)
+    reservoir = _Reservoir({"id": ids[:300], "twice": ids[:300] * 2}, capacity=100, rng=rng)
+    for start in range(300, len(ids), 700):
+        stop = start + 700
+        reservoir.add({"id": ids[start:stop], "twice": ids[start:stop] * 2})
+
+    kept = reservoir.columns["id"]
+    assert reservoir.seen == len(ids)
+    assert len(kept) == 100
+    assert len(np.unique(kept)) == 100
+    # Columns of a sampled row stay together
+    assert np.array_equal(reservoir.columns["twice"], kept * 2)
+    # Not just the head of the stream
+    assert kept.max() > 5_000
+
+
+def test_reservoir_needs_capacity_seed_rows():
+    with pytest.raises(ValueError):
+        _Reservoir({"id": np.arange(5)}, capacity=10, rng=np.random.default_rng(0))
+
+
+def test_over_budget_csv_is_sampled_to_the_budget(tmp_path):
+    n_rows = 20_000
+    df = pd.DataFrame({"user_id": np.arange(n_rows), "value": np.arange(n_rows) % 97})
+    budget = 40_000
+
+    result = ingest_csv(_write_csv(tmp_path, df), memory_budget_bytes=budget, chunk_rows=1_000)
+
+    assert result.sampled
+    assert result.total_rows == n_rows
+    bytes_per_row = result.df.memory_usage(index=False).sum() // len(result.df)
+    assert len(result.df) == budget // bytes_per_row
+    assert result.df["user_id"].is_unique
+    assert (result.df["value"] == result.df["user_id"] % 97).all()
@@ -0,0 +1,193 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi.testclient import TestClient
+from jose import jwk, jwt
+
+from app.auth.google_oidc import GoogleAuthError, GoogleOIDC, get_google_oidc
+from app.dependencies.db_connection import get_db_connection
+from app.main import app
+
+CLIENT_ID = "test-client.apps.googleusercontent.com"
+
+
+def _rsa_key():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    public_pem = key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    return private_pem, public_pem
+
+
+class FakeGoogle:
+    """Local stand-in for Google's token endpoint and JWKS, served through httpx.MockTransport."""
+
+    def __init__(self):
+        self.keys = {}
+        self.requests = []
+        self.id_token_claims = {}
+        self.max_age = 3600
+        self.add_key("key-1")
+
+    def add_key(self, kid):
+        private_pem, public_pem = _rsa_key()
+        self.keys[kid] = (private_pem, {**jwk.construct(public_pem, "RS256").to_dict(), "kid": kid, "use": "sig"})
+
+    def sign(self, kid="key-1", access_token=None, **overrides):
+        now = int(time.time())
+        claims = {
+            "iss": "https://accounts.google.com",
+            "aud": CLIENT_ID,
+            "sub": "1234567890",
+            "email": "ada@example.com",
+            "email_verified": True,
+            "name": "Ada Lovelace",
+            "picture": "https://example.com/ada.png",
+            "iat": now,
+            "exp": now + 3600,
+            **overrides,
+        }
+        return jwt.encode(claims, self.keys[kid][0], algorithm="RS256", headers={"kid": kid}, access_token=access_token)
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request.url.path)
+        if request.url.path == "/certs":
+            return httpx.Response(
+                200,
+                json={"keys": [public for _, public in self.keys.values()]},
+                headers={"Cache-Control": f"public, max-age={self.max_age}"},
+            )
+        if request.url.path == "/token":
+            if b"code=bad" in request.content:
+                return httpx.Response(400, json={"error": "invalid_grant", "error_description": "Bad Request"})
+            return httpx.Response(200, json={
+                "access_token": "ya29.test",
+                "id_token": self.sign(access_token="ya29.test", **self.id_token_claims),
+                "token_type": "Bearer",
+            })
+        return httpx.Response(404)
+
+    def client(self) -> GoogleOIDC:
+        http_client = httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+        return GoogleOIDC(
+            CLIENT_ID, "secret", "http://localhost/callback",
+            "https://google.test/token", "https://google.test/certs", http_client
+        )
+
+
+@pytest.fixture
+def google():
+    return FakeGoogle()
+
+
+def test_verifies_id_token_and_caches_jwks(google):
+    oidc = google.client()
+
+    async def scenario():
+        first = await oidc.verify_id_token(google.sign())
+        second = await oidc.verify_id_token(google.sign(email="bob@example.com"))
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first["email"] == "ada@example.com"
+    assert second["email"] == "bob@example.com"
+    assert google.requests == ["/certs"]
+
+
+@pytest.mark.parametrize("overrides", [
+    {"aud": "someone-else"},
+    {"iss": "https://evil.example.com"},
+    {"exp": int(time.time()) - 60},
+    {"email_verified": False},
+])
+def test_rejects_invalid_claims(google, overrides):
+    oidc = google.client()
+    with pytest.raises(GoogleAuthError):
+        asyncio.run(oidc.verify_id_token(google.sign(**overrides)))
+
+
+def test_rejects_token_signed_by_another_key(google):
+    oidc = google.client()
+    forged = FakeGoogle()  # same kid, different key
+    with pytest.raises(GoogleAuthError):
+        asyncio.run(oidc.verify_id_token(forged.sign()))
+
+
+def test_unknown_kid_refetches_rotated_keys(google, monkeypatch):
+    monkeypatch.setattr("app.auth.google_oidc.MIN_JWKS_REFETCH_SECONDS", 0)
+    oidc = google.client()
+
+    async def scenario():
+        await oidc.verify_id_token(google.sign())
+        google.add_key("key-2")
+        return await oidc.verify_id_token(google.sign(kid="key-2"))
+
+    assert asyncio.run(scenario())["email"] == "ada@example.com"
+    assert google.requests == ["/certs", "/certs"]
+
+
+def test_expired_jwks_is_refetched(google):
+    google.max_age = 0
+    oidc = google.client()
+
+    async def scenario():
+        await oidc.verify_id_token(google.sign())
+        await oidc.verify_id_token(google.sign())
+
+    asyncio.run(scenario())
+    assert google.requests == ["/certs", "/certs"]
+
+
+class FakeConnection:
+    def __init__(self):
+        self.queries = []
+
+    async def fetchrow(self, query, *args):
+        self.queries.append(query)
+        email, name, picture = args
+        return {"id": 7, "email": email, "name": name, "picture": picture, "role": "MEMBER", "created_at": None, "token_version": 0}
+
+
+@pytest.fixture
+def callback_client(google, monkeypatch):
+    monkeypatch.setattr("app.auth.jwt_handler.SECRET_KEY", "test-secret")
+    monkeypatch.setattr("app.auth.jwt_handler.ALGORITHM", "HS256")
+    conn = FakeConnection()
+
+    async def fake_db_connection():
+        yield conn
+
+    app.dependency_overrides[get_google_oidc] = google.client
+    app.dependency_overrides[get_db_connection] = fake_db_connection
+    client = TestClient(app)
+    client.conn = conn
+    yield client
+    app.dependency_overrides.pop(get_google_oidc, None)
+    app.dependency_overrides.pop(get_db_connection, None)
+
+
+def test_callback_signs_in_with_one_exchange_and_one_upsert(callback_client, google):
+    response = callback_client.get("/rest/oauth2-credential/callback", params={"code": "good"})
+
+    assert response.status_code == 200
+    claims = jwt.get_unverified_claims(response.json()["access_token"])
+    assert claims["sub"] == "7"
+    assert claims["email"] == "ada@example.com"
+    assert google.requests == ["/token", "/certs"]
+    assert len(callback_client.conn.queries) == 1
+    assert "ON CONFLICT (email)" in callback_client.conn.queries[0]
+
+
+def test_callback_rejects_failed_exchange_and_bad_tokens(callback_client, google):
+    assert callback_client.get("/rest/oauth2-credential/callback", params={"code": "bad"}).status_code == 400
+
+    google.id_token_claims = {"aud": "someone-else"}
+    assert callback_client.get("/rest/oauth2-credential/callback", params={"code": "good"}).status_code == 400
+    assert callback_client.conn.queries == []
@@ -0,0 +1,69 @@
+import io
+import random
+
+from PIL import Image, ImageFilter
+
+from app.services.image_hash import BKTree, NearDuplicateIndex, dhash, hamming
+
+
+def _png(img: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _noise_image(seed: int, side: int = 64) -> Image.Image:
+    rng = random.Random(seed)
+    return Image.frombytes("L", (side, side), rng.randbytes(side * side)).convert("RGB")
+
+
+def test_dhash_is_close_for_edits_and_far_for_other_images():
+    original = _noise_image(1).filter(ImageFilter.GaussianBlur(2))
+    resized = original.resize((200, 200))
+    other = _noise_image(2).filter(ImageFilter.GaussianBlur(2))
+
+    assert hamming(dhash(_png(original)), dhash(_png(resized))) <= 6
+    assert hamming(dhash(_png(original)), dhash(_png(other))) > 6
+    assert dhash(b"not an image") is None
+    # Signed so it fits a Postgres BIGINT
+    assert -(2 ** 63) <= dhash(_png(original)) < 2 ** 63
+
+
+def test_bktree_search_matches_brute_force():
+    rng = random.Random(7)
+    hashes = [rng.getrandbits(64) - 2 ** 63 for _ in range(2000)]
+    # Near copies, so small radii find something
+    hashes += [h ^ (1 << rng.randrange(64)) for h in hashes[:200]]
+    tree = BKTree()
+    for item_id, value in enumerate(hashes):
+        tree.add(value, item_id)
+    assert len(tree) == len(hashes)
+
+    for _ in range(50):
+        query = rng.choice(hashes) ^ rng.getrandbits(64) & rng.getrandbits(64) & rng.getrandbits(64)
+        for radius in (0, 3, 10):
+            expected = sorted((hamming(query, h), i) for i, h in enumerate(hashes) if hamming(query, h) <= radius)
+            assert tree.search(query, radius) == expected
+
+
+def test_collapse_keeps_the_first_of_each_near_duplicate_group():
+    index = NearDuplicateIndex()
+    base_a, base_b = 0, (1 << 64) - 1 - 2 ** 63
+    index.add(1, base_a)
+    index.add(2, base_b)
+    index.add(3, base_a ^ 0b111)  # near-duplicate of 1
+    index.add(4, base_b ^ 0b1)    # near-duplicate of 2
+    index.add(5, base_a ^ 0b1)    # near-duplicate of 1 and 3
+
+    # Item 6 has no hash and is always kept
+    assert index.collapse([3, 2, 1, 6, 4, 5]) == [3, 2, 6]
+    assert index.collapse([1, 2, 3, 4, 5], max_distance=0) == [1, 2, 3, 4, 5]
+
+
+def test_discarded_items_leave_search_and_collapse():
+    index = NearDuplicateIndex()
+    index.add(1, 0)
+    index.add(2, 1)
+    index.discard(1)
+    assert index.search(0) == [(1, 2)]
+    assert index.collapse([1, 2]) == [1, 2]
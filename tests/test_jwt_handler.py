@@ -0,0 +1,108 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.auth import jwt_handler
+from app.auth.jwt_handler import create_access_token, verify_token
+
+
+class FakeConnection:
+    """Stands in for the users / revoked_tokens tables."""
+
+    def __init__(self, token_versions=None, revoked=None):
+        self.token_versions = dict(token_versions or {})
+        self.revoked = dict(revoked or {})
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def execute(self, query, *args):
+        if query.startswith("INSERT INTO revoked_tokens"):
+            self.revoked[args[0]] = args[1]
+
+    async def fetchval(self, query, user_id):
+        if user_id not in self.token_versions:
+            return None
+        self.token_versions[user_id] += 1
+        return self.token_versions[user_id]
+
+    async def fetch(self, query):
+        if "FROM users" in query:
+            return [{"id": user_id, "token_version": v} for user_id, v in self.token_versions.items() if v > 0]
+        return [{"digest": digest, "expires_at": expires_at} for digest, expires_at in self.revoked.items()]
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(jwt_handler, "SECRET_KEY", "test-secret")
+    monkeypatch.setattr(jwt_handler, "ALGORITHM", "HS256")
+    monkeypatch.setattr(jwt_handler, "_token_versions", {})
+    monkeypatch.setattr(jwt_handler, "_revoked_tokens", {})
+    monkeypatch.setattr(jwt_handler, "token_cache", jwt_handler._VerifiedTokenCache(100))
+
+
+def _cached_token(sub="1", **kwargs) -> str:
+    token = create_access_token({"sub": sub, "role": "MEMBER"}, **kwargs)
+    assert verify_token(token)["sub"] == sub
+    hits = jwt_handler.token_cache.hits
+    assert verify_token(token) is not None
+    assert jwt_handler.token_cache.hits == hits + 1
+    return token
+
+
+def test_revoked_token_is_rejected_even_when_cached():
+    token = _cached_token()
+    other_session = _cached_token(expires_delta=timedelta(minutes=5))
+    conn = FakeConnection()
+
+    asyncio.run(jwt_handler.revoke_token(conn, token))
+
+    assert verify_token(token) is None
+    assert list(conn.revoked) == [jwt_handler._digest(token)]
+    assert verify_token(other_session) is not None
+
+
+def test_bumped_token_version_rejects_cached_tokens():
+    old = _cached_token(token_version=0)
+    conn = FakeConnection(token_versions={1: 0, 2: 0})
+    bystander = _cached_token(sub="2")
+
+    assert asyncio.run(jwt_handler.revoke_user_tokens(conn, 1)) == 1
+
+    assert verify_token(old) is None
+    assert verify_token(bystander) is not None
+    # Tokens issued after the bump carry the new version
+    assert verify_token(create_access_token({"sub": "1"}, token_version=1)) is not None
+    assert asyncio.run(jwt_handler.revoke_user_tokens(conn, 99)) is None
+
+
+def test_revocations_from_other_workers_apply_after_sync():
+    token = _cached_token(sub="3")
+    logged_out = _cached_token(sub="4")
+    expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+    conn = FakeConnection(token_versions={3: 2}, revoked={jwt_handler._digest(logged_out): expires_at})
+
+    asyncio.run(jwt_handler.sync_revocations(conn))
+
+    assert verify_token(token) is None
+    assert verify_token(logged_out) is None
+
+
+def test_expired_cache_entries_are_not_served():
+    cache = jwt_handler._VerifiedTokenCache(10)
+    cache.put(b"digest", expires_at=100.0, payload={"sub": "1"})
+    assert cache.get(b"digest", now=99.0) == {"sub": "1"}
+    assert cache.get(b"digest", now=100.0) is None
+    assert len(cache) == 0
+
+
+def test_expired_token_is_rejected_after_being_cached():
+    token = _cached_token(expires_delta=timedelta(seconds=1))
+    # exp has whole-second precision
+    time.sleep(2.1)
+    assert verify_token(token) is None
+    assert len(jwt_handler.token_cache) == 0
@@ -0,0 +1,74 @@
+import hashlib
+import math
+
+import numpy as np
+
+from app.services import message_simulation as ms
+
+MESSAGES = [
+    "Save 20% today only - limited deal!",
+    "Discover our exclusive, finest crafted collection.",
+    "",
+    "Hello there " * 30,
+    "Free bonus offer for premium members, ends soon",
+]
+PERSONAS = [
+    {"id": 0, "motivation": "Value for money", "risk_signal": "High churn risk", "content_preference": "Short video ads"},
+    {"id": 1, "motivation": "Premium quality", "risk_signal": "Loyal", "content_preference": "Email newsletters"},
+    {"id": 2, "motivation": "Convenience", "risk_signal": "Loyal", "content_preference": "Social posts"},
+]
+
+_MASK = (1 << 64) - 1
+
+
+def _hash(value: str, seed: int) -> int:
+    return int.from_bytes(hashlib.blake2b(f"{seed}\x00{value}".encode(), digest_size=8).digest(), "little")
+
+
+def _reference_score(message: str, persona: dict, seed: int) -> float:
+    """One pair at a time, in plain Python integers and floats."""
+    features = ms._message_features([message])[0]
+    weights = ms._persona_weights([persona])[0]
+    affinity = math.tanh(sum(f * w for f, w in zip(features, weights)))
+
+    x = _hash(message, seed) ^ ((_hash(str(persona["id"]), seed) * 0x9E3779B97F4A7C15) & _MASK)
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK
+    x ^= x >> 31
+    noise = (x >> 11) / float(1 << 53) * 2.0 - 1.0
+
+    return min(1.0, max(-1.0, (1 - ms.NOISE_WEIGHT) * affinity + ms.NOISE_WEIGHT * noise))
+
+
+def test_score_matrix_matches_a_per_pair_loop():
+    scores = ms.score_matrix(MESSAGES, PERSONAS, seed=3)
+
+    assert scores.shape == (len(MESSAGES), len(PERSONAS))
+    expected = [[_reference_score(m, p, 3) for p in PERSONAS] for m in MESSAGES]
+    assert np.allclose(scores, expected, rtol=0, atol=1e-12)
+    # A pair's score does not depend on the rest of the batch
+    for i, message in enumerate(MESSAGES):
+        for j, persona in enumerate(PERSONAS):
+            assert ms.score_matrix([message], [persona], seed=3)[0, 0] == scores[i, j]
+
+
+def test_scores_are_deterministic_per_seed():
+    first = ms.score_matrix(MESSAGES, PERSONAS, seed=7)
+    assert np.array_equal(first, ms.score_matrix(MESSAGES, PERSONAS, seed=7))
+    assert not np.array_equal(first, ms.score_matrix(MESSAGES, PERSONAS, seed=8))
+    assert ms.simulate(MESSAGES, PERSONAS, seed=7) == ms.simulate(MESSAGES, PERSONAS, seed=7)
+
+
+def test_simulate_stream_matches_simulate_across_blocks():
+    batch = ms.simulate(MESSAGES, PERSONAS, seed=1)
+    streamed = list(ms.simulate_stream(MESSAGES, PERSONAS, seed=1, block_size=2))
+
+    assert len(streamed) == len(MESSAGES) * len(PERSONAS)
+    assert [row.pop("message_index") for row in streamed] == [i for i in range(len(MESSAGES)) for _ in PERSONAS]
+    assert streamed == [row for rows in batch for row in rows]
+
+
+def test_empty_inputs_give_empty_matrices():
+    assert ms.score_matrix([], PERSONAS).shape == (0, len(PERSONAS))
+    assert ms.score_matrix(MESSAGES, []).shape == (len(MESSAGES), 0)
+    assert list(ms.simulate_stream([], PERSONAS)) == []
@@ -0,0 +1,29 @@
+from app.services import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_latency_seconds", "Test latency.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "/items/{id}")
+
+    lines = list(histogram.samples())
+    assert lines == [
+        'test_latency_seconds_bucket{route="/items/{id}",le="0.1"} 2',
+        'test_latency_seconds_bucket{route="/items/{id}",le="1"} 3',
+        'test_latency_seconds_bucket{route="/items/{id}",le="+Inf"} 4',
+        'test_latency_seconds_sum{route="/items/{id}"} 3.65',
+        'test_latency_seconds_count{route="/items/{id}"} 4',
+    ]
+
+
+def test_counter_and_collected_gauge_render():
+    counter = metrics.Counter("test_events_total", "Test events.", ("kind",))
+    counter.inc('say "hi"')
+    counter.inc('say "hi"', amount=2)
+    gauge = metrics.Gauge("test_depth", "Test depth.", collect=lambda: 7)
+
+    assert list(counter.samples()) == ['test_events_total{kind="say \\"hi\\""} 3']
+    assert list(gauge.samples()) == ["test_depth 7"]
+    rendered = metrics.render()
+    assert "# TYPE test_events_total counter" in rendered
+    assert "# TYPE test_depth gauge" in rendered
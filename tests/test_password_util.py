@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from app.auth import password_util
+from app.config.settings import settings
+from app.services.users_service import UserService
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    monkeypatch.setattr(password_util, "_executor", None)
+    monkeypatch.setattr(password_util, "_pending", 0)
+    yield
+    password_util.shutdown()
+
+
+def _bcrypt_context(rounds: int) -> CryptContext:
+    # Same policy as password_util.pwd_context, at a cheap work factor
+    return password_util.pwd_context.copy(
+        bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds
+    )
+
+
+class FakeUserRepository:
+    def __init__(self, user):
+        self.user = user
+        self.updated = []
+
+    async def get_user_by_email(self, conn, email):
+        return dict(self.user) if email == self.user["email"] else None
+
+    async def update_password_hash(self, conn, user_id, hashed_password):
+        self.updated.append((user_id, hashed_password))
+
+
+def test_outdated_work_factor_is_rehashed_on_login(monkeypatch, executor):
+    old_hash = _bcrypt_context(4).hash("correct horse")
+    assert old_hash.startswith("$2b$04$")
+    monkeypatch.setattr(password_util, "pwd_context", _bcrypt_context(5))
+    repo = FakeUserRepository({"id": 7, "email": "ada@example.com", "hashed_password": old_hash})
+    service = UserService(repo)
+
+    assert asyncio.run(service.authenticate_user(None, "ada@example.com", "wrong")) is None
+    assert repo.updated == []
+
+    user = asyncio.run(service.authenticate_user(None, "ada@example.com", "correct horse"))
+    [(user_id, new_hash)] = repo.updated
+    assert user_id == 7 and new_hash.startswith("$2b$05$")
+    assert user["hashed_password"] == new_hash
+    assert password_util.verify_and_update("correct horse", new_hash) == (True, None)
+
+
+def test_full_queue_is_rejected_with_503(monkeypatch, executor):
+    monkeypatch.setattr(settings, "PASSWORD_HASH_WORKERS", 1)
+    monkeypatch.setattr(settings, "PASSWORD_HASH_MAX_QUEUE", 1)
+    monkeypatch.setattr(password_util, "pwd_context", _bcrypt_context(4))
+    monkeypatch.setattr(password_util, "_pending", 2)
+
+    with pytest.raises(password_util.PasswordHasherBusyError):
+        asyncio.run(password_util.hash_password_async("secret"))
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(UserService._hash_call(password_util.hash_password_async("secret")))
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers == {"Retry-After": "2"}
+
+    # One slot frees up: calls go through again
+    monkeypatch.setattr(password_util, "_pending", 1)
+    assert asyncio.run(password_util.hash_password_async("secret")).startswith("$2b$04$")
+    assert password_util._pending == 1
+
+
+def test_timed_out_call_is_a_503_and_keeps_its_slot_until_it_finishes(monkeypatch, executor):
+    monkeypatch.setattr(settings, "PASSWORD_HASH_WORKERS", 2)
+    monkeypatch.setattr(settings, "PASSWORD_HASH_TIMEOUT_SECONDS", 0.05)
+
+    async def run():
+        with pytest.raises(password_util.PasswordHashTimeoutError):
+            await password_util._run(time.sleep, 0.5)
+        with pytest.raises(HTTPException) as exc_info:
+            await UserService._hash_call(password_util._run(time.sleep, 0.5))
+        assert exc_info.value.status_code == 503
+        # bcrypt cannot be interrupted: the threads stay busy, and counted, until they return
+        assert password_util._pending == 2
+        await asyncio.sleep(0.8)
+        assert password_util._pending == 0
+
+    asyncio.run(run())
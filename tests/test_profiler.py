@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.auth.jwt_handler import create_access_token
+from app.main import app
+from app.services import profiler
+
+
+def busy_work(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(i * i for i in range(200))
+
+
+def test_profile_for_samples_the_event_loop_thread():
+    async def scenario():
+        task = asyncio.create_task(profiler.profile_for(0.3, 0.002))
+        await asyncio.sleep(0)
+        busy_work(0.2)
+        return await task
+
+    sampler = asyncio.run(scenario())
+    assert sampler.samples > 10
+    assert "busy_work" in sampler.to_folded()
+    speedscope = sampler.to_speedscope("test")
+    profile = speedscope["profiles"][0]
+    assert len(profile["samples"]) == len(profile["weights"])
+    assert any(frame["name"] == "busy_work" for frame in speedscope["shared"]["frames"])
+
+
+def test_only_one_profile_at_a_time():
+    first = profiler.SamplingProfiler(0.01)
+    first.start()
+    try:
+        with pytest.raises(profiler.ProfilerBusyError):
+            profiler.SamplingProfiler(0.01).start()
+    finally:
+        first.stop()
+
+
+def test_request_signature_is_bound_to_method_path_and_expiry(monkeypatch):
+    monkeypatch.setattr("app.config.settings.settings.PROFILING_SECRET", "s3cret")
+    value = profiler.sign_request("GET", "/api/creations/feed", int(time.time()) + 60)
+
+    assert profiler.verify_request_signature("GET", "/api/creations/feed", value)
+    assert not profiler.verify_request_signature("POST", "/api/creations/feed", value)
+    assert not profiler.verify_request_signature("GET", "/api/other", value)
+    assert not profiler.verify_request_signature("GET", "/api/creations/feed", value[:-1] + "0")
+    expired = profiler.sign_request("GET", "/api/creations/feed", int(time.time()) - 1)
+    assert not profiler.verify_request_signature("GET", "/api/creations/feed", expired)
+
+
+def test_profile_endpoint_is_admin_only(monkeypatch):
+    monkeypatch.setattr("app.auth.jwt_handler.SECRET_KEY", "test-secret")
+    monkeypatch.setattr("app.auth.jwt_handler.ALGORITHM", "HS256")
+    # tests/test_upload_manual.py overrides get_current_user for the whole app
+    monkeypatch.setattr(app, "dependency_overrides", {})
+    client = TestClient(app)
+    member = create_access_token({"sub": "2", "role": "MEMBER"})
+    admin = create_access_token({"sub": "1", "role": "ADMIN"})
+
+    assert client.post("/admin/profile?seconds=0.1").status_code == 401
+    assert client.post("/admin/profile?seconds=0.1", headers={"Authorization": f"Bearer {member}"}).status_code == 403
+    response = client.post("/admin/profile?seconds=0.1&format=stats", headers={"Authorization": f"Bearer {admin}"})
+    assert response.status_code == 200
+    assert response.json()["duration_seconds"] >= 0.1
+
+
+def test_signed_request_is_profiled(monkeypatch):
+    from fastapi import FastAPI
+    from app.middlewares.profiling_middleware import ProfilingMiddleware
+
+    monkeypatch.setattr("app.config.settings.settings.PROFILING_SECRET", "s3cret")
+    monkeypatch.setattr("app.config.settings.settings.PROFILING_INTERVAL_MS", 1)
+    small_app = FastAPI()
+
+    @small_app.get("/work")
+    async def work():
+        busy_work(0.1)
+        return {"ok": True}
+
+    small_app.add_middleware(ProfilingMiddleware)
+    client = TestClient(small_app)
+    header = profiler.sign_request("GET", "/work", int(time.time()) + 60)
+
+    assert "x-profile-id" not in client.get("/work").headers
+    assert "x-profile-id" not in client.get("/work", headers={"X-Profile-Request": header + "0"}).headers
+    profile_id = client.get("/work", headers={"X-Profile-Request": header}).headers["x-profile-id"]
+    assert "busy_work" in profiler.request_profiles[profile_id].to_folded()
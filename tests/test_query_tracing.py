@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from app.config.settings import settings
+from app.services import query_tracing
+from app.services.creations_service import CreationsService
+from app.repositories.creations_repository import CreationsRepository
+
+
+def test_normalize_sql_collapses_literals_and_whitespace():
+    a = query_tracing.normalize_sql("SELECT *  FROM t\n WHERE id = 42 AND name = 'x' -- note")
+    b = query_tracing.normalize_sql("SELECT * FROM t WHERE id = 7 AND name = 'it''s'")
+    assert a == b == "SELECT * FROM t WHERE id = ? AND name = ?"
+    assert query_tracing.normalize_sql("SELECT 1 FROM t WHERE id IN (1, 2, 3) AND x = $1") == \
+        "SELECT ? FROM t WHERE id IN (?) AND x = $1"
+
+
+def test_repeated_statement_is_reported_as_n_plus_one(monkeypatch):
+    monkeypatch.setattr(settings, "DB_REPEATED_QUERY_THRESHOLD", 3)
+    monkeypatch.setattr(settings, "DB_QUERY_BUDGET", 0)
+    stats, token = query_tracing.start_request()
+    try:
+        for creation_id in range(3):
+            query_tracing._record(f"SELECT 1 FROM likes WHERE creation_id = {creation_id}", 0.001)
+        query_tracing._record("SELECT * FROM creations", 0.002)
+    finally:
+        query_tracing.end_request(token)
+
+    assert stats.count == 4
+    assert stats.slowest[0][1] == "SELECT * FROM creations"
+    assert stats.problems() == ["possible N+1: 3x SELECT ? FROM likes WHERE creation_id = ?"]
+    assert query_tracing.current_stats() is None
+
+
+def test_strict_mode_fails_the_query_over_budget(monkeypatch):
+    monkeypatch.setattr(settings, "DB_QUERY_BUDGET", 2)
+    monkeypatch.setattr(settings, "DB_QUERY_BUDGET_STRICT", True)
+    _, token = query_tracing.start_request()
+    try:
+        query_tracing._record("SELECT 1", 0.0)
+        query_tracing._record("SELECT 2", 0.0)
+        with pytest.raises(query_tracing.QueryBudgetExceededError):
+            query_tracing._record("SELECT 3", 0.0)
+    finally:
+        query_tracing.end_request(token)
+
+
+def test_transaction_control_is_not_counted(monkeypatch):
+    monkeypatch.setattr(settings, "DB_REPEATED_QUERY_THRESHOLD", 3)
+    monkeypatch.setattr(settings, "DB_QUERY_BUDGET_STRICT", True)
+    stats, token = query_tracing.start_request()
+    try:
+        for _ in range(3):
+            query_tracing._record("BEGIN;", 0.0)
+            query_tracing._record("SAVEPOINT asyncpg_1;", 0.0)
+            query_tracing._record("RELEASE SAVEPOINT asyncpg_1;", 0.0)
+            query_tracing._record("COMMIT;", 0.0)
+        query_tracing._record("ROLLBACK;", 0.0)
+        query_tracing._record("SELECT 1 FROM committed_offers", 0.0)
+    finally:
+        query_tracing.end_request(token)
+
+    assert stats.count == 1
+    assert stats.problems() == []
+
+
+class FakeConnection:
+    def __init__(self, liked):
+        self.liked = liked
+        self.queries = []
+
+    async def fetch(self, query, user_id, creation_ids):
+        self.queries.append(query)
+        return [{"creation_id": cid} for cid in creation_ids if cid in self.liked]
+
+
+def test_feed_like_flags_use_one_query():
+    conn = FakeConnection(liked={2, 5})
+    creations = [{"id": i} for i in range(1, 11)]
+    service = CreationsService(CreationsRepository(), storage_service=None)
+
+    asyncio.run(service.mark_liked(conn, creations, user_id=1))
+
+    assert len(conn.queries) == 1
+    assert [c["id"] for c in creations if c["is_liked"]] == [2, 5]
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.auth.jwt_handler import create_access_token
+from app.main import app
+from app.services import task_manager, tracing
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr("app.auth.jwt_handler.SECRET_KEY", "test-secret")
+    monkeypatch.setattr("app.auth.jwt_handler.ALGORITHM", "HS256")
+    monkeypatch.setattr("app.config.settings.settings.TRACING_EXPORTER", "none")
+    return TestClient(app)
+
+
+def _traced_task():
+    with tracing.start_span("creation.create_task") as request_span:
+        task_id = task_manager.create_task(trace_id=request_span.trace_id)
+    with task_manager.stage(task_id, "process", parent=request_span.context) as process_span:
+        with task_manager.stage(task_id, "n8n_webhook") as webhook_span:
+            pass
+    assert process_span.trace_id == webhook_span.trace_id == request_span.trace_id
+    assert webhook_span.parent_span_id == process_span.span_id
+    return task_id, request_span.trace_id
+
+
+def test_stages_are_recorded_on_the_task(client):
+    task_id, _ = _traced_task()
+
+    with pytest.raises(RuntimeError):
+        with task_manager.stage(task_id, "db_insert"):
+            raise RuntimeError("boom")
+
+    timings = task_manager.get_task(task_id)["timings"]
+    assert [(t["stage"], t["status"]) for t in timings] == [
+        ("n8n_webhook", "OK"), ("process", "OK"), ("db_insert", "ERROR")
+    ]
+
+
+def test_timing_breakdown_is_shown_to_admins_only(client):
+    task_id, trace_id = _traced_task()
+    admin = create_access_token({"sub": "1", "role": "ADMIN"})
+    member = create_access_token({"sub": "2", "role": "MEMBER"})
+
+    anonymous_view = client.get(f"/api/task_status/{task_id}").json()
+    member_view = client.get(f"/api/task_status/{task_id}", headers={"Authorization": f"Bearer {member}"}).json()
+    admin_view = client.get(f"/api/task_status/{task_id}", headers={"Authorization": f"Bearer {admin}"}).json()
+
+    assert "timings" not in anonymous_view and "trace_id" not in anonymous_view
+    assert "timings" not in member_view
+    assert admin_view["trace_id"] == trace_id
+    assert [t["stage"] for t in admin_view["timings"]] == ["n8n_webhook", "process"]
+
+
+def test_analysis_tasks_are_not_served_by_task_status(client, monkeypatch):
+    # Real token checks, whatever other test modules have overridden
+    monkeypatch.setattr(app, "dependency_overrides", {})
+    task_id = task_manager.create_task(kind="analysis", owner_id=1)
+    task_manager.update_task_status(task_id, status="completed", result={"personas": ["private"]})
+    owner = create_access_token({"sub": "1", "role": "MEMBER"})
+    other = create_access_token({"sub": "2", "role": "MEMBER"})
+
+    other_view = client.get(f"/api/task_status/{task_id}", headers={"Authorization": f"Bearer {other}"})
+    assert other_view.status_code == 404
+    assert client.get(f"/api/task_status/{task_id}").status_code == 404
+    assert client.get(f"/api/analysis/jobs/{task_id}", headers={"Authorization": f"Bearer {other}"}).status_code == 404
+    assert client.get(f"/api/analysis/jobs/{task_id}", headers={"Authorization": f"Bearer {owner}"}).status_code == 200
+
+
+def test_failed_analysis_job_hides_the_exception_from_the_client(caplog):
+    from app.routers.analysis_router import _run_tracked_job
+
+    async def compute():
+        raise RuntimeError("password=hunter2 at /srv/data/upload.csv")
+
+    task_id = task_manager.create_task(kind="analysis", owner_id=1)
+    with caplog.at_level("ERROR", logger="app.routers.analysis_router"):
+        asyncio.run(_run_tracked_job(task_id, "analysis", compute, None, "postgresql://unused"))
+
+    task = task_manager.get_task(task_id)
+    assert task["status"] == "failed"
+    assert task["result"] == {"error": "Analysis failed"}
+    assert "hunter2" in caplog.text and caplog.records[-1].exc_info
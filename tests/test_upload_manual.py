@@ -24,7 +24,12 @@ def test_upload_csv():
         print(response.text)
         return
 
-    data = response.json()
+    # The upload returns a job id; the analysis runs as a background job
+    task_id = response.json()["task_id"]
+    job = client.get(f"/api/analysis/jobs/{task_id}").json()
+    print(f"Job status: {job['status']}, progress: {job['progress']}")
+
+    data = job["result"] or {}
     if "clusters" in data and "personas" in data:
         print("Response structure valid.")
     else:
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import signal
+import time
+
+import pytest
+
+from app.config.settings import settings
+from app.services import worker_pool
+
+
+# Job functions run in spawned workers, so they live at module level (picklable by reference)
+
+def sleep_for(seconds: float) -> float:
+    try:
+        time.sleep(seconds)
+    except Exception:
+        return -1.0
+    return seconds
+
+
+def stuck_job(job_id: str) -> None:
+    """Ignores the in-worker deadline, like a job stuck in C code."""
+    signal.signal(signal.SIGALRM, signal.SIG_IGN)
+    worker_pool.report_progress(job_id, "started", 0, pid=os.getpid())
+    time.sleep(120)
+
+
+@pytest.fixture
+def pool_settings(monkeypatch):
+    monkeypatch.setattr(settings, "ANALYSIS_POOL_SIZE", 2)
+    monkeypatch.setattr(settings, "ANALYSIS_WORKER_MEMORY_MB", 0)
+    monkeypatch.setattr(worker_pool, "JOB_TIMEOUT_GRACE_SECONDS", 1.0)
+    yield
+    worker_pool.shutdown()
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def test_timeout_aborts_only_that_job(pool_settings):
+    async def run():
+        return await asyncio.gather(
+            worker_pool.run_in_pool(sleep_for, 30, timeout=1),
+            worker_pool.run_in_pool(sleep_for, 0.5, timeout=10),
+            return_exceptions=True,
+        )
+
+    slow, fast = asyncio.run(run())
+    # The job's own `except Exception` did not swallow the deadline
+    assert isinstance(slow, worker_pool.JobTimeoutError)
+    assert fast == 0.5
+
+
+def test_stuck_job_worker_is_terminated(pool_settings):
+    progress = []
+
+    async def run():
+        pool = worker_pool.get_pool()
+        with pytest.raises(worker_pool.JobTimeoutError):
+            await worker_pool.run_in_pool(
+                stuck_job, "stuck", timeout=0.5, job_id="stuck", on_progress=progress.append
+            )
+        # The pool was retired; new jobs get a fresh one
+        assert worker_pool.get_pool() is not pool
+        await asyncio.gather(*worker_pool._retired.values())
+
+    asyncio.run(run())
+    pid = progress[0]["pid"]
+    assert not _alive(pid)
+    assert worker_pool._retired == {}